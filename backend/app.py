@@ -21,11 +21,14 @@ app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:/
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'jwt-dev-secret')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=30)
+# Bodies over this are refused while they are read; statement uploads are the largest (MAX_IMPORT_BYTES)
+app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024
 
 # Import models first - use simplified models
 from models_simple import db, User, Account, Transaction, RecurringItem, Budget
 from models_simple import Waitlist, SignupToken
 from plaid_config import PlaidConfig
+from services.transaction_search import ensure_search_index
 
 # Initialize extensions
 db.init_app(app)
@@ -40,6 +43,7 @@ def init_database():
         try:
             with app.app_context():
                 db.create_all()
+                ensure_search_index()
                 print(f"✅ Database connected and all tables created on attempt {attempt + 1}")
                 return True
         except Exception as e:
@@ -64,6 +68,8 @@ from routes.accounts import accounts_bp
 from routes.support import support_bp
 from routes.users import users_bp
 from routes.plaid import plaid_bp
+from routes.analytics import analytics_bp
+from routes.sync import sync_bp
 from routes.migrate import migrate_bp
 from routes.ai import ai_bp
 
@@ -79,6 +85,8 @@ app.register_blueprint(users_bp, url_prefix='/api/users')
 app.register_blueprint(plaid_bp)
 app.register_blueprint(migrate_bp)
 app.register_blueprint(ai_bp)
+app.register_blueprint(analytics_bp)
+app.register_blueprint(sync_bp)
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
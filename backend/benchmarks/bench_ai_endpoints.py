@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Benchmark the /api/ai/* routes against the offline Messages API stand-in
+
+Starts benchmarks/fake_anthropic.py in-process, points ClaudeService at it
+and drives the AI routes with concurrent requests through the real client
+code path (anthropic SDK, model guard, caches, job queue). Reports
+throughput, p50/p95 latency and model calls per scenario, with the
+categorization cache off and on, and with per-transaction versus batched
+categorization.
+
+Requires the anthropic package (pip install anthropic).
+
+Usage: python benchmarks/bench_ai_endpoints.py [--requests 200] [--concurrency 8]
+       [--latency lognormal:-0.9,0.5] [--tokens-per-second 80] [--rate 1000] [--max-concurrency 16]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_anthropic import FakeAnthropicServer
+
+BATCH_SIZE = 50
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_load(call, count, concurrency):
+    """Run call(i) count times on concurrency threads; returns latencies and wall time"""
+    def timed(i):
+        start = time.perf_counter()
+        ok = call(i)
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(timed, range(count)))
+    return {
+        'seconds': time.perf_counter() - start,
+        'latencies': [latency for latency, _ in outcomes],
+        'errors': sum(1 for _, ok in outcomes if not ok)
+    }
+
+
+def model_calls(server):
+    return sum(entry['requests'] for entry in server.stats.values())
+
+
+def main(args):
+    server = FakeAnthropicServer(latency=args.latency, tokens_per_second=args.tokens_per_second).start()
+
+    # ClaudeService and the model guard read these at import time
+    os.environ['ANTHROPIC_API_KEY'] = 'offline-benchmark'
+    os.environ['ANTHROPIC_BASE_URL'] = server.base_url
+    os.environ['AI_RATE_PER_SECOND'] = str(args.rate)
+    os.environ['AI_BURST'] = str(int(args.rate))
+    os.environ['AI_MAX_CONCURRENCY'] = str(args.max_concurrency)
+    os.environ['AI_ACQUIRE_TIMEOUT'] = '30'
+
+    try:
+        import anthropic  # noqa: F401
+    except ImportError:
+        sys.exit("bench_ai_endpoints.py needs the anthropic package: pip install anthropic")
+
+    from fixtures import make_api_app, seed_user, seed_transactions, auth_headers
+    from bench_categorizer import synthetic_corpus
+    from models_simple import db, MerchantCategory
+    from routes.ai import ai_bp, claude_service
+    from services.categorization_cache import categorization_cache
+    from services.fast_categorizer import fast_categorizer
+    from services.recommendation_cache import recommendation_cache
+
+    if not claude_service.is_available():
+        sys.exit("ClaudeService did not initialize its client; check the anthropic package")
+
+    workdir = tempfile.mkdtemp(prefix='bench-ai-')
+    app = make_api_app(f"sqlite:///{os.path.join(workdir, 'bench.db')}", [ai_bp])
+    with app.app_context():
+        user_id = seed_user()
+        seed_transactions(user_id, 3000, days=90)
+    headers = auth_headers(app, user_id)
+
+    corpus = synthetic_corpus(args.requests, seed=11)
+
+    def reset_categorization(enabled):
+        categorization_cache.enabled = enabled
+        categorization_cache.clear_memory()
+        with app.app_context():
+            MerchantCategory.query.delete()
+            db.session.commit()
+        fast_categorizer.invalidate()
+
+    def post(path, body):
+        response = app.test_client().post(path, headers=headers, json=body)
+        return response, response.status_code < 400
+
+    def get_until_done(path):
+        """GET a route that may answer 202, then poll the job to completion"""
+        client = app.test_client()
+        response = client.get(path, headers=headers)
+        if response.status_code != 202:
+            return response.status_code < 400
+        status_url = response.get_json()['status_url']
+        while True:
+            job = client.get(status_url, headers=headers).get_json()
+            if job['status'] in ('succeeded', 'failed'):
+                return job['status'] == 'succeeded'
+            time.sleep(0.01)
+
+    first_section = []
+
+    def stream_analysis(_):
+        start = time.perf_counter()
+        response = app.test_client().get('/api/ai/analyze-spending/stream', headers=headers, buffered=False)
+        seen = False
+        for chunk in response.response:
+            chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+            if not seen and 'event: section' in chunk:
+                first_section.append(time.perf_counter() - start)
+                seen = True
+        response.close()
+        return seen
+
+    def categorize_one(i):
+        description, amount = corpus[i]
+        return post('/api/ai/categorize', {'description': description, 'amount': amount})[1]
+
+    def categorize_batch(i):
+        items = [{'id': n, 'description': d, 'amount': a}
+                 for n, (d, a) in enumerate(corpus[i * BATCH_SIZE:(i + 1) * BATCH_SIZE])]
+        return post('/api/ai/categorize-batch', {'transactions': items})[1]
+
+    batches = (len(corpus) + BATCH_SIZE - 1) // BATCH_SIZE
+    analyses = max(4, args.requests // 20)
+
+    scenarios = [
+        ('categorize, no cache', lambda: reset_categorization(False), categorize_one, len(corpus), len(corpus)),
+        ('categorize, cache', lambda: reset_categorization(True), categorize_one, len(corpus), len(corpus)),
+        ('categorize-batch, no cache', lambda: reset_categorization(False), categorize_batch, batches, len(corpus)),
+        ('categorize-batch, cache', lambda: reset_categorization(True), categorize_batch, batches, len(corpus)),
+        ('daily-recs, cold', recommendation_cache.clear,
+         lambda i: (recommendation_cache.clear(), get_until_done('/api/ai/daily-recommendations'))[1],
+         analyses, analyses),
+        ('daily-recs, cached', lambda: get_until_done('/api/ai/daily-recommendations'),
+         lambda i: get_until_done('/api/ai/daily-recommendations'), args.requests, args.requests),
+        ('analyze-spending job', None, lambda i: get_until_done('/api/ai/analyze-spending'), analyses, analyses),
+        ('analyze-spending stream', None, stream_analysis, analyses, analyses),
+    ]
+
+    print("🔍 AI endpoint benchmark (offline Messages API stand-in)")
+    print(f"Stand-in latency {args.latency}, {args.tokens_per_second:g} tokens/s; "
+          f"concurrency {args.concurrency}; guard {args.rate:g} req/s, {args.max_concurrency} in flight")
+    print("=" * 98)
+    print(f"{'scenario':<28} {'reqs':>5} {'txns':>6} {'req/s':>8} {'txn/s':>8} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'model calls':>12} {'errors':>7}")
+
+    results = {}
+    for name, setup, call, count, txns in scenarios:
+        if setup:
+            setup()
+        server.reset_stats()
+        outcome = run_load(call, count, args.concurrency)
+        calls = model_calls(server)
+        results[name] = dict(outcome, calls=calls)
+        print(f"{name:<28} {count:>5} {txns:>6} {count / outcome['seconds']:>8.1f} {txns / outcome['seconds']:>8.1f} "
+              f"{percentile(outcome['latencies'], 50) * 1000:>8.0f} {percentile(outcome['latencies'], 95) * 1000:>8.0f} "
+              f"{calls:>12} {outcome['errors']:>7}")
+
+    if first_section:
+        print()
+        print(f"Stream time to first section: p50 {percentile(first_section, 50) * 1000:.0f} ms, "
+              f"p95 {percentile(first_section, 95) * 1000:.0f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as handle:
+            json.dump({name: {
+                'seconds': r['seconds'],
+                'p50': percentile(r['latencies'], 50),
+                'p95': percentile(r['latencies'], 95),
+                'model_calls': r['calls'],
+                'errors': r['errors']
+            } for name, r in results.items()}, handle, indent=2)
+
+    server.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200, help='transactions per categorization scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', default='lognormal:-0.9,0.5', help='stand-in time to first token distribution')
+    parser.add_argument('--tokens-per-second', type=float, default=80.0)
+    parser.add_argument('--rate', type=float, default=1000.0, help='model guard requests per second')
+    parser.add_argument('--max-concurrency', type=int, default=16, help='model guard in-flight limit')
+    parser.add_argument('--json', help='also write results to this file')
+    main(parser.parse_args())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark the tiered transaction categorizer
+
+Builds a synthetic corpus of bank-style descriptions (known merchants with
+processor prefixes, store numbers and dates, plus unknown merchants) and
+reports local categorization throughput and how many LLM calls each tier
+configuration would make.
+
+Usage: python benchmarks/bench_categorizer.py [--count 20000] [--seed 7]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.categorization_cache import make_cache_key
+from services.fast_categorizer import FastCategorizer, KEYWORD_CATEGORIES, INCOME_KEYWORDS
+
+PREFIXES = ['', '', 'SQ *', 'TST* ', 'POS DEBIT ', 'PURCHASE ', 'CHECKCARD ']
+CITIES = ['', 'SEATTLE WA', 'SAN FRANCISCO CA', 'AUSTIN TX', 'NEW YORK NY']
+SYLLABLES = ['ka', 'lo', 'mi', 'ren', 'tor', 'vex', 'sul', 'da', 'por', 'qui']
+
+
+def synthetic_corpus(count, seed):
+    """(description, amount) pairs; merchant popularity is heavily skewed like real spending"""
+    rng = random.Random(seed)
+    known = [kw.rstrip('*') for keywords in KEYWORD_CATEGORIES.values() for kw, _, _ in keywords]
+    unknown = [
+        ''.join(rng.choice(SYLLABLES) for _ in range(3)).upper() + ' ' + rng.choice(['LLC', 'SHOP', 'CO', 'MARKET'])
+        for _ in range(300)
+    ]
+    income = [kw.rstrip('*') for kw, _, _ in INCOME_KEYWORDS]
+
+    corpus = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.05:
+            description = f"ACME CORP {rng.choice(income).upper()}"
+            amount = round(rng.uniform(500, 4000), 2)
+        else:
+            pool = known if roll < 0.8 else unknown
+            # Pareto index keeps a few merchants very frequent
+            merchant = pool[min(int(rng.paretovariate(1.2)) - 1, len(pool) - 1)] if rng.random() < 0.7 else rng.choice(pool)
+            description = (
+                f"{rng.choice(PREFIXES)}{merchant.upper()} #{rng.randint(100, 9999)} "
+                f"{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d} {rng.choice(CITIES)}"
+            ).strip()
+            amount = -round(rng.uniform(2, 300), 2)
+        corpus.append((description, amount))
+    return corpus
+
+
+def run(count, seed):
+    corpus = synthetic_corpus(count, seed)
+    categorizer = FastCategorizer(include_approved=False)
+
+    start = time.perf_counter()
+    categorizer.build()
+    build_ms = (time.perf_counter() - start) * 1000
+
+    # Tier 2 alone
+    start = time.perf_counter()
+    local_results = [categorizer.categorize(description, amount) for description, amount in corpus]
+    local_seconds = time.perf_counter() - start
+
+    # Cache keys (tier 1)
+    start = time.perf_counter()
+    keys = [make_cache_key(description, amount) for description, amount in corpus]
+    key_seconds = time.perf_counter() - start
+
+    # LLM calls per configuration
+    baseline_calls = len(corpus)
+    cache_only_calls = len(set(keys))
+
+    seen = set()
+    tiered_calls = 0
+    for key, result in zip(keys, local_results):
+        if key in seen:
+            continue
+        if categorizer.is_confident(result):
+            continue
+        seen.add(key)
+        tiered_calls += 1
+
+    confident = sum(1 for r in local_results if categorizer.is_confident(r))
+
+    print("🔍 Tiered categorizer benchmark")
+    print("=" * 50)
+    print(f"Transactions:            {len(corpus):,}")
+    print(f"Automaton states:        {len(categorizer._expense_matcher):,} (built in {build_ms:.1f} ms)")
+    print(f"Local throughput:        {len(corpus) / local_seconds:,.0f} txn/s ({local_seconds * 1e6 / len(corpus):.1f} µs/txn)")
+    print(f"Cache key throughput:    {len(corpus) / key_seconds:,.0f} txn/s")
+    print(f"Confident local answers: {confident:,} ({confident / len(corpus):.1%})")
+    print()
+    print("LLM calls")
+    print(f"  LLM for every txn:     {baseline_calls:,}")
+    print(f"  + merchant cache:      {cache_only_calls:,} ({1 - cache_only_calls / baseline_calls:.1%} fewer)")
+    print(f"  + local fast path:     {tiered_calls:,} ({1 - tiered_calls / baseline_calls:.1%} fewer)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    run(args.count, args.seed)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark spending-analysis prompt compaction
+
+Compares the old prompt (every transaction in the window as indented JSON)
+with the summary prompt built by ClaudeService._build_spending_prompt, for
+growing transaction counts. Reports prompt size, estimated tokens and build
+time. Model-side latency scales with input tokens; the estimate uses
+--prefill-tps input tokens per second.
+
+Usage: python benchmarks/bench_prompt_compaction.py [--sizes 100,1000,10000] [--days 30]
+"""
+
+import argparse
+import json
+import time
+
+from fixtures import make_app, seed_user, seed_transactions
+from models_simple import db, Transaction
+from claude_service import ClaudeService
+from services.spending_summary import estimate_tokens
+
+
+def legacy_prompt(user_id, days):
+    """The prompt as analyze_spending_patterns used to build it"""
+    from datetime import datetime, timedelta
+    end_date = datetime.now().date()
+    start_date = end_date - timedelta(days=days)
+    transactions = Transaction.query.filter_by(user_id=user_id).filter(
+        Transaction.date >= start_date,
+        Transaction.date <= end_date
+    ).all()
+    transaction_data = [{
+        "date": t.date.isoformat(),
+        "description": t.description,
+        "amount": float(t.amount),
+        "category": t.category,
+        "is_income": t.is_income
+    } for t in transactions]
+    return f"Transactions (last {days} days):\n{json.dumps(transaction_data, indent=2)}"
+
+
+def timed(fn, repeat=3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def run(sizes, days, prefill_tps):
+    service = ClaudeService()
+
+    print("🔍 Spending prompt compaction benchmark")
+    print("=" * 86)
+    print(f"{'txns in window':>14} | {'legacy chars':>12} {'~tokens':>8} {'build ms':>9} | "
+          f"{'summary chars':>13} {'~tokens':>8} {'build ms':>9} | {'est. prefill saved':>18}")
+
+    for size in sizes:
+        app = make_app()
+        with app.app_context():
+            user_id = seed_user()
+            seed_transactions(user_id, size, days=days)
+
+            legacy, legacy_seconds = timed(lambda: legacy_prompt(user_id, days))
+            (_, compact), compact_seconds = timed(lambda: service._build_spending_prompt(user_id, days))
+
+            legacy_tokens = estimate_tokens(legacy)
+            compact_tokens = estimate_tokens(compact)
+            saved = (legacy_tokens - compact_tokens) / prefill_tps
+
+            print(f"{size:>14,} | {len(legacy):>12,} {legacy_tokens:>8,} {legacy_seconds * 1000:>9.1f} | "
+                  f"{len(compact):>13,} {compact_tokens:>8,} {compact_seconds * 1000:>9.1f} | {saved:>17.2f}s")
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='100,1000,10000')
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--prefill-tps', type=float, default=2000.0,
+                        help='assumed model input throughput (tokens/second) for the latency estimate')
+    args = parser.parse_args()
+    run([int(s) for s in args.sizes.split(',')], args.days, args.prefill_tps)
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Check that the hot per-user queries use the composite indexes
+
+Seeds many users with synthetic transactions, then drives the real routes
+and services (transaction list pages, summary, categories, daily allowance,
+accounts, recurring detection, spending summary, category history) while
+recording every SELECT they issue. Each scenario is timed without and with
+the indexes declared in models_simple, and every recorded query is run
+through EXPLAIN: with the indexes present, no query may scan a whole
+transactions, accounts or recurring_items table. Exits non-zero if one does.
+
+Works on SQLite (default, a temporary file) and Postgres (--database-url
+postgresql://...).
+
+Usage: python benchmarks/bench_query_plans.py [--users 40] [--rows-per-user 5000]
+       [--database-url URL] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import event, inspect, text
+
+from fixtures import make_api_app, seed_user, seed_transactions, auth_headers
+from models_simple import db, Transaction, Account, RecurringItem
+
+HOT_TABLES = ('transactions', 'accounts', 'recurring_items')
+INDEXED_TABLES = (Transaction.__table__, Account.__table__, RecurringItem.__table__)
+
+
+def build_app(database_url):
+    from routes.transactions import transactions_bp
+    from routes.daily_allowance import daily_allowance_bp
+    from routes.accounts import accounts_bp
+    from routes.ai import ai_bp
+
+    app = make_api_app(database_url, [transactions_bp, daily_allowance_bp, ai_bp])
+    app.register_blueprint(accounts_bp, url_prefix='/api/accounts')
+    return app
+
+
+def set_indexes(present):
+    """Create or drop the models_simple composite indexes, then refresh planner statistics"""
+    existing = {}
+    for table in INDEXED_TABLES:
+        existing[table.name] = {index['name'] for index in inspect(db.engine).get_indexes(table.name)}
+    for table in INDEXED_TABLES:
+        for index in table.indexes:
+            if present and index.name not in existing[table.name]:
+                index.create(bind=db.engine)
+            elif not present and index.name in existing[table.name]:
+                index.drop(bind=db.engine)
+    with db.engine.begin() as connection:
+        connection.execute(text('ANALYZE'))
+
+
+class QueryRecorder:
+    """Collects the SELECT statements (with parameters) sent to the database"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.queries = []
+        self.active = False
+        event.listen(engine, 'before_cursor_execute', self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active and not executemany and statement.lstrip().upper().startswith('SELECT'):
+            if any(table in statement for table in HOT_TABLES):
+                self.queries.append((statement, parameters))
+
+    def capture(self, fn):
+        self.queries = []
+        self.active = True
+        try:
+            fn()
+        finally:
+            self.active = False
+        return list(self.queries)
+
+
+def sqlite_plan(connection, statement, parameters):
+    rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+    details = [row[-1] for row in rows]
+    full_scans = [
+        detail for detail in details
+        if detail.startswith('SCAN ') and 'USING' not in detail
+        and detail.split()[1] in HOT_TABLES
+    ]
+    indexes = sorted({detail.split(' INDEX ')[1].split()[0] for detail in details if ' INDEX ' in detail})
+    return details, full_scans, indexes
+
+
+def postgres_plan(connection, statement, parameters):
+    raw = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+    plan = raw if isinstance(raw, list) else json.loads(raw)
+    details, full_scans, indexes = [], [], set()
+
+    def walk(node):
+        relation = node.get('Relation Name')
+        details.append(f"{node['Node Type']} {relation or ''} {node.get('Index Name') or ''}".strip())
+        if node['Node Type'] == 'Seq Scan' and relation in HOT_TABLES:
+            full_scans.append(details[-1])
+        if node.get('Index Name'):
+            indexes.add(node['Index Name'])
+        for child in node.get('Plans', []):
+            walk(child)
+
+    walk(plan[0]['Plan'])
+    return details, full_scans, sorted(indexes)
+
+
+def explain(statement, parameters):
+    with db.engine.connect() as connection:
+        if db.engine.dialect.name == 'postgresql':
+            return postgres_plan(connection, statement, parameters)
+        return sqlite_plan(connection, statement, parameters)
+
+
+def scenarios(app, user_id, headers):
+    client = app.test_client()
+
+    def get(path):
+        def call():
+            response = client.get(path, headers=headers)
+            assert response.status_code == 200, (path, response.status_code, response.get_data(as_text=True)[:200])
+            return response
+        return call
+
+    def list_deep_page():
+        # Walk five pages with the keyset cursor, as infinite scroll does
+        cursor = None
+        for _ in range(5):
+            path = '/api/transactions?limit=50' + (f'&cursor={cursor}' if cursor else '')
+            cursor = get(path)().get_json()['next_cursor']
+
+    def in_context(fn):
+        def call():
+            with app.app_context():
+                fn()
+        return call
+
+    from services.category_spend import monthly_category_history, average_monthly_spend
+    from services.spending_summary import summarize_spending
+    from services.allowance_cache import calculate_allowance
+    from services.recurring_detector import detect_recurring
+
+    today = date.today()
+    return [
+        ('transactions list page', get('/api/transactions?limit=50')),
+        ('transactions list, 5 cursor pages', list_deep_page),
+        ('transactions list, expenses in range',
+         get(f'/api/transactions?limit=50&is_income=false&start_date={(today - timedelta(days=60)).isoformat()}')),
+        ('transactions summary', get('/api/transactions/summary')),
+        ('transaction categories', get('/api/transactions/categories')),
+        ('accounts list', get('/api/accounts')),
+        ('daily allowance (uncached)', in_context(lambda: calculate_allowance(user_id))),
+        ('spending summary, 30 days', in_context(lambda: summarize_spending(user_id, today - timedelta(days=30), today))),
+        ('budget averages, 3 months', in_context(lambda: average_monthly_spend(user_id, 3))),
+        ('category history, 6 months', in_context(lambda: monthly_category_history(user_id, 6))),
+        ('recurring detection', in_context(lambda: detect_recurring(user_id))),
+    ]
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(args):
+    database_url = args.database_url
+    if not database_url:
+        workdir = tempfile.mkdtemp(prefix='bench-plans-')
+        database_url = f"sqlite:///{os.path.join(workdir, 'plans.db')}"
+
+    app = build_app(database_url)
+    with app.app_context():
+        print(f"Seeding {args.users} users x {args.rows_per_user:,} transactions on {db.engine.dialect.name}...")
+        user_ids = []
+        for n in range(args.users):
+            user_id = seed_user(email=f"plans{n}@example.com")
+            seed_transactions(user_id, args.rows_per_user, days=400, seed=n)
+            user_ids.append(user_id)
+        # Profile a user in the middle of the id range
+        user_id = user_ids[len(user_ids) // 2]
+        recorder = QueryRecorder(db.engine)
+    headers = auth_headers(app, user_id)
+    cases = scenarios(app, user_id, headers)
+
+    timings = {}
+    for present in (False, True):
+        with app.app_context():
+            set_indexes(present)
+        for name, fn in cases:
+            fn()  # warm caches and the statement cache
+            timings.setdefault(name, []).append(timed(fn, args.repeat))
+
+    print()
+    print("🔍 Hot query plans (composite indexes present)")
+    print("=" * 100)
+    print(f"{'scenario':<38} {'no index ms':>11} {'indexed ms':>10} {'speedup':>8}  indexes used")
+
+    failures = []
+    for name, fn in cases:
+        queries = recorder.capture(fn)
+        used = set()
+        with app.app_context():
+            for statement, parameters in queries:
+                details, full_scans, indexes = explain(statement, parameters)
+                used.update(indexes)
+                if full_scans:
+                    failures.append((name, statement, details))
+        before, after = timings[name]
+        print(f"{name:<38} {before * 1000:>11.1f} {after * 1000:>10.1f} {before / after if after else 0:>7.1f}x  "
+              f"{', '.join(sorted(used)) or '-'}")
+
+    print()
+    if failures:
+        print(f"❌ {len(failures)} hot queries still scan a whole table:")
+        for name, statement, details in failures:
+            print(f"\n[{name}]\n{' '.join(statement.split())}\n  plan: {details}")
+        sys.exit(1)
+    print("✅ Every recorded query on transactions, accounts and recurring_items uses an index")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=40)
+    parser.add_argument('--rows-per-user', type=int, default=5000)
+    parser.add_argument('--database-url', help='defaults to a temporary SQLite file')
+    parser.add_argument('--repeat', type=int, default=5)
+    main(parser.parse_args())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark the recurring-transaction detector
+
+Seeds a user with random spending plus a handful of planted recurring series
+(weekly, bi-weekly, monthly, yearly, with small amount and date jitter) and
+reports detection time and how many planted series were found with the right
+frequency and next date.
+
+Usage: python benchmarks/bench_recurring_detector.py [--sizes 1000,10000,50000]
+"""
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from fixtures import make_app, seed_user, seed_transactions
+from models_simple import db, Transaction
+from services.recurring_detector import detect_recurring, next_occurrence, add_months
+
+# (merchant, frequency, amount, jitter in dollars, first date offset in days)
+PLANTED = [
+    ('Hulu Streaming', 'monthly', -17.99, 0.0, 700),
+    ('City Fitness Club', 'monthly', -49.00, 0.0, 400),
+    ('Evergreen Power Co', 'monthly', -92.00, 18.0, 500),
+    ('Initech Payroll', 'bi-weekly', 2310.55, 0.0, 300),
+    ('Blue Bottle Subscription', 'weekly', -22.00, 0.0, 120),
+    ('Costco Membership', 'yearly', -65.00, 0.0, 760),
+    ('Dog Walker Dana', 'weekly', -40.00, 5.0, 90),
+]
+
+
+def planted_rows(user_id, today, rng):
+    rows = []
+    expected = {}
+    for merchant, frequency, amount, jitter, offset in PLANTED:
+        current = today - timedelta(days=offset)
+        dates = []
+        count = 0
+        while current <= today:
+            dates.append(current)
+            count += 1
+            if frequency == 'weekly':
+                current = dates[0] + timedelta(days=7 * count)
+            elif frequency == 'bi-weekly':
+                current = dates[0] + timedelta(days=14 * count)
+            elif frequency == 'monthly':
+                current = add_months(dates[0], count)
+            else:
+                current = add_months(dates[0], 12 * count)
+        for day in dates:
+            # Card networks post a day late now and then
+            posted = day + timedelta(days=1) if rng.random() < 0.15 and frequency != 'yearly' else day
+            if posted > today:
+                posted = day
+            rows.append({
+                'user_id': user_id,
+                'description': f"{merchant.upper()} {rng.randint(1000, 9999)}",
+                'merchant_name': merchant,
+                'amount': round(amount + rng.uniform(-jitter, jitter), 2),
+                'date': posted,
+                'category': 'Income' if amount > 0 else 'Subscriptions',
+                'is_income': amount > 0,
+                'is_recurring': False,
+                'notes': None
+            })
+        day_of_month = dates[0].day if frequency in ('monthly', 'yearly') else None
+        day_of_week = dates[0].weekday() if frequency in ('weekly', 'bi-weekly') else None
+        expected[merchant] = (frequency, next_occurrence(frequency, dates[-1], today, day_of_month, day_of_week))
+    return rows, expected
+
+
+def run(sizes):
+    print("🔍 Recurring detector benchmark")
+    print("=" * 78)
+    print(f"{'transactions':>12} | {'detect ms':>9} | {'candidates':>10} | {'planted found':>13} | {'next_date right':>15}")
+
+    for size in sizes:
+        app = make_app()
+        with app.app_context():
+            rng = random.Random(3)
+            today = date.today()
+            user_id = seed_user()
+            rows, expected = planted_rows(user_id, today, rng)
+            seed_transactions(user_id, max(0, size - len(rows)), days=800)
+            db.session.execute(Transaction.__table__.insert(), rows)
+            db.session.commit()
+
+            best = None
+            for _ in range(3):
+                start = time.perf_counter()
+                candidates = detect_recurring(user_id, today=today)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+
+            by_merchant = {c.item.description: c for c in candidates}
+            found = sum(1 for m, (f, _) in expected.items() if m in by_merchant and by_merchant[m].item.frequency == f)
+            right_date = sum(1 for m, (_, d) in expected.items() if m in by_merchant and by_merchant[m].item.next_date == d)
+
+            print(f"{size:>12,} | {best * 1000:>9.1f} | {len(candidates):>10} | "
+                  f"{found:>6} / {len(expected):<4} | {right_date:>8} / {len(expected):<4}")
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,50000')
+    args = parser.parse_args()
+    run([int(s) for s in args.sizes.split(',')])
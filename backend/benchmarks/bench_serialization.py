@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark list serialization: ORM objects + to_dict() + jsonify against
+column projections + orjson
+
+Seeds one user with synthetic transactions and serializes a 10k-row
+transaction list page both ways, timing the query and the encoding
+separately and reporting the per-row cost. The two outputs are checked to
+decode to the same JSON.
+
+Usage: python benchmarks/bench_serialization.py [--rows 10000] [--repeat 5]
+       [--database-url URL]
+"""
+
+import argparse
+import json
+import time
+
+from flask import jsonify
+from sqlalchemy import desc
+
+from fixtures import make_app, seed_user, seed_transactions
+from models_simple import db, Transaction
+from services import serialization
+from services.serialization import TRANSACTION_FIELDS
+
+
+def orm_page(user_id, rows):
+    """What the list endpoints did before: hydrate objects, to_dict() each, jsonify"""
+    start = time.perf_counter()
+    transactions = Transaction.query.filter_by(user_id=user_id).order_by(
+        desc(Transaction.date), desc(Transaction.id)
+    ).limit(rows).all()
+    loaded = time.perf_counter()
+    body = jsonify({'transactions': [t.to_dict() for t in transactions]}).get_data()
+    return loaded - start, time.perf_counter() - loaded, body
+
+
+def projected_page(user_id, rows, encoder):
+    """Column tuples straight into the encoder"""
+    start = time.perf_counter()
+    result = Transaction.query.filter_by(user_id=user_id).order_by(
+        desc(Transaction.date), desc(Transaction.id)
+    ).with_entities(*TRANSACTION_FIELDS.columns).limit(rows).all()
+    loaded = time.perf_counter()
+    body = encoder({'transactions': TRANSACTION_FIELDS.dicts(result)})
+    return loaded - start, time.perf_counter() - loaded, body
+
+
+def stdlib_dumps(payload):
+    return json.dumps(payload, default=serialization._default, separators=(',', ':')).encode()
+
+
+def best_of(fn, repeat):
+    """Fastest (query, encode) seconds over repeat runs, with a fresh session each time"""
+    best = None
+    body = None
+    for _ in range(repeat):
+        db.session.remove()
+        query_seconds, encode_seconds, body = fn()
+        if best is None or query_seconds + encode_seconds < sum(best):
+            best = (query_seconds, encode_seconds)
+    return best, body
+
+
+def main(args):
+    app = make_app(args.database_url)
+    with app.app_context():
+        user_id = seed_user()
+        seed_transactions(user_id, args.rows, days=730)
+
+        cases = [('ORM + to_dict + jsonify', lambda: orm_page(user_id, args.rows))]
+        cases.append(('projection + json', lambda: projected_page(user_id, args.rows, stdlib_dumps)))
+        if serialization.orjson is not None:
+            cases.append(('projection + orjson', lambda: projected_page(user_id, args.rows, serialization.dumps)))
+        else:
+            print("orjson is not installed; skipping the orjson case")
+
+        results = [(name, *best_of(fn, args.repeat)) for name, fn in cases]
+
+    baseline = json.loads(results[0][2])
+    print(f"\n📦 Serializing {args.rows:,} transactions (best of {args.repeat})")
+    print("=" * 86)
+    print(f"{'path':<26} {'query ms':>9} {'encode ms':>10} {'total ms':>9} {'µs/row':>8} {'speedup':>8}  same")
+    base_total = sum(results[0][1])
+    for name, (query_seconds, encode_seconds), body in results:
+        total = query_seconds + encode_seconds
+        print(f"{name:<26} {query_seconds * 1000:>9.1f} {encode_seconds * 1000:>10.1f} {total * 1000:>9.1f} "
+              f"{total / args.rows * 1e6:>8.2f} {base_total / total:>7.1f}x  {json.loads(body) == baseline}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--database-url', help='defaults to in-memory SQLite')
+    main(parser.parse_args())
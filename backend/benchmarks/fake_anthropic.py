@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in for the Anthropic Messages API
+
+Serves POST /v1/messages with canned JSON answers for each prompt type that
+ClaudeService sends (single and batch categorization, spending analysis,
+daily recommendations, budget suggestions), with configurable latency and
+optional token streaming, so the real client code path can run without
+network access. Point the service at it with:
+
+    ANTHROPIC_API_KEY=offline ANTHROPIC_BASE_URL=http://127.0.0.1:8765
+
+GET /stats returns request counts per prompt type; POST /stats/reset clears
+them.
+
+Latency is "time to first token" drawn from a distribution:
+    fixed:0.4  uniform:0.2,0.9  normal:0.5,0.1  lognormal:-0.9,0.5
+(seconds; lognormal takes mu and sigma of the underlying normal). Output
+tokens then arrive at --tokens-per-second.
+
+Usage: python benchmarks/fake_anthropic.py [--port 8765] [--latency lognormal:-0.9,0.5]
+       [--tokens-per-second 80] [--error-rate 0.0]
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Prompt type -> a phrase only that prompt contains
+PROMPT_TYPES = [
+    ('categorize_batch', 'Categorize each of these financial transactions'),
+    ('categorize', 'Analyze this financial transaction'),
+    ('spending_analysis', 'Analyze these spending patterns'),
+    ('daily_recommendations', 'Provide personalized daily financial recommendations'),
+    ('budget_suggestions', 'Analyze budget vs actual spending'),
+]
+
+KEYWORDS = [
+    ('Food', ('coffee', 'starbucks', 'grocery', 'safeway', 'restaurant', 'pizza', 'chipotle')),
+    ('Transportation', ('uber', 'lyft', 'shell', 'chevron', 'gas', 'parking')),
+    ('Entertainment', ('netflix', 'spotify', 'cinema', 'hulu')),
+    ('Utilities', ('comcast', 'electric', 'pg&e', 'water')),
+    ('Income', ('payroll', 'deposit', 'salary')),
+]
+
+CHARS_PER_TOKEN = 4
+
+
+def parse_latency(spec):
+    """Turn a latency spec into a zero-argument sampler returning seconds"""
+    kind, _, params = spec.partition(':')
+    values = [float(v) for v in params.split(',') if v]
+    if kind == 'fixed':
+        return lambda: values[0]
+    if kind == 'uniform':
+        return lambda: random.uniform(values[0], values[1])
+    if kind == 'normal':
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == 'lognormal':
+        return lambda: random.lognormvariate(values[0], values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def prompt_type(prompt):
+    for name, marker in PROMPT_TYPES:
+        if marker in prompt:
+            return name
+    return 'other'
+
+
+def _category(text):
+    lowered = (text or '').lower()
+    for category, words in KEYWORDS:
+        if any(word in lowered for word in words):
+            return category
+    # Stable pseudo-random category for unknown merchants
+    choices = ['Shopping', 'Personal Care', 'Business', 'Other']
+    return choices[int(hashlib.md5(lowered.encode()).hexdigest(), 16) % len(choices)]
+
+
+def _categorization(description, merchant=None):
+    category = _category(f"{merchant or ''} {description}")
+    return {
+        'category': category,
+        'confidence': 0.9,
+        'subcategory': None,
+        'recurring_likelihood': 0.2,
+        'essential': category in ('Food', 'Utilities', 'Transportation'),
+        'note': f"Categorized as {category}"
+    }
+
+
+def canned_answer(kind, prompt):
+    """A plausible JSON answer for each ClaudeService prompt"""
+    if kind == 'categorize':
+        match = re.search(r'Transaction: (.*)\n', prompt)
+        merchant = re.search(r'Merchant: (.*)\n', prompt)
+        return json.dumps(_categorization(match.group(1) if match else '', merchant.group(1) if merchant else None))
+
+    if kind == 'categorize_batch':
+        start = prompt.index('[')
+        items, _ = json.JSONDecoder().raw_decode(prompt[start:])
+        return json.dumps([
+            dict(_categorization(item['description'], item.get('merchant')), id=item['id'])
+            for item in items
+        ])
+
+    if kind == 'spending_analysis':
+        return json.dumps({
+            'insights': [
+                'Food is your largest discretionary category this month',
+                'Weekend spending is about 40% higher than weekdays'
+            ],
+            'warnings': ['Shopping is trending above last month'],
+            'opportunities': ['Two streaming subscriptions overlap', 'Coffee purchases average $6 a day'],
+            'daily_allowance_adjustment': -0.05,
+            'top_categories': {'Food': 612.4, 'Shopping': 401.1, 'Transportation': 220.0},
+            'unusual_transactions': []
+        })
+
+    if kind == 'daily_recommendations':
+        return json.dumps({
+            'recommendations': ['Pack lunch today', 'Skip one coffee run'],
+            'daily_tip': 'Round-up savings add up quickly.',
+            'suggested_daily_limit': 45.0,
+            'focus_category': 'Food',
+            'motivation': 'You are on track this week.'
+        })
+
+    if kind == 'budget_suggestions':
+        budgets = {}
+        match = re.search(r'Current Budgets:\n(\{.*?\n\})', prompt, re.S)
+        if match:
+            budgets = json.loads(match.group(1))
+        return json.dumps({
+            'adjustments': {name: round(float(value) * 0.95, 2) for name, value in budgets.items()},
+            'rationale': {name: 'Trim 5% based on the last 3 months' for name in budgets},
+            'savings_potential': round(sum(float(v) for v in budgets.values()) * 0.05, 2),
+            'priority_adjustments': list(budgets)[:3],
+            'achievability_score': 0.8
+        })
+
+    return json.dumps({'text': 'ok'})
+
+
+class FakeAnthropicServer:
+    """Threaded HTTP server speaking enough of the Messages API for ClaudeService"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency='lognormal:-0.9,0.5',
+                 tokens_per_second=80.0, error_rate=0.0):
+        self.sample_latency = parse_latency(latency)
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self.stats = {}
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def count(self, kind, field, amount=1):
+        with self._lock:
+            entry = self.stats.setdefault(kind, {'requests': 0, 'errors': 0, 'input_tokens': 0, 'output_tokens': 0})
+            entry[field] += amount
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == '/stats':
+                    with server._lock:
+                        self._send_json(200, server.stats)
+                else:
+                    self._send_json(404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': 'Not found'}})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b'{}'
+
+                if self.path == '/stats/reset':
+                    server.reset_stats()
+                    self._send_json(200, {'reset': True})
+                    return
+                if self.path.split('?')[0] != '/v1/messages':
+                    self._send_json(404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': 'Not found'}})
+                    return
+
+                request = json.loads(raw)
+                prompt = ''.join(
+                    message['content'] if isinstance(message['content'], str)
+                    else ''.join(block.get('text', '') for block in message['content'])
+                    for message in request.get('messages', [])
+                )
+                kind = prompt_type(prompt)
+                input_tokens = len(prompt) // CHARS_PER_TOKEN + 1
+                server.count(kind, 'requests')
+                server.count(kind, 'input_tokens', input_tokens)
+
+                time.sleep(server.sample_latency())
+
+                if random.random() < server.error_rate:
+                    server.count(kind, 'errors')
+                    self._send_json(529, {'type': 'error', 'error': {'type': 'overloaded_error', 'message': 'Overloaded'}})
+                    return
+
+                text = canned_answer(kind, prompt)
+                output_tokens = len(text) // CHARS_PER_TOKEN + 1
+                server.count(kind, 'output_tokens', output_tokens)
+                message = {
+                    'id': f"msg_{uuid.uuid4().hex[:24]}",
+                    'type': 'message',
+                    'role': 'assistant',
+                    'model': request.get('model'),
+                    'content': [{'type': 'text', 'text': text}],
+                    'stop_reason': 'end_turn',
+                    'stop_sequence': None,
+                    'usage': {'input_tokens': input_tokens, 'output_tokens': output_tokens}
+                }
+
+                if request.get('stream'):
+                    self._stream(message, text)
+                else:
+                    # Non-streaming callers wait for the whole generation
+                    time.sleep(output_tokens / server.tokens_per_second)
+                    self._send_json(200, message)
+
+            def _event(self, name, data):
+                chunk = f"event: {name}\ndata: {json.dumps(data)}\n\n".encode()
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                self.wfile.flush()
+
+            def _stream(self, message, text):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+
+                start = dict(message, content=[], stop_reason=None,
+                             usage={'input_tokens': message['usage']['input_tokens'], 'output_tokens': 1})
+                self._event('message_start', {'type': 'message_start', 'message': start})
+                self._event('content_block_start', {
+                    'type': 'content_block_start', 'index': 0, 'content_block': {'type': 'text', 'text': ''}
+                })
+                self._event('ping', {'type': 'ping'})
+
+                delay = CHARS_PER_TOKEN / server.tokens_per_second
+                for offset in range(0, len(text), CHARS_PER_TOKEN):
+                    time.sleep(delay)
+                    self._event('content_block_delta', {
+                        'type': 'content_block_delta', 'index': 0,
+                        'delta': {'type': 'text_delta', 'text': text[offset:offset + CHARS_PER_TOKEN]}
+                    })
+
+                self._event('content_block_stop', {'type': 'content_block_stop', 'index': 0})
+                self._event('message_delta', {
+                    'type': 'message_delta',
+                    'delta': {'stop_reason': 'end_turn', 'stop_sequence': None},
+                    'usage': {'output_tokens': message['usage']['output_tokens']}
+                })
+                self._event('message_stop', {'type': 'message_stop'})
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', default='lognormal:-0.9,0.5',
+                        help='time to first token distribution, e.g. fixed:0.4 or uniform:0.2,0.9')
+    parser.add_argument('--tokens-per-second', type=float, default=80.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered 529 overloaded')
+    args = parser.parse_args()
+
+    server = FakeAnthropicServer(args.host, args.port, args.latency, args.tokens_per_second, args.error_rate)
+    print(f"Fake Anthropic API listening on {server.base_url} (latency {args.latency}, "
+          f"{args.tokens_per_second:g} tokens/s, error rate {args.error_rate:g})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,114 @@
+"""
+Shared setup for the benchmark scripts
+
+Creates a standalone Flask app on a throwaway database and seeds it with
+synthetic users, accounts and transactions, without importing app.py (which
+registers every blueprint and talks to external services).
+"""
+
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from models_simple import db, User, Account, Transaction
+
+MERCHANTS = [
+    ('Starbucks', 'Food', 3, 9), ('Safeway', 'Food', 20, 180), ('Chipotle', 'Food', 9, 30),
+    ('Shell', 'Transportation', 25, 80), ('Uber', 'Transportation', 8, 45),
+    ('Amazon', 'Shopping', 10, 250), ('Target', 'Shopping', 15, 150),
+    ('Netflix', 'Entertainment', 15, 15), ('Spotify', 'Entertainment', 11, 11),
+    ('Comcast', 'Utilities', 80, 80), ('PG&E', 'Utilities', 60, 160),
+    ('CVS Pharmacy', 'Healthcare', 5, 90), ('Geico', 'Insurance', 120, 120),
+    ('Delta Air Lines', 'Travel', 150, 700), ('Landlord LLC', 'Housing', 2100, 2100)
+]
+
+
+def make_app(database_url=None):
+    """Flask app bound to models_simple.db; defaults to an in-memory SQLite database"""
+    app = Flask('benchmarks')
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url or 'sqlite://'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['JWT_SECRET_KEY'] = 'benchmark-secret-key-not-for-production'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def make_api_app(database_url=None, blueprints=()):
+    """make_app plus JWT and the given blueprints, for benchmarking routes"""
+    from flask_jwt_extended import JWTManager
+    app = make_app(database_url)
+    JWTManager(app)
+    for blueprint in blueprints:
+        app.register_blueprint(blueprint)
+    return app
+
+
+def auth_headers(app, user_id):
+    """Authorization header for the user, as the frontend sends it"""
+    from flask_jwt_extended import create_access_token
+    with app.app_context():
+        token = create_access_token(identity=str(user_id))
+    return {'Authorization': f'Bearer {token}'}
+
+
+def seed_user(email='bench@example.com', balance=5000):
+    """Create a user with one checking account; returns the user id"""
+    user = User(email=email, first_name='Bench')
+    user.set_password('benchmark')
+    db.session.add(user)
+    db.session.flush()
+    db.session.add(Account(
+        user_id=user.id,
+        name='Checking',
+        account_type='checking',
+        current_balance=balance,
+        institution_name='Bench Bank'
+    ))
+    db.session.commit()
+    return user.id
+
+
+def seed_transactions(user_id, count, days=365, seed=7, chunk_size=5000):
+    """Insert synthetic transactions with multi-row INSERTs; roughly 1 in 15 is income"""
+    rng = random.Random(seed)
+    today = date.today()
+    rows = []
+    for i in range(count):
+        txn_date = today - timedelta(days=rng.randint(0, days - 1))
+        if rng.random() < 1 / 15:
+            rows.append({
+                'user_id': user_id,
+                'description': 'ACME CORP PAYROLL',
+                'merchant_name': None,
+                'amount': round(rng.uniform(1500, 3500), 2),
+                'date': txn_date,
+                'category': 'Income',
+                'is_income': True,
+                'is_recurring': False,
+                'notes': None
+            })
+            continue
+        name, category, low, high = rng.choice(MERCHANTS)
+        rows.append({
+            'user_id': user_id,
+            'description': f"{name.upper()} #{rng.randint(100, 9999)}",
+            'merchant_name': name,
+            'amount': -round(rng.uniform(low, high), 2),
+            'date': txn_date,
+            'category': category,
+            'is_income': False,
+            'is_recurring': False,
+            'notes': 'Synthetic benchmark row' if i % 10 == 0 else None
+        })
+        if len(rows) >= chunk_size:
+            db.session.execute(Transaction.__table__.insert(), rows)
+            rows = []
+    if rows:
+        db.session.execute(Transaction.__table__.insert(), rows)
+    db.session.commit()
@@ -5,17 +5,77 @@ Claude AI Service for intelligent financial insights and recommendations
 import os
 import json
 import logging
+import time
+import queue
+import threading
+import functools
+from contextvars import ContextVar
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import func
 try:
     import anthropic
 except ImportError:
     anthropic = None
-from models_simple import Transaction, Account, User, RecurringItem, db
+from models_simple import Transaction, Account, User, RecurringItem, ApprovedCategory, db
+from services.categorization_cache import categorization_cache, make_cache_key
+from services.fast_categorizer import fast_categorizer
+from services.category_spend import average_monthly_spend
+from services.spending_summary import summarize_spending, fit_to_budget, compact_json, estimate_tokens
+from services.json_stream import JSONSectionParser
+from services.ai_guard import model_guard, ModelUnavailable
+from services.ai_metrics import ai_metrics
 
 logger = logging.getLogger(__name__)
 
+TRANSACTION_CATEGORIES = [
+    'Housing', 'Transportation', 'Food', 'Shopping', 'Entertainment', 'Healthcare',
+    'Education', 'Personal Care', 'Gifts', 'Travel', 'Business', 'Utilities',
+    'Insurance', 'Savings', 'Investment', 'Debt Payment', 'Income', 'Other'
+]
+
+# The ClaudeService operation in progress on this thread: {'name', 'model_calls'}
+_current_operation: ContextVar[Optional[Dict]] = ContextVar('claude_operation', default=None)
+
+def instrumented(operation: str):
+    """
+    Attribute a method's model calls to operation and record how each of
+    its answers was produced; nested instrumented calls count toward the
+    outermost operation
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if _current_operation.get() is not None:
+                return method(*args, **kwargs)
+            
+            context = {'name': operation, 'model_calls': 0}
+            token = _current_operation.set(context)
+            try:
+                result = method(*args, **kwargs)
+            finally:
+                _current_operation.reset(token)
+            
+            for answer in result if isinstance(result, list) else [result]:
+                source = answer.get('source')
+                if source is None:
+                    source = 'fallback' if answer.get('fallback') else ('llm' if context['model_calls'] else 'local')
+                ai_metrics.record_answer(operation, source, answer.get('cache_hit', False), answer.get('fallback'))
+            return result
+        return wrapper
+    return decorator
+
 class ClaudeService:
+    # Transactions packed into one batch categorization prompt
+    CATEGORIZE_BATCH_SIZE = 25
+    
+    # Upper bound on the spending summary embedded in analysis prompts
+    SPENDING_PROMPT_TOKEN_BUDGET = 1500
+    
+    # Per-request HTTP timeout and SDK retries; the circuit breaker handles sustained failures
+    REQUEST_TIMEOUT_SECONDS = float(os.environ.get('AI_REQUEST_TIMEOUT', '30'))
+    MAX_RETRIES = 1
+    
     def __init__(self):
         """Initialize Claude service"""
         self.api_key = os.environ.get('ANTHROPIC_API_KEY')
@@ -23,7 +83,13 @@ class ClaudeService:
         
         if self.api_key and anthropic:
             try:
-                self.client = anthropic.Anthropic(api_key=self.api_key)
+                self.client = anthropic.Anthropic(
+                    api_key=self.api_key,
+                    # Unset means the public API; benchmarks point this at benchmarks/fake_anthropic.py
+                    base_url=os.environ.get('ANTHROPIC_BASE_URL') or None,
+                    timeout=self.REQUEST_TIMEOUT_SECONDS,
+                    max_retries=self.MAX_RETRIES
+                )
                 logger.info("Claude service initialized successfully")
             except Exception as e:
                 logger.error(f"Failed to initialize Claude client: {e}")
@@ -38,13 +104,82 @@ class ClaudeService:
         """Check if Claude service is available"""
         return self.client is not None
     
+    def _call_model(self, **kwargs):
+        """
+        messages.create through the process-wide rate limit, concurrency
+        limit and circuit breaker, recorded in ai_metrics
+        """
+        context = _current_operation.get()
+        operation = context['name'] if context else 'unattributed'
+        model = kwargs.get('model')
+        start = time.perf_counter()
+        try:
+            response = model_guard.call(self.client.messages.create, **kwargs)
+        except ModelUnavailable as e:
+            ai_metrics.record_call(operation, model, 0.0, rejected=e.reason)
+            raise
+        except Exception as e:
+            ai_metrics.record_call(operation, model, time.perf_counter() - start, error=type(e).__name__)
+            raise
+        
+        if context:
+            context['model_calls'] += 1
+        usage = getattr(response, 'usage', None)
+        ai_metrics.record_call(
+            operation, model, time.perf_counter() - start,
+            input_tokens=getattr(usage, 'input_tokens', 0) or 0,
+            output_tokens=getattr(usage, 'output_tokens', 0) or 0
+        )
+        return response
+    
+    @staticmethod
+    def _fallback_reason(error: Exception) -> str:
+        return error.reason if isinstance(error, ModelUnavailable) else 'error'
+    
+    @staticmethod
+    def _report(result: Dict, fallback: Optional[str] = None) -> Dict:
+        """
+        Tag a result with fallback (None when the answer did not need the
+        local fallback, otherwise why it was used: unavailable, circuit_open,
+        rate_limited, busy or error) and the current circuit_state
+        """
+        result['fallback'] = fallback
+        result['circuit_state'] = model_guard.breaker.state
+        return result
+    
+    @instrumented('categorize')
     def categorize_transaction(self, transaction_description: str, amount: float, 
-                             merchant_name: Optional[str] = None) -> Dict[str, any]:
-        """Use Claude to intelligently categorize a transaction"""
+                             merchant_name: Optional[str] = None, user_id=None) -> Dict[str, any]:
+        """
+        Categorize a transaction, calling Claude only when cheaper tiers can't
+        
+        Tiers: the user's approved category for the merchant (when user_id
+        is given), then the cached model answer for the normalized merchant,
+        then the local keyword matcher, then Claude. The result's source
+        says which tier answered ('cache', 'local', 'llm' or 'fallback') and
+        cache_hit whether the cache was used.
+        """
+        
+        local = fast_categorizer.categorize(transaction_description, amount, merchant_name, user_id=user_id)
+        if local['approved']:
+            local.update(cache_hit=False, source='local')
+            return self._report(local)
+        
+        cache_key = make_cache_key(transaction_description, amount, merchant_name)
+        cached = categorization_cache.get(cache_key)
+        if cached is not None:
+            cached.update(cache_hit=True, source='cache')
+            return self._report(cached)
+        
+        if fast_categorizer.is_confident(local):
+            local.update(cache_hit=False, source='local')
+            return self._report(local)
         
         if not self.is_available():
             # Mock response for development
-            return self._mock_categorize_transaction(transaction_description, amount)
+            result = self._mock_categorize_transaction(transaction_description, amount, merchant_name, user_id)
+            result['cache_hit'] = False
+            return self._report(result, 'unavailable')
         
         try:
             prompt = f"""Analyze this financial transaction and provide categorization:
@@ -55,7 +190,7 @@ Merchant: {merchant_name or 'Unknown'}
 Type: {'Income' if amount > 0 else 'Expense'}
 
 Provide a JSON response with:
-1. category: The most appropriate category from this list: [Housing, Transportation, Food, Shopping, Entertainment, Healthcare, Education, Personal Care, Gifts, Travel, Business, Utilities, Insurance, Savings, Investment, Debt Payment, Income, Other]
+1. category: The most appropriate category from this list: [{', '.join(TRANSACTION_CATEGORIES)}]
 2. confidence: Your confidence level (0-1)
 3. subcategory: A more specific subcategory
 4. recurring_likelihood: Likelihood this is a recurring transaction (0-1)
@@ -64,7 +199,7 @@ Provide a JSON response with:
 
 Respond only with valid JSON."""
 
-            response = self.client.messages.create(
+            response = self._call_model(
                 model="claude-3-haiku-20240307",
                 max_tokens=300,
                 temperature=0,
@@ -72,55 +207,211 @@ Respond only with valid JSON."""
             )
             
             result = json.loads(response.content[0].text)
-            return result
+            categorization_cache.put(cache_key, result)
+            result.update(cache_hit=False, source='llm')
+            return self._report(result)
             
         except Exception as e:
             logger.error(f"Error categorizing transaction: {e}")
-            return self._mock_categorize_transaction(transaction_description, amount)
+            result = self._mock_categorize_transaction(transaction_description, amount, merchant_name, user_id)
+            result['cache_hit'] = False
+            return self._report(result, self._fallback_reason(e))
+    
+    @instrumented('categorize_batch')
+    def categorize_transactions(self, transactions: List[Dict], batch_size: Optional[int] = None,
+                                user_id=None) -> List[Dict]:
+        """
+        Categorize many transactions with one model request per batch
+        
+        Each item needs description and amount (merchant_name and id are
+        optional). Results are returned in input order and carry the item's
+        id. Cache hits never reach the API, repeated merchants in one call
+        are sent once, and items missing from a batch answer fall back to
+        individual categorize_transaction requests. With user_id, the user's
+        approved categories are applied first.
+        """
+        batch_size = batch_size or self.CATEGORIZE_BATCH_SIZE
+        results: List[Optional[Dict]] = [None] * len(transactions)
+        
+        # Resolve approvals, cache hits and confident local matches; group the rest by cache key
+        pending = {}
+        for index, item in enumerate(transactions):
+            amount = float(item['amount'])
+            local = fast_categorizer.categorize(item['description'], amount, item.get('merchant_name'), user_id=user_id)
+            if local['approved']:
+                local.update(cache_hit=False, source='local')
+                results[index] = self._report(local)
+                continue
+            
+            cache_key = make_cache_key(item['description'], amount, item.get('merchant_name'))
+            cached = categorization_cache.get(cache_key)
+            if cached is not None:
+                cached.update(cache_hit=True, source='cache')
+                results[index] = self._report(cached)
+                continue
+            
+            if fast_categorizer.is_confident(local):
+                local.update(cache_hit=False, source='local')
+                results[index] = self._report(local)
+                continue
+            
+            group_key = cache_key or f"item:{index}"
+            pending.setdefault(group_key, []).append(index)
+        
+        groups = list(pending.items())
+        remaining = groups
+        fallback = None if self.is_available() else 'unavailable'
+        if fallback is None:
+            for start in range(0, len(groups), batch_size):
+                chunk = groups[start:start + batch_size]
+                try:
+                    answers = self._categorize_batch([transactions[indexes[0]] for _, indexes in chunk])
+                except ModelUnavailable as e:
+                    # The guard refused; don't try the rest one by one
+                    fallback = e.reason
+                    remaining = groups[start:]
+                    break
+                
+                for position, (group_key, indexes) in enumerate(chunk):
+                    answer = answers.get(position)
+                    if answer is None:
+                        first = transactions[indexes[0]]
+                        answer = self.categorize_transaction(
+                            first['description'], float(first['amount']), first.get('merchant_name'), user_id
+                        )
+                    else:
+                        answer['source'] = 'llm'
+                        if not group_key.startswith('item:'):
+                            categorization_cache.put(group_key, answer)
+                        self._report(answer)
+                    
+                    for index in indexes:
+                        results[index] = dict(answer, cache_hit=answer.get('cache_hit', False))
+            else:
+                remaining = []
+        
+        for _, indexes in remaining:
+            for index in indexes:
+                item = transactions[index]
+                results[index] = self._mock_categorize_transaction(
+                    item['description'], float(item['amount']), item.get('merchant_name'), user_id
+                )
+                results[index]['cache_hit'] = False
+                self._report(results[index], fallback)
+        
+        for item, result in zip(transactions, results):
+            if 'id' in item:
+                result['id'] = item['id']
+        
+        return results
+    
+    def _categorize_batch(self, items: List[Dict]) -> Dict[int, Dict]:
+        """Send one batch prompt; returns answers keyed by position in items"""
+        payload = []
+        for position, item in enumerate(items):
+            amount = float(item['amount'])
+            payload.append({
+                'id': f"t{position}",
+                'description': item['description'],
+                'amount': abs(amount),
+                'merchant': item.get('merchant_name') or 'Unknown',
+                'type': 'Income' if amount > 0 else 'Expense'
+            })
+        
+        prompt = f"""Categorize each of these financial transactions:
+
+{json.dumps(payload)}
+
+For every transaction, return an object with:
+1. id: The transaction's id, unchanged
+2. category: The most appropriate category from this list: [{', '.join(TRANSACTION_CATEGORIES)}]
+3. confidence: Your confidence level (0-1)
+4. subcategory: A more specific subcategory
+5. recurring_likelihood: Likelihood this is a recurring transaction (0-1)
+6. essential: Whether this is an essential expense (true/false)
+7. note: A brief note about the transaction (max 50 chars)
+
+Respond only with a valid JSON array containing one object per transaction."""
+        
+        try:
+            response = self._call_model(
+                model="claude-3-haiku-20240307",
+                max_tokens=min(4096, 120 * len(items) + 100),
+                temperature=0,
+                messages=[{"role": "user", "content": prompt}]
+            )
+            
+            text = response.content[0].text
+            parsed = json.loads(text[text.index('['):text.rindex(']') + 1])
+        except ModelUnavailable:
+            raise
+        except Exception as e:
+            logger.error(f"Error in batch categorization of {len(items)} transactions: {e}")
+            return {}
+        
+        answers = {}
+        for answer in parsed if isinstance(parsed, list) else []:
+            if not isinstance(answer, dict) or not answer.get('category'):
+                continue
+            answer_id = str(answer.pop('id', ''))
+            if answer_id.startswith('t') and answer_id[1:].isdigit():
+                position = int(answer_id[1:])
+                if position < len(items):
+                    answers[position] = answer
+        
+        return answers
     
+    @instrumented('analyze_spending')
     def analyze_spending_patterns(self, user_id: int, days: int = 30) -> Dict[str, any]:
         """Analyze user's spending patterns and provide insights"""
         
-        # Get user's recent transactions
-        end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=days)
+        summary, prompt = self._build_spending_prompt(user_id, days)
         
-        transactions = Transaction.query.filter_by(user_id=user_id).filter(
-            Transaction.date >= start_date,
-            Transaction.date <= end_date
-        ).all()
-        
-        if not transactions:
-            return {
+        if summary['transaction_count'] == 0:
+            return self._report({
                 "insights": [],
                 "warnings": [],
                 "opportunities": [],
                 "daily_allowance_adjustment": 0
-            }
+            })
         
         if not self.is_available():
-            return self._mock_spending_analysis(transactions)
+            return self._report(self._mock_spending_analysis(summary), 'unavailable')
         
         try:
-            # Prepare transaction data for Claude
-            transaction_data = []
-            for t in transactions:
-                transaction_data.append({
-                    "date": t.date.isoformat(),
-                    "description": t.description,
-                    "amount": float(t.amount),
-                    "category": t.category,
-                    "is_income": t.is_income
-                })
+            response = self._call_model(
+                model="claude-3-sonnet-20240229",
+                max_tokens=1000,
+                temperature=0.3,
+                messages=[{"role": "user", "content": prompt}]
+            )
             
-            # Get user's account balance
-            total_balance = sum(float(a.current_balance) for a in Account.query.filter_by(user_id=user_id, is_active=True).all())
+            result = json.loads(response.content[0].text)
+            return self._report(result)
             
-            prompt = f"""Analyze these spending patterns and provide actionable insights:
+        except Exception as e:
+            logger.error(f"Error analyzing spending patterns: {e}")
+            return self._report(self._mock_spending_analysis(summary), self._fallback_reason(e))
+    
+    def _build_spending_prompt(self, user_id: int, days: int) -> Tuple[Dict, str]:
+        """Summarize the window in SQL and build the analysis prompt within SPENDING_PROMPT_TOKEN_BUDGET"""
+        end_date = datetime.now().date()
+        start_date = end_date - timedelta(days=days)
+        
+        summary = summarize_spending(user_id, start_date, end_date)
+        
+        total_balance = db.session.query(func.sum(Account.current_balance)).filter(
+            Account.user_id == user_id,
+            Account.is_active == True
+        ).scalar() or 0
+        
+        compact = fit_to_budget(summary, self.SPENDING_PROMPT_TOKEN_BUDGET)
+        
+        prompt = f"""Analyze these spending patterns and provide actionable insights:
 
-Current Balance: ${total_balance}
-Transactions (last {days} days):
-{json.dumps(transaction_data, indent=2)}
+Current Balance: ${float(total_balance):.2f}
+Spending summary (last {days} days, {summary['transaction_count']} transactions; amounts in dollars):
+{compact_json(compact)}
 
 Provide a JSON response with:
 1. insights: Array of 2-3 key insights about spending patterns
@@ -131,34 +422,39 @@ Provide a JSON response with:
 6. unusual_transactions: Any transactions that seem unusual or concerning
 
 Be specific and actionable. Focus on helping the user save money and spend wisely."""
-
-            response = self.client.messages.create(
-                model="claude-3-sonnet-20240229",
-                max_tokens=1000,
-                temperature=0.3,
-                messages=[{"role": "user", "content": prompt}]
-            )
-            
-            result = json.loads(response.content[0].text)
-            return result
-            
-        except Exception as e:
-            logger.error(f"Error analyzing spending patterns: {e}")
-            return self._mock_spending_analysis(transactions)
+        
+        logger.info(
+            f"Spending prompt for user {user_id}: {summary['transaction_count']} transactions "
+            f"summarized into ~{estimate_tokens(prompt)} tokens"
+        )
+        
+        return summary, prompt
     
-    def get_daily_recommendations(self, user_id: int) -> Dict[str, any]:
-        """Get personalized daily financial recommendations"""
+    @instrumented('daily_recommendations')
+    def get_daily_recommendations(self, user_id: int, pending_spend: float = 0.0,
+                                  as_of: Optional[datetime] = None) -> Dict[str, any]:
+        """
+        Get personalized daily financial recommendations
+
+        pending_spend is spending from today that is not committed yet (a
+        transaction still being processed) and is counted as already spent.
+        With as_of, only transactions created before that time are read, so
+        the pending transaction is not counted twice if it commits meanwhile.
+        """
         
         user = User.query.get(user_id)
         if not user:
-            return {"recommendations": [], "daily_tip": ""}
+            return self._report({"recommendations": [], "daily_tip": ""})
         
         # Get today's transactions
         today = datetime.now().date()
-        today_transactions = Transaction.query.filter_by(
+        today_query = Transaction.query.filter_by(
             user_id=user_id,
             date=today
-        ).all()
+        )
+        if as_of is not None:
+            today_query = today_query.filter(Transaction.created_at < as_of)
+        today_transactions = today_query.all()
         
         # Get recurring transactions
         recurring = RecurringItem.query.filter_by(
@@ -169,16 +465,17 @@ Be specific and actionable. Focus on helping the user save money and spend wisel
         # Calculate current daily allowance
         accounts = Account.query.filter_by(user_id=user_id, is_active=True).all()
         total_balance = sum(float(a.current_balance) for a in accounts)
+        today_spent = sum(abs(float(t.amount)) for t in today_transactions if not t.is_income) + pending_spend
         
         if not self.is_available():
-            return self._mock_daily_recommendations(total_balance, today_transactions)
+            return self._report(self._mock_daily_recommendations(total_balance, today_transactions), 'unavailable')
         
         try:
             prompt = f"""Provide personalized daily financial recommendations:
 
 User: {user.first_name}
 Current Balance: ${total_balance}
-Today's Spending So Far: ${sum(abs(float(t.amount)) for t in today_transactions if not t.is_income)}
+Today's Spending So Far: ${today_spent}
 Recurring Expenses: {len(recurring)} active
 
 Based on the user's financial situation, provide:
@@ -190,7 +487,7 @@ Based on the user's financial situation, provide:
 
 Keep recommendations practical and achievable. Be encouraging but realistic."""
 
-            response = self.client.messages.create(
+            response = self._call_model(
                 model="claude-3-haiku-20240307",
                 max_tokens=500,
                 temperature=0.7,
@@ -198,40 +495,46 @@ Keep recommendations practical and achievable. Be encouraging but realistic."""
             )
             
             result = json.loads(response.content[0].text)
-            return result
+            return self._report(result)
             
         except Exception as e:
             logger.error(f"Error getting daily recommendations: {e}")
-            return self._mock_daily_recommendations(total_balance, today_transactions)
+            return self._report(
+                self._mock_daily_recommendations(total_balance, today_transactions),
+                self._fallback_reason(e)
+            )
     
+    @instrumented('budget_suggestions')
     def suggest_budget_adjustments(self, user_id: int, category_budgets: Dict[str, float]) -> Dict[str, any]:
         """Suggest budget adjustments based on spending patterns"""
         
-        # Get last 3 months of transactions
-        end_date = datetime.now().date()
-        start_date = end_date - timedelta(days=90)
-        
-        transactions = Transaction.query.filter_by(user_id=user_id).filter(
-            Transaction.date >= start_date,
-            Transaction.date <= end_date,
-            Transaction.is_income == False
-        ).all()
-        
         if not self.is_available():
-            return self._mock_budget_suggestions(category_budgets)
+            return self._report(self._mock_budget_suggestions(category_budgets), 'unavailable')
         
         try:
-            # Calculate actual spending by category
-            category_spending = {}
-            for t in transactions:
-                cat = t.category or 'Other'
-                category_spending[cat] = category_spending.get(cat, 0) + abs(float(t.amount))
+            prompt = self._build_budget_prompt(user_id, category_budgets)
+            
+            response = self._call_model(
+                model="claude-3-sonnet-20240229",
+                max_tokens=800,
+                temperature=0.3,
+                messages=[{"role": "user", "content": prompt}]
+            )
             
-            # Average monthly spending by category
-            for cat in category_spending:
-                category_spending[cat] = category_spending[cat] / 3  # 3 months
+            result = json.loads(response.content[0].text)
+            return self._report(result)
             
-            prompt = f"""Analyze budget vs actual spending and suggest adjustments:
+        except Exception as e:
+            logger.error(f"Error suggesting budget adjustments: {e}")
+            return self._report(self._mock_budget_suggestions(category_budgets), self._fallback_reason(e))
+    
+    def _build_budget_prompt(self, user_id: int, category_budgets: Dict[str, float]) -> str:
+        """Compare budgets with the last 3 months of spending"""
+        
+        # Average monthly spending by category over the last 3 months, one GROUP BY
+        category_spending = average_monthly_spend(user_id, months=3, end_date=datetime.now().date())
+        
+        return f"""Analyze budget vs actual spending and suggest adjustments:
 
 Current Budgets:
 {json.dumps(category_budgets, indent=2)}
@@ -247,60 +550,174 @@ Provide budget adjustment recommendations:
 5. achievability_score: How realistic these adjustments are (0-1)
 
 Be realistic and consider both over and under-budgeted categories."""
-
-            response = self.client.messages.create(
-                model="claude-3-sonnet-20240229",
-                max_tokens=800,
-                temperature=0.3,
-                messages=[{"role": "user", "content": prompt}]
-            )
+    
+    def stream_spending_analysis(self, user_id: int, days: int = 30) -> Iterator[Tuple[str, Dict]]:
+        """Streaming analyze_spending_patterns; yields (event, data) pairs, see _stream_json_sections"""
+        
+        summary, prompt = self._build_spending_prompt(user_id, days)
+        
+        if summary['transaction_count'] == 0:
+            return self._replay_sections({
+                "insights": [],
+                "warnings": [],
+                "opportunities": [],
+                "daily_allowance_adjustment": 0
+            }, source='empty', operation='analyze_spending')
+        
+        return self._stream_json_sections(
+            'analyze_spending',
+            prompt,
+            model="claude-3-sonnet-20240229",
+            max_tokens=1000,
+            fallback=lambda: self._mock_spending_analysis(summary)
+        )
+    
+    def stream_budget_suggestions(self, user_id: int, category_budgets: Dict[str, float]) -> Iterator[Tuple[str, Dict]]:
+        """Streaming suggest_budget_adjustments; yields (event, data) pairs, see _stream_json_sections"""
+        
+        return self._stream_json_sections(
+            'budget_suggestions',
+            self._build_budget_prompt(user_id, category_budgets),
+            model="claude-3-sonnet-20240229",
+            max_tokens=800,
+            fallback=lambda: self._mock_budget_suggestions(category_budgets)
+        )
+    
+    def _stream_json_sections(self, operation: str, prompt: str, model: str, max_tokens: int,
+                              fallback: Callable[[], Dict]) -> Iterator[Tuple[str, Dict]]:
+        """
+        Stream a JSON answer from the Messages API
+        
+        Yields ("delta", {"text"}) for each text chunk, ("section", {"key",
+        "value"}) as each top-level member of the JSON answer completes, and
+        finally ("done", {"result", "source", "fallback", "circuit_state"}).
+        If the model is unavailable or the stream fails, the fallback's
+        sections that were not already sent are replayed instead.
+        
+        The upstream stream is read on its own thread into a queue, so the
+        model_guard slot is held only while the model is answering, however
+        slowly the client reads. The call is recorded in ai_metrics under
+        operation with its upstream duration.
+        """
+        if not self.is_available():
+            yield from self._replay_sections(fallback(), source='fallback', fallback='unavailable', operation=operation)
+            return
+        
+        parser = JSONSectionParser()
+        chunks = queue.Queue()
+        closed = threading.Event()
+        
+        def pump():
+            start = time.perf_counter()
+            try:
+                with model_guard.slot() as timer, self.client.messages.stream(
+                    model=model,
+                    max_tokens=max_tokens,
+                    temperature=0.3,
+                    messages=[{"role": "user", "content": prompt}]
+                ) as stream:
+                    for text in stream.text_stream:
+                        timer.first_output()
+                        chunks.put(('text', text))
+                        if closed.is_set():
+                            # The client went away; stop reading upstream
+                            return
+                    usage = getattr(stream.get_final_message(), 'usage', None)
+                chunks.put(('end', (usage, time.perf_counter() - start)))
+            except Exception as e:
+                chunks.put(('error', (e, time.perf_counter() - start)))
+        
+        threading.Thread(target=pump, name=f"stream-{operation}", daemon=True).start()
+        try:
+            while True:
+                kind, payload = chunks.get()
+                if kind == 'text':
+                    yield 'delta', {'text': payload}
+                    for key, value in parser.feed(payload):
+                        yield 'section', {'key': key, 'value': value}
+                    continue
+                if kind == 'error':
+                    error, seconds = payload
+                    if isinstance(error, ModelUnavailable):
+                        ai_metrics.record_call(operation, model, 0.0, streamed=True, rejected=error.reason)
+                    else:
+                        ai_metrics.record_call(operation, model, seconds, streamed=True, error=type(error).__name__)
+                    raise error
+                usage, seconds = payload
+                ai_metrics.record_call(
+                    operation, model, seconds, streamed=True,
+                    input_tokens=getattr(usage, 'input_tokens', 0) or 0,
+                    output_tokens=getattr(usage, 'output_tokens', 0) or 0
+                )
+                break
             
-            result = json.loads(response.content[0].text)
-            return result
+            result = parser.result()
+            if result is None:
+                raise ValueError("streamed answer was not a complete JSON object")
+            ai_metrics.record_answer(operation, 'llm')
+            yield 'done', self._report({'result': result, 'source': 'llm'})
             
         except Exception as e:
-            logger.error(f"Error suggesting budget adjustments: {e}")
-            return self._mock_budget_suggestions(category_budgets)
+            logger.error(f"Error streaming {model} answer: {e}")
+            yield from self._replay_sections(
+                fallback(), source='fallback', sent=parser.sections, fallback=self._fallback_reason(e),
+                operation=operation
+            )
+        finally:
+            closed.set()
+    
+    def _replay_sections(self, result: Dict, source: str, sent: Optional[Dict] = None,
+                         fallback: Optional[str] = None, operation: Optional[str] = None) -> Iterator[Tuple[str, Dict]]:
+        """Emit a ready-made answer as section events; keeps sections already sent"""
+        sent = dict(sent or {})
+        for key, value in result.items():
+            if key not in sent:
+                sent[key] = value
+                yield 'section', {'key': key, 'value': value}
+        if operation:
+            ai_metrics.record_answer(operation, source, fallback=fallback)
+        yield 'done', self._report({'result': sent, 'source': source}, fallback)
+    
+    def record_approved_category(self, user_id, transaction_description: str, amount: float,
+                                 merchant_name: Optional[str], category: str):
+        """
+        Remember a user-approved category for the merchant; it applies to
+        this user's transactions only. Commits, so call it after the
+        caller's own changes are committed.
+        """
+        cache_key = make_cache_key(transaction_description, amount, merchant_name)
+        if not cache_key:
+            return
+        try:
+            row = ApprovedCategory.query.filter_by(user_id=int(user_id), cache_key=cache_key).first()
+            if row is None:
+                row = ApprovedCategory(user_id=int(user_id), cache_key=cache_key)
+                db.session.add(row)
+            row.category = category
+            row.subcategory = None
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Could not record approved category for user {user_id}: {e}")
+        fast_categorizer.invalidate(user_id)
     
     # Mock methods for development/testing
-    def _mock_categorize_transaction(self, description: str, amount: float) -> Dict[str, any]:
-        """Mock categorization for development"""
-        description_lower = description.lower()
-        
-        # Simple keyword-based categorization
-        if any(word in description_lower for word in ['grocery', 'safeway', 'whole foods', 'trader joe']):
-            category = 'Food'
-            subcategory = 'Groceries'
-        elif any(word in description_lower for word in ['gas', 'shell', 'chevron', 'exxon']):
-            category = 'Transportation'
-            subcategory = 'Gas'
-        elif any(word in description_lower for word in ['netflix', 'spotify', 'hulu', 'disney']):
-            category = 'Entertainment'
-            subcategory = 'Streaming Services'
-        elif any(word in description_lower for word in ['rent', 'mortgage']):
-            category = 'Housing'
-            subcategory = 'Rent/Mortgage'
-        else:
-            category = 'Other'
-            subcategory = 'General'
-        
-        return {
-            "category": category,
-            "confidence": 0.8,
-            "subcategory": subcategory,
-            "recurring_likelihood": 0.3,
-            "essential": category in ['Housing', 'Transportation', 'Food'],
-            "note": f"Auto-categorized as {category}"
-        }
+    def _mock_categorize_transaction(self, description: str, amount: float,
+                                     merchant_name: Optional[str] = None, user_id=None) -> Dict[str, any]:
+        """Fallback categorization from the local matcher, whatever its confidence"""
+        result = fast_categorizer.categorize(description, amount, merchant_name, user_id=user_id)
+        result['note'] = f"Auto-categorized as {result['category']}"
+        result['source'] = 'fallback'
+        return result
     
-    def _mock_spending_analysis(self, transactions: List[Transaction]) -> Dict[str, any]:
+    def _mock_spending_analysis(self, summary: Dict) -> Dict[str, any]:
         """Mock spending analysis for development"""
-        total_spent = sum(abs(float(t.amount)) for t in transactions if not t.is_income)
-        total_income = sum(float(t.amount) for t in transactions if t.is_income)
+        total_spent = summary['expense_total']
+        total_income = summary['income_total']
         
         return {
             "insights": [
-                f"You spent ${total_spent:.2f} in the last 30 days",
+                f"You spent ${total_spent:.2f} in the last {summary['window']['days']} days",
                 f"Your income was ${total_income:.2f}",
                 "Consider reducing discretionary spending by 10%"
             ],
@@ -313,11 +730,9 @@ Be realistic and consider both over and under-budgeted categories."""
             ],
             "daily_allowance_adjustment": -0.1 if total_spent > total_income else 0,
             "top_categories": {
-                "Food": total_spent * 0.3,
-                "Transportation": total_spent * 0.2,
-                "Shopping": total_spent * 0.15
+                c['category']: c['total'] for c in summary['categories'][:3]
             },
-            "unusual_transactions": []
+            "unusual_transactions": summary['outliers'][:3]
         }
     
     def _mock_daily_recommendations(self, balance: float, today_transactions: List[Transaction]) -> Dict[str, any]:
@@ -355,4 +770,14 @@ Be realistic and consider both over and under-budgeted categories."""
             "savings_potential": sum(current_budgets.values()) * 0.1,
             "priority_adjustments": ["Food", "Shopping", "Entertainment"],
             "achievability_score": 0.85
-        }
\ No newline at end of file
+        }
+
+
+_shared_service = None
+
+def get_claude_service() -> ClaudeService:
+    """Get the process-wide ClaudeService shared by routes and background sync"""
+    global _shared_service
+    if _shared_service is None:
+        _shared_service = ClaudeService()
+    return _shared_service
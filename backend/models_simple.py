@@ -81,6 +81,14 @@ class Account(db.Model):
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1', onupdate=db.literal_column('version') + 1)  # Bumped on every update, for delta sync
+    
+    __table_args__ = (
+        # Balance totals and account lists filter on user_id + is_active
+        db.Index('ix_accounts_user_active', 'user_id', 'is_active'),
+        # Delta sync reads rows changed since a point in time
+        db.Index('ix_accounts_user_updated', 'user_id', 'updated_at', 'id'),
+    )
     
     def to_dict(self):
         """Convert to dictionary for JSON serialization"""
@@ -116,6 +124,8 @@ class Transaction(db.Model):
     # Recurrence fields
     recurrence_type = db.Column(db.String(20), nullable=True)  # 'daily', 'weekly', 'monthly', etc.
     recurrence_interval = db.Column(db.Integer, nullable=True, default=1)  # Every N periods
+    recurrence_parent_id = db.Column(db.Integer, db.ForeignKey('transactions.id', ondelete='SET NULL'), nullable=True)  # Template this occurrence was materialized from
+    recurrence_materialized_through = db.Column(db.Date, nullable=True)  # Templates: date of the last occurrence written
     notes = db.Column(db.Text, nullable=True)
     
     # Optional integration fields
@@ -123,6 +133,19 @@ class Transaction(db.Model):
     merchant_name = db.Column(db.String(255), nullable=True)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1', onupdate=db.literal_column('version') + 1)  # Bumped on every update, for delta sync
+    
+    __table_args__ = (
+        # Delta sync reads rows changed since a point in time
+        db.Index('ix_transactions_user_updated', 'user_id', 'updated_at', 'id'),
+        # Transaction list pages (keyset on date, id), recurring detection, recent transactions
+        db.Index('ix_transactions_user_date_id', 'user_id', 'date', 'id'),
+        # Income/expense sums and per-category totals over a date range; covers category and amount
+        db.Index('ix_transactions_user_income_date', 'user_id', 'is_income', 'date', 'category', 'amount'),
+        # One materialized occurrence per template and date
+        db.Index('ux_transactions_recurrence_parent_date', 'recurrence_parent_id', 'date', unique=True),
+    )
     
     def to_dict(self):
         """Convert to dictionary for JSON serialization"""
@@ -136,6 +159,7 @@ class Transaction(db.Model):
             'is_recurring': self.is_recurring,
             'recurrence_type': self.recurrence_type,
             'recurrence_interval': self.recurrence_interval,
+            'recurrence_parent_id': self.recurrence_parent_id,
             'notes': self.notes,
             'merchant_name': self.merchant_name,
             'created_at': self.created_at.isoformat() if self.created_at else None
@@ -162,6 +186,14 @@ class RecurringItem(db.Model):
     
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1', onupdate=db.literal_column('version') + 1)  # Bumped on every update, for delta sync
+    
+    __table_args__ = (
+        db.Index('ix_recurring_items_user_active', 'user_id', 'is_active'),
+        # Delta sync reads rows changed since a point in time
+        db.Index('ix_recurring_items_user_updated', 'user_id', 'updated_at', 'id'),
+    )
     
     def to_dict(self):
         """Convert to dictionary for JSON serialization"""
@@ -178,6 +210,20 @@ class RecurringItem(db.Model):
             'is_active': self.is_active
         }
 
+class SyncTombstone(db.Model):
+    """Record of a deleted row, so delta sync can tell clients to drop it"""
+    __tablename__ = 'sync_tombstones'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    entity = db.Column(db.String(30), nullable=False)  # 'transactions', 'accounts', 'recurring_items'
+    entity_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_sync_tombstones_user_deleted', 'user_id', 'deleted_at', 'id'),
+    )
+
 class Budget(db.Model):
     """Simple budget calculation cache"""
     __tablename__ = 'budgets'
@@ -210,6 +256,67 @@ class Budget(db.Model):
             'calculated_at': self.calculated_at.isoformat() if self.calculated_at else None
         }
 
+class MerchantCategory(db.Model):
+    """Persistent categorization cache of model answers, shared by all users"""
+    __tablename__ = 'merchant_categories'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    
+    # "out:starbucks" style key - amount sign bucket plus normalized tokens
+    cache_key = db.Column(db.String(255), unique=True, nullable=False, index=True)
+    
+    # Cached categorization
+    category = db.Column(db.String(50), nullable=False)
+    subcategory = db.Column(db.String(100), nullable=True)
+    confidence = db.Column(db.Float, nullable=False, default=0.0)
+    result = db.Column(db.Text, nullable=True)  # Full categorization JSON
+    source = db.Column(db.String(20), nullable=False, default='llm')  # llm (approvals live in approved_categories)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convert to dictionary for JSON serialization"""
+        return {
+            'id': self.id,
+            'cache_key': self.cache_key,
+            'category': self.category,
+            'subcategory': self.subcategory,
+            'confidence': self.confidence,
+            'source': self.source,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class ApprovedCategory(db.Model):
+    """A user's approved category for a merchant; applies to that user's transactions only"""
+    __tablename__ = 'approved_categories'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    
+    # Same "out:starbucks" key as merchant_categories
+    cache_key = db.Column(db.String(255), nullable=False)
+    
+    category = db.Column(db.String(50), nullable=False)
+    subcategory = db.Column(db.String(100), nullable=True)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'cache_key', name='ux_approved_categories_user_key'),
+    )
+    
+    def to_dict(self):
+        """Convert to dictionary for JSON serialization"""
+        return {
+            'id': self.id,
+            'cache_key': self.cache_key,
+            'category': self.category,
+            'subcategory': self.subcategory,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
 # Keep existing models for backward compatibility during migration
 class Waitlist(db.Model):
     """Waitlist for user signups"""
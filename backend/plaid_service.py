@@ -8,13 +8,22 @@ import logging
 from datetime import datetime, timedelta
 from models_simple import db, Account, Transaction, User
 from plaid_config import PlaidConfig
+from services.sync_metrics import sync_metrics
+from services.signals import notify_transactions_changed, notify_balances_changed
+from claude_service import get_claude_service
 
 logger = logging.getLogger(__name__)
 
 class PlaidService:
+    # Plaid allows up to 500 transactions per transactions_get page
+    TRANSACTIONS_PAGE_SIZE = 500
+    # Keep IN (...) lists well under database parameter limits
+    DEDUPE_CHUNK_SIZE = 500
+    
     def __init__(self):
         """Initialize Plaid service with configuration"""
         self.config = PlaidConfig()
+        self.categorizer = get_claude_service()
         
         # Validate configuration
         is_valid, message = self.config.validate_config()
@@ -187,32 +196,45 @@ class PlaidService:
         
         try:
             from plaid.model.transactions_get_request import TransactionsGetRequest
+            from plaid.model.transactions_get_request_options import TransactionsGetRequestOptions
             
             if not start_date:
                 start_date = datetime.now().date() - timedelta(days=30)
             if not end_date:
                 end_date = datetime.now().date()
             
-            request = TransactionsGetRequest(
-                access_token=access_token,
-                start_date=start_date,
-                end_date=end_date
-            )
-            
-            response = self.client.transactions_get(request)
-            
+            # Page through the full window; a single call only returns the first page
             transactions = []
-            for txn in response['transactions']:
-                transactions.append({
-                    'transaction_id': txn['transaction_id'],
-                    'account_id': txn['account_id'],
-                    'amount': -float(txn['amount']),  # Plaid uses positive for outflow
-                    'date': txn['date'].isoformat(),
-                    'name': txn['name'],
-                    'merchant_name': txn.get('merchant_name'),
-                    'category': txn.get('category', []),
-                    'category_primary': txn.get('category', ['Other'])[0] if txn.get('category') else 'Other'
-                })
+            total = None
+            while total is None or len(transactions) < total:
+                request = TransactionsGetRequest(
+                    access_token=access_token,
+                    start_date=start_date,
+                    end_date=end_date,
+                    options=TransactionsGetRequestOptions(
+                        count=self.TRANSACTIONS_PAGE_SIZE,
+                        offset=len(transactions)
+                    )
+                )
+                
+                response = self.client.transactions_get(request)
+                total = response['total_transactions']
+                
+                page = response['transactions']
+                for txn in page:
+                    transactions.append({
+                        'transaction_id': txn['transaction_id'],
+                        'account_id': txn['account_id'],
+                        'amount': -float(txn['amount']),  # Plaid uses positive for outflow
+                        'date': txn['date'].isoformat(),
+                        'name': txn['name'],
+                        'merchant_name': txn.get('merchant_name'),
+                        'category': txn.get('category', []),
+                        'category_primary': txn.get('category', ['Other'])[0] if txn.get('category') else 'Other'
+                    })
+                
+                if not page:
+                    break
             
             return transactions
             
@@ -222,8 +244,11 @@ class PlaidService:
     
     def sync_accounts(self, user_id, access_token):
         """Sync accounts from Plaid to local database"""
+        run = sync_metrics.start_run(user_id, job='accounts')
         try:
-            plaid_accounts = self.get_accounts(access_token)
+            with run.stage('fetch'):
+                plaid_accounts = self.get_accounts(access_token)
+            run.count('fetched', len(plaid_accounts))
             
             user = User.query.get(user_id)
             if not user:
@@ -231,100 +256,197 @@ class PlaidService:
             
             synced_accounts = []
             
-            for plaid_account in plaid_accounts:
-                # Check if account already exists
-                existing_account = Account.query.filter_by(
-                    user_id=user_id,
-                    plaid_account_id=plaid_account['account_id']
-                ).first()
-                
-                if existing_account:
-                    # Update existing account
-                    existing_account.current_balance = plaid_account['balance']['current']
-                    existing_account.updated_at = datetime.utcnow()
-                    synced_accounts.append(existing_account)
-                else:
-                    # Create new account
-                    new_account = Account(
-                        user_id=user_id,
-                        name=plaid_account['name'],
-                        account_type=plaid_account['subtype'] or plaid_account['type'],
-                        current_balance=plaid_account['balance']['current'],
-                        plaid_account_id=plaid_account['account_id'],
-                        institution_name=plaid_account['institution_name'],
-                        is_active=True,
-                        include_in_total=True
-                    )
-                    db.session.add(new_account)
-                    synced_accounts.append(new_account)
+            with run.stage('dedupe'):
+                existing_accounts = {
+                    acc.plaid_account_id: acc for acc in
+                    Account.query.filter_by(user_id=user_id).filter(
+                        Account.plaid_account_id.isnot(None)
+                    ).all()
+                }
             
-            db.session.commit()
-            logger.info(f"Synced {len(synced_accounts)} accounts for user {user_id}")
+            with run.stage('insert'):
+                for plaid_account in plaid_accounts:
+                    existing_account = existing_accounts.get(plaid_account['account_id'])
+                    
+                    if existing_account:
+                        # Update existing account
+                        existing_account.current_balance = plaid_account['balance']['current']
+                        existing_account.updated_at = datetime.utcnow()
+                        synced_accounts.append(existing_account)
+                        run.count('modified')
+                    else:
+                        # Create new account
+                        new_account = Account(
+                            user_id=user_id,
+                            name=plaid_account['name'],
+                            account_type=plaid_account['subtype'] or plaid_account['type'],
+                            current_balance=plaid_account['balance']['current'],
+                            plaid_account_id=plaid_account['account_id'],
+                            institution_name=plaid_account['institution_name'],
+                            is_active=True,
+                            include_in_total=True
+                        )
+                        db.session.add(new_account)
+                        synced_accounts.append(new_account)
+                        run.count('added')
+            
+            with run.stage('commit'):
+                db.session.commit()
+            
+            notify_balances_changed(user_id)
+            
+            run.finish()
+            logger.info(f"Synced {len(synced_accounts)} accounts for user {user_id}: {run.to_dict()}")
             
             return synced_accounts
             
         except Exception as e:
             db.session.rollback()
+            run.finish(error=e)
             logger.error(f"Error syncing accounts: {e}")
             raise
+        finally:
+            sync_metrics.record(run)
     
     def sync_transactions(self, user_id, access_token, days_back=30):
-        """Sync transactions from Plaid to local database"""
+        """
+        Sync transactions from Plaid to local database
+        
+        Returns the run's metrics: per-stage seconds (fetch, dedupe, insert,
+        commit) and counters for added, modified and removed transactions.
+        removed counts local rows the upstream window no longer returns;
+        they are reported, not deleted.
+        """
+        run = sync_metrics.start_run(user_id, job='transactions')
         try:
             start_date = datetime.now().date() - timedelta(days=days_back)
             end_date = datetime.now().date()
             
-            plaid_transactions = self.get_transactions(access_token, start_date, end_date)
-            
-            # Get user's accounts mapped by plaid_account_id
-            user_accounts = {
-                acc.plaid_account_id: acc for acc in 
-                Account.query.filter_by(user_id=user_id).all()
-                if acc.plaid_account_id
-            }
+            with run.stage('fetch'):
+                plaid_transactions = self.get_transactions(access_token, start_date, end_date)
+            run.count('fetched', len(plaid_transactions))
             
-            synced_count = 0
-            
-            for plaid_txn in plaid_transactions:
-                # Skip if we don't have this account locally
-                if plaid_txn['account_id'] not in user_accounts:
-                    continue
-                
-                account = user_accounts[plaid_txn['account_id']]
-                
-                # Check if transaction already exists
-                existing_txn = Transaction.query.filter_by(
-                    plaid_transaction_id=plaid_txn['transaction_id']
-                ).first()
+            with run.stage('dedupe'):
+                # Get user's accounts mapped by plaid_account_id
+                user_accounts = {
+                    acc.plaid_account_id: acc for acc in 
+                    Account.query.filter_by(user_id=user_id).all()
+                    if acc.plaid_account_id
+                }
                 
-                if existing_txn:
-                    continue  # Skip duplicates
+                # Skip transactions for accounts we don't have locally
+                relevant = [t for t in plaid_transactions if t['account_id'] in user_accounts]
+                run.count('skipped', len(plaid_transactions) - len(relevant))
                 
-                # Create new transaction
-                new_transaction = Transaction(
-                    user_id=user_id,
-                    account_id=account.id,
-                    plaid_transaction_id=plaid_txn['transaction_id'],
-                    description=plaid_txn['name'],
-                    amount=plaid_txn['amount'],
-                    date=datetime.strptime(plaid_txn['date'], '%Y-%m-%d').date(),
-                    category=plaid_txn['category_primary'],
-                    is_income=plaid_txn['amount'] > 0,
-                    merchant_name=plaid_txn.get('merchant_name')
-                )
+                # Look up already-synced transactions in chunks instead of one query per row
+                upstream_ids = [t['transaction_id'] for t in relevant]
+                existing = {}
+                for i in range(0, len(upstream_ids), self.DEDUPE_CHUNK_SIZE):
+                    chunk = upstream_ids[i:i + self.DEDUPE_CHUNK_SIZE]
+                    for txn in Transaction.query.filter(Transaction.plaid_transaction_id.in_(chunk)).all():
+                        existing[txn.plaid_transaction_id] = txn
                 
-                db.session.add(new_transaction)
-                synced_count += 1
+                # Local rows in the window that Plaid no longer returns (e.g. pending
+                # transactions replaced by their posted version). Only accounts present
+                # in this item's response are checked: the user's other linked banks
+                # are synced with their own access tokens.
+                upstream_set = set(upstream_ids)
+                account_ids = list({user_accounts[t['account_id']].id for t in relevant})
+                local_ids = db.session.query(Transaction.plaid_transaction_id).filter(
+                    Transaction.user_id == user_id,
+                    Transaction.account_id.in_(account_ids),
+                    Transaction.plaid_transaction_id.isnot(None),
+                    Transaction.date >= start_date,
+                    Transaction.date <= end_date
+                ).all() if account_ids else []
+                run.count('removed', sum(1 for plaid_id, in local_ids if plaid_id not in upstream_set))
+            
+            # Categorize brand-new rows before touching the session
+            categories = {}
+            new_plaid = [t for t in relevant if t['transaction_id'] not in existing]
+            if new_plaid and self.categorizer.is_available():
+                with run.stage('categorize'):
+                    categories = self._categorize_new_transactions(user_id, new_plaid)
+            
+            with run.stage('insert'):
+                for plaid_txn in relevant:
+                    account = user_accounts[plaid_txn['account_id']]
+                    txn_date = datetime.strptime(plaid_txn['date'], '%Y-%m-%d').date()
+                    
+                    existing_txn = existing.get(plaid_txn['transaction_id'])
+                    if existing_txn:
+                        if str(existing_txn.user_id) != str(user_id):
+                            run.count('skipped')
+                            continue
+                        
+                        # Update rows whose upstream details changed since the last sync
+                        if (float(existing_txn.amount) != plaid_txn['amount']
+                                or existing_txn.date != txn_date
+                                or existing_txn.description != plaid_txn['name']):
+                            existing_txn.amount = plaid_txn['amount']
+                            existing_txn.date = txn_date
+                            existing_txn.description = plaid_txn['name']
+                            existing_txn.is_income = plaid_txn['amount'] > 0
+                            run.count('modified')
+                        continue
+                    
+                    # Create new transaction
+                    new_transaction = Transaction(
+                        user_id=user_id,
+                        account_id=account.id,
+                        plaid_transaction_id=plaid_txn['transaction_id'],
+                        description=plaid_txn['name'],
+                        amount=plaid_txn['amount'],
+                        date=txn_date,
+                        category=categories.get(plaid_txn['transaction_id'], plaid_txn['category_primary']),
+                        is_income=plaid_txn['amount'] > 0,
+                        merchant_name=plaid_txn.get('merchant_name')
+                    )
+                    
+                    db.session.add(new_transaction)
+                    run.count('added')
+            
+            with run.stage('commit'):
+                db.session.commit()
             
-            db.session.commit()
-            logger.info(f"Synced {synced_count} new transactions for user {user_id}")
+            if run.counters['added'] or run.counters['modified']:
+                notify_transactions_changed(user_id)
             
-            return synced_count
+            run.finish()
+            logger.info(f"Synced transactions for user {user_id}: {run.to_dict()}")
+            
+            return run.to_dict()
             
         except Exception as e:
             db.session.rollback()
+            run.finish(error=e)
             logger.error(f"Error syncing transactions: {e}")
             raise
+        finally:
+            sync_metrics.record(run)
+    
+    def _categorize_new_transactions(self, user_id, plaid_transactions):
+        """Batch-categorize new Plaid transactions; returns categories by transaction_id"""
+        try:
+            results = self.categorizer.categorize_transactions([
+                {
+                    'id': txn['transaction_id'],
+                    'description': txn['name'],
+                    'amount': txn['amount'],
+                    'merchant_name': txn.get('merchant_name')
+                }
+                for txn in plaid_transactions
+            ], user_id=user_id)
+        except Exception as e:
+            # Categorization is best-effort; keep Plaid's categories
+            logger.error(f"Error categorizing synced transactions: {e}")
+            return {}
+        
+        # Plaid's own category is better than a generic fallback answer
+        return {
+            result['id']: result['category'] for result in results
+            if result.get('category') and result['category'] != 'Other'
+        }
     
     def get_status(self):
         """Get service status"""
@@ -7,6 +7,8 @@ Handles account management including balance updates
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from models_simple import db, User, Account
+from services.signals import notify_balances_changed
+from services.serialization import ACCOUNT_FIELDS, json_response
 from datetime import datetime
 
 accounts_bp = Blueprint('accounts', __name__)
@@ -50,6 +52,7 @@ def update_balance():
             account.updated_at = datetime.utcnow()
         
         db.session.commit()
+        notify_balances_changed(user_id)
         
         return jsonify({
             'message': 'Balance updated successfully',
@@ -74,12 +77,14 @@ def get_accounts():
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        accounts = Account.query.filter_by(user_id=user_id, is_active=True).all()
+        accounts = ACCOUNT_FIELDS.dicts(
+            Account.query.filter_by(user_id=user_id, is_active=True).with_entities(*ACCOUNT_FIELDS.columns)
+        )
         
-        return jsonify({
-            'accounts': [account.to_dict() for account in accounts],
-            'total_balance': sum(acc.current_balance for acc in accounts if acc.include_in_total)
-        }), 200
+        return json_response({
+            'accounts': accounts,
+            'total_balance': round(sum(acc['current_balance'] for acc in accounts if acc['include_in_total']), 2)
+        }, 200)
         
     except Exception as e:
         return jsonify({'error': f'Failed to get accounts: {str(e)}'}), 500
@@ -113,6 +118,7 @@ def create_account():
         
         db.session.add(account)
         db.session.commit()
+        notify_balances_changed(user_id)
         
         return jsonify({
             'message': 'Account created successfully',
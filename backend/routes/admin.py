@@ -11,6 +11,8 @@ import secrets
 import string
 import os
 from models_simple import db, User, Waitlist, SignupToken
+from services.ai_metrics import ai_metrics
+from services.serialization import json_response
 from sqlalchemy import text
 import smtplib
 from email.mime.text import MIMEText
@@ -123,22 +125,10 @@ def list_waitlist_users():
             ORDER BY created_at DESC
         """)).fetchall()
         
-        user_list = []
-        for user in users:
-            user_dict = {
-                'id': user.id,
-                'email': user.email,
-                'name': user.name,
-                'status': user.status,
-                'created_at': user.created_at.isoformat() if user.created_at else None,
-                'approved_at': user.approved_at.isoformat() if user.approved_at else None,
-                'approved_by': user.approved_by,
-                'source': user.source,
-                'user_agent': user.user_agent
-            }
-            user_list.append(user_dict)
+        # Rows go straight to the encoder, which writes datetimes as ISO strings
+        user_list = [dict(user._mapping) for user in users]
         
-        return jsonify({
+        return json_response({
             'success': True,
             'users': user_list,
             'total': len(user_list)
@@ -494,4 +484,44 @@ def list_signup_tokens():
         })
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/ai-metrics', methods=['GET'])
+@jwt_required()
+def get_ai_metrics():
+    """Model call counts, latency, tokens and cost per route, operation and model"""
+    try:
+        current_user_id = get_jwt_identity()
+        
+        # Process-wide usage and cost figures are admin only
+        admin_user = User.query.get(int(current_user_id))
+        if not admin_user or not admin_user.is_admin:
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        limit = request.args.get('limit', 20, type=int)
+        
+        return jsonify({
+            'success': True,
+            'summary': ai_metrics.summary(),
+            'recent_calls': ai_metrics.recent(limit=limit)
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/ai-metrics/reset', methods=['POST'])
+@jwt_required()
+def reset_ai_metrics():
+    """Clear AI metrics, e.g. before measuring a change"""
+    try:
+        current_user_id = get_jwt_identity()
+        
+        admin_user = User.query.get(int(current_user_id))
+        if not admin_user or not admin_user.is_admin:
+            return jsonify({'error': 'Admin access required'}), 403
+        
+        ai_metrics.reset()
+        return jsonify({'success': True})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
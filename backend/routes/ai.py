@@ -2,31 +2,72 @@
 AI-powered endpoints for intelligent financial insights
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, url_for, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from claude_service import ClaudeService
+from claude_service import get_claude_service
+from services.jobs import job_queue
+from services.ai_guard import model_guard
+from services.ai_metrics import current_route, attributed
+from services.recommendation_cache import recommendation_cache
+from services.allowance_cache import allowance_cache
+from services.signals import notify_transactions_changed
+from services.recurring_detector import detect_recurring
+from services.similarity_index import propagate_category, MIN_SIMILARITY
 from models_simple import db, Transaction, Account, RecurringItem
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import json
 import logging
-from datetime import datetime
+import os
+import time
+from datetime import datetime, date
 
 logger = logging.getLogger(__name__)
 
 ai_bp = Blueprint('ai', __name__, url_prefix='/api/ai')
 
-# Initialize Claude service
-claude_service = ClaudeService()
+# Shared Claude service (also used by the Plaid sync for bulk categorization)
+claude_service = get_claude_service()
+
+# Upper bound on transactions accepted by one bulk categorization request
+MAX_BULK_CATEGORIZE = 500
+
+# Short request-scoped AI work (categorization) that a request waits on; kept
+# separate from the job queue so it never queues behind slow background jobs
+_pipeline_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('AI_PIPELINE_WORKERS', '8')),
+    thread_name_prefix='ai-pipeline'
+)
+
+# How long process-transaction waits for a category before giving up
+CATEGORIZE_TIMEOUT_SECONDS = 30
+
+def _submit_in_app_context(fn, *args, **kwargs):
+    """Run fn on the pipeline pool inside the current app's context"""
+    app = current_app._get_current_object()
+    route = current_route()
+    
+    def run():
+        with app.app_context(), attributed(route):
+            return fn(*args, **kwargs)
+    
+    return _pipeline_executor.submit(run)
 
 @ai_bp.route('/status', methods=['GET'])
 def get_ai_status():
     """Get AI service status"""
+    guard = model_guard.snapshot()
     return jsonify({
         'available': claude_service.is_available(),
+        'fallback_active': not claude_service.is_available() or guard['circuit_state'] == 'open',
+        'guard': guard,
         'provider': 'Claude AI',
         'features': [
             'transaction_categorization',
+            'batch_categorization',
             'spending_analysis', 
             'daily_recommendations',
-            'budget_optimization'
+            'budget_optimization',
+            'streaming_analysis'
         ]
     })
 
@@ -35,6 +76,7 @@ def get_ai_status():
 def categorize_transaction():
     """Categorize a transaction using AI"""
     try:
+        user_id = get_jwt_identity()
         data = request.get_json()
         
         description = data.get('description')
@@ -45,9 +87,10 @@ def categorize_transaction():
             return jsonify({'error': 'description and amount are required'}), 400
         
         result = claude_service.categorize_transaction(
-            description=description,
+            transaction_description=description,
             amount=float(amount),
-            merchant_name=merchant_name
+            merchant_name=merchant_name,
+            user_id=user_id
         )
         
         return jsonify(result)
@@ -56,32 +99,124 @@ def categorize_transaction():
         logger.error(f"Error categorizing transaction: {e}")
         return jsonify({'error': 'Failed to categorize transaction'}), 500
 
+@ai_bp.route('/categorize-batch', methods=['POST'])
+@jwt_required()
+def categorize_transactions_batch():
+    """Categorize many transactions using batched AI requests"""
+    try:
+        data = request.get_json() or {}
+        transactions = data.get('transactions')
+        
+        if not isinstance(transactions, list) or not transactions:
+            return jsonify({'error': 'transactions must be a non-empty list'}), 400
+        
+        if len(transactions) > MAX_BULK_CATEGORIZE:
+            return jsonify({'error': f'At most {MAX_BULK_CATEGORIZE} transactions per request'}), 400
+        
+        items = []
+        for index, txn in enumerate(transactions):
+            if not isinstance(txn, dict) or not txn.get('description') or txn.get('amount') is None:
+                return jsonify({'error': f'transactions[{index}] needs description and amount'}), 400
+            try:
+                amount = float(txn['amount'])
+            except (ValueError, TypeError):
+                return jsonify({'error': f'transactions[{index}] has an invalid amount'}), 400
+            items.append({
+                'id': txn.get('id', index),
+                'description': txn['description'],
+                'amount': amount,
+                'merchant_name': txn.get('merchant_name')
+            })
+        
+        results = claude_service.categorize_transactions(items, user_id=get_jwt_identity())
+        
+        return jsonify({
+            'results': results,
+            'count': len(results),
+            'cache_hits': sum(1 for r in results if r.get('cache_hit'))
+        })
+        
+    except Exception as e:
+        logger.error(f"Error batch categorizing transactions: {e}")
+        return jsonify({'error': 'Failed to categorize transactions'}), 500
+
+def _accepted(job):
+    """Answer 202 with where to poll for the job's result"""
+    response = job.to_dict(include_result=False)
+    response['status_url'] = url_for('ai.get_job', job_id=job.id)
+    return jsonify(response), 202
+
+def _enqueue(user_id, kind, fn, *args):
+    """Queue an AI call and answer 202"""
+    return _accepted(job_queue.submit(user_id, kind, fn, *args))
+
 @ai_bp.route('/analyze-spending', methods=['GET'])
 @jwt_required()
 def analyze_spending():
-    """Analyze user's spending patterns"""
+    """Queue an analysis of the user's spending patterns"""
     try:
         user_id = get_jwt_identity()
         days = request.args.get('days', 30, type=int)
         
-        analysis = claude_service.analyze_spending_patterns(user_id, days)
-        
-        return jsonify(analysis)
+        return _enqueue(user_id, 'analyze_spending', claude_service.analyze_spending_patterns, user_id, days)
         
     except Exception as e:
         logger.error(f"Error analyzing spending: {e}")
         return jsonify({'error': 'Failed to analyze spending'}), 500
 
+def _event_stream(events):
+    """Relay (event, data) pairs from the service as server-sent events"""
+    def generate():
+        yield ': stream open\n\n'
+        try:
+            for event, data in events:
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            logger.error(f"Error streaming AI response: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': 'Stream failed'})}\n\n"
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@ai_bp.route('/analyze-spending/stream', methods=['GET'])
+@jwt_required()
+def analyze_spending_stream():
+    """Stream a spending analysis as server-sent events (delta, section, done)"""
+    try:
+        user_id = get_jwt_identity()
+        days = request.args.get('days', 30, type=int)
+        
+        return _event_stream(claude_service.stream_spending_analysis(user_id, days))
+        
+    except Exception as e:
+        logger.error(f"Error streaming spending analysis: {e}")
+        return jsonify({'error': 'Failed to analyze spending'}), 500
+
 @ai_bp.route('/daily-recommendations', methods=['GET'])
 @jwt_required()
 def get_daily_recommendations():
-    """Get personalized daily recommendations"""
+    """Get today's cached recommendations, refreshing them in the background when stale"""
     try:
         user_id = get_jwt_identity()
         
-        recommendations = claude_service.get_daily_recommendations(user_id)
+        cached = recommendation_cache.lookup(user_id)
+        if cached is None:
+            return _accepted(recommendation_cache.refresh(user_id, claude_service.get_daily_recommendations))
         
-        return jsonify(recommendations)
+        refresh_job = None
+        if cached['stale']:
+            refresh_job = recommendation_cache.refresh(user_id, claude_service.get_daily_recommendations)
+        
+        response = dict(cached['value'])
+        response['cache'] = {
+            'stale': cached['stale'],
+            'generated_at': cached['generated_at'],
+            'refresh_url': url_for('ai.get_job', job_id=refresh_job.id) if refresh_job else None
+        }
+        return jsonify(response)
         
     except Exception as e:
         logger.error(f"Error getting recommendations: {e}")
@@ -90,25 +225,64 @@ def get_daily_recommendations():
 @ai_bp.route('/suggest-budgets', methods=['POST'])
 @jwt_required()
 def suggest_budgets():
-    """Get AI-suggested budget adjustments"""
+    """Queue AI-suggested budget adjustments"""
     try:
         user_id = get_jwt_identity()
-        data = request.get_json()
+        data = request.get_json() or {}
         
         category_budgets = data.get('category_budgets', {})
         
-        suggestions = claude_service.suggest_budget_adjustments(user_id, category_budgets)
-        
-        return jsonify(suggestions)
+        return _enqueue(user_id, 'suggest_budgets', claude_service.suggest_budget_adjustments, user_id, category_budgets)
         
     except Exception as e:
         logger.error(f"Error suggesting budgets: {e}")
         return jsonify({'error': 'Failed to suggest budgets'}), 500
 
+@ai_bp.route('/suggest-budgets/stream', methods=['POST'])
+@jwt_required()
+def suggest_budgets_stream():
+    """Stream AI-suggested budget adjustments as server-sent events (delta, section, done)"""
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json() or {}
+        
+        category_budgets = data.get('category_budgets', {})
+        
+        return _event_stream(claude_service.stream_budget_suggestions(user_id, category_budgets))
+        
+    except Exception as e:
+        logger.error(f"Error streaming budget suggestions: {e}")
+        return jsonify({'error': 'Failed to suggest budgets'}), 500
+
+@ai_bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """Get the status of a queued AI job, with its result once finished"""
+    try:
+        user_id = get_jwt_identity()
+        
+        job = job_queue.get(job_id, user_id=user_id)
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        return jsonify(job.to_dict())
+        
+    except Exception as e:
+        logger.error(f"Error getting AI job {job_id}: {e}")
+        return jsonify({'error': 'Failed to get job'}), 500
+
 @ai_bp.route('/process-transaction', methods=['POST'])
 @jwt_required()
 def process_transaction_with_ai():
-    """Process a new transaction with AI categorization and insights"""
+    """
+    Process a new transaction with AI categorization and insights
+
+    Categorization runs on the pipeline pool while the recommendation refresh
+    runs on the job queue. The transaction is committed as soon as its
+    category is known; the daily impact comes from the cached allowance, and
+    the refreshed recommendations are available from refresh_url.
+    """
+    refresh_job = None
     try:
         user_id = get_jwt_identity()
         data = request.get_json()
@@ -118,28 +292,50 @@ def process_transaction_with_ai():
         amount = data.get('amount')
         date_str = data.get('date')
         is_income = data.get('is_income', False)
+        merchant_name = data.get('merchant_name')
         
         if not all([description, amount is not None, date_str]):
             return jsonify({'error': 'description, amount, and date are required'}), 400
         
-        # Get AI categorization
-        ai_result = claude_service.categorize_transaction(
-            description=description,
-            amount=float(amount),
-            merchant_name=data.get('merchant_name')
+        try:
+            amount = float(amount)
+            transaction_date = datetime.strptime(date_str, '%Y-%m-%d').date()
+        except (ValueError, TypeError):
+            return jsonify({'error': 'Invalid amount or date. Use YYYY-MM-DD for date'}), 400
+        
+        started_at = datetime.utcnow()
+        categorization = _submit_in_app_context(
+            claude_service.categorize_transaction,
+            transaction_description=description,
+            amount=amount,
+            merchant_name=merchant_name,
+            user_id=user_id
         )
         
+        # The refresh counts this transaction as pending spend, so the commit
+        # below does not make its result stale
+        pending_spend = abs(amount) if not is_income and transaction_date == date.today() else 0.0
+        refresh_job = recommendation_cache.refresh(
+            user_id, claude_service.get_daily_recommendations, pending_spend, started_at,
+            expected_writes=1
+        )
+        
+        # Today's allowance before this transaction (no model call)
+        allowance = allowance_cache.get(user_id)
+        
+        ai_result = categorization.result(timeout=CATEGORIZE_TIMEOUT_SECONDS)
+        
         # Create transaction with AI suggestions
         transaction = Transaction(
             user_id=user_id,
             description=description,
-            amount=float(amount),
-            date=datetime.strptime(date_str, '%Y-%m-%d').date(),
+            amount=amount,
+            date=transaction_date,
             category=ai_result.get('category', 'Other'),
             is_income=is_income,
             notes=ai_result.get('note', ''),
             account_id=data.get('account_id'),
-            merchant_name=data.get('merchant_name')
+            merchant_name=merchant_name
         )
         
         db.session.add(transaction)
@@ -150,26 +346,39 @@ def process_transaction_with_ai():
             transaction.pending_recurring_review = True
         
         db.session.commit()
-        
-        # Get updated daily recommendations
-        recommendations = claude_service.get_daily_recommendations(user_id)
+        notify_transactions_changed(user_id)
         
         return jsonify({
             'transaction': transaction.to_dict(),
             'ai_categorization': ai_result,
-            'daily_impact': recommendations.get('suggested_daily_limit', 0) - abs(float(amount)) if not is_income else 0,
-            'should_review_recurring': ai_result.get('recurring_likelihood', 0) > 0.7
+            'daily_impact': round(allowance['daily_allowance'] - abs(amount), 2) if not is_income else 0,
+            'daily_allowance': allowance['daily_allowance'],
+            'should_review_recurring': ai_result.get('recurring_likelihood', 0) > 0.7,
+            'cache_hit': ai_result.get('cache_hit', False),
+            'recommendations_refresh_url': url_for('ai.get_job', job_id=refresh_job.id)
         })
         
+    except FutureTimeoutError:
+        logger.error(f"Timed out categorizing transaction for user {get_jwt_identity()}")
+        db.session.rollback()
+        recommendation_cache.cancel_expected_writes(get_jwt_identity(), refresh_job)
+        return jsonify({'error': 'Categorization timed out'}), 504
     except Exception as e:
         logger.error(f"Error processing transaction with AI: {e}")
         db.session.rollback()
+        recommendation_cache.cancel_expected_writes(get_jwt_identity(), refresh_job)
         return jsonify({'error': 'Failed to process transaction'}), 500
 
 @ai_bp.route('/approve-suggestions', methods=['POST'])
 @jwt_required()
 def approve_ai_suggestions():
-    """Approve or modify AI suggestions for transactions"""
+    """
+    Approve or modify AI suggestions for transactions
+
+    An approved category is also applied to the user's similar uncategorized
+    transactions (set propagate to false to skip); their IDs are returned
+    as propagated_ids.
+    """
     try:
         user_id = get_jwt_identity()
         data = request.get_json()
@@ -178,6 +387,11 @@ def approve_ai_suggestions():
         approved_category = data.get('category')
         approved_recurring = data.get('is_recurring', False)
         recurring_frequency = data.get('recurring_frequency')
+        propagate = data.get('propagate', True)
+        try:
+            min_similarity = float(data.get('min_similarity', MIN_SIMILARITY))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'min_similarity must be a number'}), 400
         
         if not transaction_id:
             return jsonify({'error': 'transaction_id is required'}), 400
@@ -195,6 +409,11 @@ def approve_ai_suggestions():
         if approved_category:
             transaction.category = approved_category
         
+        # Apply the same category to similar uncategorized transactions in one UPDATE
+        propagated_ids = []
+        if approved_category and propagate:
+            propagated_ids = propagate_category(user_id, transaction, approved_category, min_similarity)
+        
         # Create recurring transaction if approved
         if approved_recurring and recurring_frequency:
             recurring = RecurringItem(
@@ -210,14 +429,79 @@ def approve_ai_suggestions():
             db.session.add(recurring)
         
         db.session.commit()
+        notify_transactions_changed(user_id)
+        
+        # Teach the categorizer so this merchant is matched locally from now on
+        if approved_category:
+            claude_service.record_approved_category(
+                user_id,
+                transaction.description,
+                float(transaction.amount),
+                transaction.merchant_name,
+                approved_category
+            )
         
         return jsonify({
             'success': True,
             'transaction': transaction.to_dict(),
-            'recurring_created': approved_recurring
+            'recurring_created': approved_recurring,
+            'propagated_ids': propagated_ids,
+            'propagated_count': len(propagated_ids)
         })
         
     except Exception as e:
         logger.error(f"Error approving AI suggestions: {e}")
         db.session.rollback()
-        return jsonify({'error': 'Failed to approve suggestions'}), 500
\ No newline at end of file
+        return jsonify({'error': 'Failed to approve suggestions'}), 500
+
+@ai_bp.route('/recurring-candidates', methods=['GET'])
+@jwt_required()
+def get_recurring_candidates():
+    """Detect recurring series in the user's history (no model calls)"""
+    try:
+        user_id = get_jwt_identity()
+        min_confidence = request.args.get('min_confidence', 0.6, type=float)
+        
+        start = time.perf_counter()
+        candidates = detect_recurring(user_id, min_confidence=min_confidence)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        
+        return jsonify({
+            'candidates': [c.to_dict() for c in candidates],
+            'count': len(candidates),
+            'elapsed_ms': round(elapsed_ms, 1)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error detecting recurring transactions: {e}")
+        return jsonify({'error': 'Failed to detect recurring transactions'}), 500
+
+@ai_bp.route('/recurring-candidates', methods=['POST'])
+@jwt_required()
+def accept_recurring_candidates():
+    """Save detected candidates, selected by key, as recurring items"""
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json() or {}
+        
+        keys = data.get('keys')
+        if not isinstance(keys, list) or not keys:
+            return jsonify({'error': 'keys must be a non-empty list'}), 400
+        
+        selected = set(keys)
+        candidates = [c for c in detect_recurring(user_id, min_confidence=0) if c.key in selected]
+        
+        for candidate in candidates:
+            db.session.add(candidate.item)
+        db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'recurring_items': [c.item.to_dict() for c in candidates],
+            'not_found': sorted(selected - {c.key for c in candidates})
+        }), 201
+        
+    except Exception as e:
+        logger.error(f"Error saving recurring candidates: {e}")
+        db.session.rollback()
+        return jsonify({'error': 'Failed to save recurring items'}), 500
@@ -0,0 +1,64 @@
+"""
+Spending analytics API routes
+"""
+
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from datetime import datetime, date, timedelta
+from services.spend_analytics import grouped_spend
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Default range when no dates are given
+DEFAULT_DAYS = 30
+
+# Longest range one request may aggregate
+MAX_RANGE_DAYS = 3660
+
+analytics_bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
+
+@analytics_bp.route('/spending', methods=['GET'])
+@jwt_required()
+def get_spending():
+    """
+    Spending grouped by category, merchant, day, week or month
+    
+    Query: group_by (default category), start_date/end_date (YYYY-MM-DD,
+    default the last 30 days), is_income=true for income instead of
+    spending, compare=previous|year for a comparison period, and limit for
+    the number of category/merchant groups. Values come back as parallel
+    arrays (keys, totals, counts) ready for charting.
+    """
+    try:
+        user_id = get_jwt_identity()
+        
+        try:
+            end_date = datetime.strptime(request.args['end_date'], '%Y-%m-%d').date() \
+                if request.args.get('end_date') else date.today()
+            start_date = datetime.strptime(request.args['start_date'], '%Y-%m-%d').date() \
+                if request.args.get('start_date') else end_date - timedelta(days=DEFAULT_DAYS - 1)
+        except ValueError:
+            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+        
+        if (end_date - start_date).days > MAX_RANGE_DAYS:
+            return jsonify({'error': f'Date range is limited to {MAX_RANGE_DAYS} days'}), 400
+        
+        limit = request.args.get('limit', type=int)
+        
+        try:
+            result = grouped_spend(
+                user_id, start_date, end_date,
+                group_by=request.args.get('group_by', 'category'),
+                is_income=request.args.get('is_income', 'false').lower() == 'true',
+                compare=request.args.get('compare') or None,
+                limit=max(limit, 1) if limit else None
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify(result)
+        
+    except Exception as e:
+        logger.error(f"Error getting spending analytics: {str(e)}")
+        return jsonify({'error': 'Failed to get spending analytics'}), 500
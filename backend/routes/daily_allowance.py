@@ -4,11 +4,11 @@ Daily Allowance Calculation API
 
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime, date, timedelta
-from sqlalchemy import func
+from datetime import datetime
 from models_simple import db, Transaction, Account, User
+from services.allowance_cache import allowance_cache
+from services.signals import notify_balances_changed
 import logging
-import calendar
 
 logger = logging.getLogger(__name__)
 
@@ -20,84 +20,8 @@ def get_daily_allowance():
     """Calculate and return daily allowance with breakdown"""
     try:
         user_id = get_jwt_identity()
-        today = date.today()
-        
-        # Get user's total balance from accounts
-        total_balance = db.session.query(func.sum(Account.current_balance)).filter(
-            Account.user_id == user_id,
-            Account.is_active == True,
-            Account.include_in_total == True
-        ).scalar() or 0
-        
-        # Get current month stats
-        start_of_month = today.replace(day=1)
-        
-        # Calculate month-to-date income
-        month_income = db.session.query(func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            Transaction.is_income == True,
-            Transaction.date >= start_of_month,
-            Transaction.date <= today
-        ).scalar() or 0
-        
-        # Calculate month-to-date expenses (convert to positive)
-        month_expenses = db.session.query(func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            Transaction.is_income == False,
-            Transaction.date >= start_of_month,
-            Transaction.date <= today
-        ).scalar() or 0
-        month_expenses = abs(float(month_expenses))
-        
-        # Days calculation
-        days_in_month = calendar.monthrange(today.year, today.month)[1]
-        days_remaining = days_in_month - today.day + 1  # Including today
-        
-        # Basic daily allowance calculation
-        # If we have balance, divide by remaining days
-        if total_balance > 0 and days_remaining > 0:
-            basic_daily_allowance = float(total_balance) / days_remaining
-        else:
-            basic_daily_allowance = 0
-        
-        # For now, just use basic calculation
-        daily_allowance = basic_daily_allowance
-        
-        # Enhanced calculation considering fixed expenses
-        # Get recurring fixed expenses for the month
-        fixed_monthly_expenses = db.session.query(func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            Transaction.is_income == False,
-            Transaction.is_recurring == True,
-            Transaction.recurrence_type == 'monthly'
-        ).scalar() or 0
-        fixed_monthly_expenses = abs(float(fixed_monthly_expenses))
-        
-        # Calculate expected monthly income from recurring income
-        monthly_recurring_income = db.session.query(func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            Transaction.is_income == True,
-            Transaction.is_recurring == True,
-            Transaction.recurrence_type == 'monthly'
-        ).scalar() or 0
-        
-        # Adjust balance for remaining fixed expenses this month
-        remaining_fixed_expenses = max(0, fixed_monthly_expenses - month_expenses)
-        available_for_discretionary = max(0, float(total_balance) - remaining_fixed_expenses)
-        
-        # Safe-to-spend calculation
-        if available_for_discretionary > 0 and days_remaining > 0:
-            safe_daily_allowance = available_for_discretionary / days_remaining
-        else:
-            safe_daily_allowance = 0
-        
-        # Choose the more conservative calculation, but if no transactions exist, use basic
-        if month_expenses == 0 and fixed_monthly_expenses == 0:
-            # No transaction history, use basic calculation
-            recommended_daily_allowance = basic_daily_allowance
-        else:
-            # Use more conservative calculation when we have transaction data
-            recommended_daily_allowance = min(basic_daily_allowance, safe_daily_allowance)
+        allowance = allowance_cache.get(user_id)
+        breakdown = allowance['breakdown']
         
         # Account information
         accounts = Account.query.filter_by(
@@ -124,27 +48,16 @@ def get_daily_allowance():
         ).limit(5).all()
         
         return jsonify({
-            'daily_allowance': round(recommended_daily_allowance, 2),
-            'breakdown': {
-                'total_balance': float(total_balance),
-                'basic_daily_allowance': round(basic_daily_allowance, 2),
-                'safe_daily_allowance': round(safe_daily_allowance, 2),
-                'recommended_daily_allowance': round(recommended_daily_allowance, 2),
-                'days_remaining_in_month': days_remaining,
-                'month_income': float(month_income),
-                'month_expenses': month_expenses,
-                'fixed_monthly_expenses': fixed_monthly_expenses,
-                'monthly_recurring_income': float(monthly_recurring_income),
-                'available_for_discretionary': round(available_for_discretionary, 2)
-            },
+            'daily_allowance': allowance['daily_allowance'],
+            'breakdown': breakdown,
             'accounts': accounts_data,
             'recent_transactions': [t.to_dict() for t in recent_transactions],
-            'calculation_date': today.isoformat(),
+            'calculation_date': allowance['calculation_date'],
             'recommendations': _get_recommendations(
-                recommended_daily_allowance, 
-                float(total_balance), 
-                month_expenses, 
-                days_remaining
+                breakdown['recommended_daily_allowance'],
+                breakdown['total_balance'],
+                breakdown['month_expenses'],
+                breakdown['days_remaining_in_month']
             )
         })
         
@@ -185,6 +98,7 @@ def update_balance():
         account.updated_at = datetime.utcnow()
         
         db.session.commit()
+        notify_balances_changed(user_id)
         
         logger.info(f"Updated account {account_id} balance from {old_balance} to {new_balance} for user {user_id}")
         
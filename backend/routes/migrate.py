@@ -3,8 +3,9 @@ Database Migration Routes for Production
 """
 
 from flask import Blueprint, jsonify
-from models_simple import db
-from sqlalchemy import text
+from models_simple import db, Transaction, Account, RecurringItem, SyncTombstone, ApprovedCategory
+from sqlalchemy import text, inspect
+from services.transaction_search import ensure_search_index
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,86 +18,170 @@ def migrate_schema():
     try:
         migrations_run = []
         
+        # Each ALTER runs in a savepoint: on Postgres a failed statement (column
+        # already exists) would otherwise abort the rest of the migration
         # Add recurrence fields to transactions table if they don't exist
         try:
-            db.session.execute(text("""
-                ALTER TABLE transactions 
-                ADD COLUMN recurrence_type VARCHAR(20)
-            """))
+            with db.session.begin_nested():
+                db.session.execute(text("""
+                    ALTER TABLE transactions 
+                    ADD COLUMN recurrence_type VARCHAR(20)
+                """))
             migrations_run.append("Added recurrence_type column")
         except Exception as e:
             logger.info(f"recurrence_type column already exists or error: {e}")
         
         try:
-            db.session.execute(text("""
-                ALTER TABLE transactions 
-                ADD COLUMN recurrence_interval INTEGER DEFAULT 1
-            """))
+            with db.session.begin_nested():
+                db.session.execute(text("""
+                    ALTER TABLE transactions 
+                    ADD COLUMN recurrence_interval INTEGER DEFAULT 1
+                """))
             migrations_run.append("Added recurrence_interval column")
         except Exception as e:
             logger.info(f"recurrence_interval column already exists or error: {e}")
         
         try:
-            db.session.execute(text("""
-                ALTER TABLE transactions 
-                ADD COLUMN notes TEXT
-            """))
+            with db.session.begin_nested():
+                db.session.execute(text("""
+                    ALTER TABLE transactions 
+                    ADD COLUMN notes TEXT
+                """))
             migrations_run.append("Added notes column")
         except Exception as e:
             logger.info(f"notes column already exists or error: {e}")
         
         # Add include_in_total column to accounts if it doesn't exist
         try:
-            db.session.execute(text("""
-                ALTER TABLE accounts 
-                ADD COLUMN include_in_total BOOLEAN DEFAULT TRUE
-            """))
+            with db.session.begin_nested():
+                db.session.execute(text("""
+                    ALTER TABLE accounts 
+                    ADD COLUMN include_in_total BOOLEAN DEFAULT TRUE
+                """))
             migrations_run.append("Added include_in_total column to accounts")
         except Exception as e:
             logger.info(f"include_in_total column already exists or error: {e}")
         
         # Add plaid_account_id column to accounts if it doesn't exist
         try:
-            db.session.execute(text("""
-                ALTER TABLE accounts 
-                ADD COLUMN plaid_account_id VARCHAR(255)
-            """))
+            with db.session.begin_nested():
+                db.session.execute(text("""
+                    ALTER TABLE accounts 
+                    ADD COLUMN plaid_account_id VARCHAR(255)
+                """))
             migrations_run.append("Added plaid_account_id column to accounts")
         except Exception as e:
             logger.info(f"plaid_account_id column already exists or error: {e}")
         
         # Add institution_name column to accounts if it doesn't exist
         try:
-            db.session.execute(text("""
-                ALTER TABLE accounts 
-                ADD COLUMN institution_name VARCHAR(100)
-            """))
+            with db.session.begin_nested():
+                db.session.execute(text("""
+                    ALTER TABLE accounts 
+                    ADD COLUMN institution_name VARCHAR(100)
+                """))
             migrations_run.append("Added institution_name column to accounts")
         except Exception as e:
             logger.info(f"institution_name column already exists or error: {e}")
         
         # Add plaid_transaction_id column to transactions if it doesn't exist
         try:
-            db.session.execute(text("""
-                ALTER TABLE transactions 
-                ADD COLUMN plaid_transaction_id VARCHAR(255)
-            """))
+            with db.session.begin_nested():
+                db.session.execute(text("""
+                    ALTER TABLE transactions 
+                    ADD COLUMN plaid_transaction_id VARCHAR(255)
+                """))
             migrations_run.append("Added plaid_transaction_id column to transactions")
         except Exception as e:
             logger.info(f"plaid_transaction_id column already exists or error: {e}")
         
         # Add merchant_name column to transactions if it doesn't exist
         try:
-            db.session.execute(text("""
-                ALTER TABLE transactions 
-                ADD COLUMN merchant_name VARCHAR(255)
-            """))
+            with db.session.begin_nested():
+                db.session.execute(text("""
+                    ALTER TABLE transactions 
+                    ADD COLUMN merchant_name VARCHAR(255)
+                """))
             migrations_run.append("Added merchant_name column to transactions")
         except Exception as e:
             logger.info(f"merchant_name column already exists or error: {e}")
         
+        # Link from materialized recurring occurrences to their template
+        try:
+            with db.session.begin_nested():
+                db.session.execute(text("""
+                    ALTER TABLE transactions 
+                    ADD COLUMN recurrence_parent_id INTEGER REFERENCES transactions(id) ON DELETE SET NULL
+                """))
+            migrations_run.append("Added recurrence_parent_id column to transactions")
+        except Exception as e:
+            logger.info(f"recurrence_parent_id column already exists or error: {e}")
+        
+        # Per-template watermark, so deleted or re-dated occurrences aren't written again
+        try:
+            with db.session.begin_nested():
+                db.session.execute(text("""
+                    ALTER TABLE transactions 
+                    ADD COLUMN recurrence_materialized_through DATE
+                """))
+            migrations_run.append("Added recurrence_materialized_through column to transactions")
+        except Exception as e:
+            logger.info(f"recurrence_materialized_through column already exists or error: {e}")
+        
+        # Change tracking for delta sync: updated_at and a per-row version
+        for table, columns in (
+            ('transactions', ('updated_at TIMESTAMP', 'version INTEGER NOT NULL DEFAULT 1')),
+            ('accounts', ('version INTEGER NOT NULL DEFAULT 1',)),
+            ('recurring_items', ('updated_at TIMESTAMP', 'version INTEGER NOT NULL DEFAULT 1')),
+        ):
+            for column in columns:
+                try:
+                    with db.session.begin_nested():
+                        db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {column}"))
+                    migrations_run.append(f"Added {column.split()[0]} column to {table}")
+                except Exception as e:
+                    logger.info(f"{table}.{column.split()[0]} column already exists or error: {e}")
+        
+        for table in ('transactions', 'accounts', 'recurring_items'):
+            result = db.session.execute(text(
+                f"UPDATE {table} SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL"
+            ))
+            if result.rowcount:
+                migrations_run.append(f"Backfilled updated_at on {result.rowcount} {table} rows")
+        
         db.session.commit()
         
+        try:
+            SyncTombstone.__table__.create(bind=db.engine, checkfirst=True)
+        except Exception as e:
+            logger.info(f"sync_tombstones table not created: {e}")
+        
+        # Approved categories are per user now; the old shared rows had no owner
+        try:
+            ApprovedCategory.__table__.create(bind=db.engine, checkfirst=True)
+            result = db.session.execute(text("DELETE FROM merchant_categories WHERE source = 'approved'"))
+            db.session.commit()
+            if result.rowcount:
+                migrations_run.append(f"Removed {result.rowcount} shared approved merchant categories")
+        except Exception as e:
+            db.session.rollback()
+            logger.info(f"approved_categories not migrated: {e}")
+        
+        # Composite indexes for the per-user hot queries (declared in models_simple __table_args__)
+        inspector = inspect(db.engine)
+        for table in (Transaction.__table__, Account.__table__, RecurringItem.__table__):
+            try:
+                existing = {index['name'] for index in inspector.get_indexes(table.name)}
+                for index in table.indexes:
+                    if index.name not in existing:
+                        index.create(bind=db.engine)
+                        migrations_run.append(f"Created index {index.name}")
+            except Exception as e:
+                logger.info(f"Indexes on {table.name} not created: {e}")
+        
+        # Full-text search index and the triggers or generated column that keep it current
+        migrations_run.extend(ensure_search_index())
+        
         return jsonify({
             'success': True,
             'message': 'Schema migration completed',
@@ -5,6 +5,8 @@ Plaid Integration API Routes
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from plaid_service import PlaidService
+from services.sync_metrics import sync_metrics
+from services.signals import notify_balances_changed
 import logging
 
 logger = logging.getLogger(__name__)
@@ -101,13 +103,14 @@ def exchange_public_token():
         logger.info(f"Synced {len(synced_accounts)} accounts")
         
         logger.info("Syncing transactions")
-        synced_transactions = plaid_service.sync_transactions(user_id, access_token, days_back=30)
-        logger.info(f"Synced {len(synced_transactions)} transactions")
+        sync_result = plaid_service.sync_transactions(user_id, access_token, days_back=30)
+        logger.info(f"Synced {sync_result['counters']['added']} transactions in {sync_result['total_seconds']}s")
         
         return jsonify({
             'success': True,
             'accounts_synced': len(synced_accounts),
-            'transactions_synced': synced_transactions,
+            'transactions_synced': sync_result['counters']['added'],
+            'sync': sync_result,
             'demo_mode': False
         })
         
@@ -186,6 +189,31 @@ def sync_accounts():
         logger.error(f"Error syncing accounts: {e}")
         return jsonify({'error': 'Failed to sync accounts'}), 500
 
+@plaid_bp.route('/metrics', methods=['GET'])
+@jwt_required()
+def get_sync_metrics():
+    """Get per-stage timings and counters for recent sync runs"""
+    try:
+        user_id = get_jwt_identity()
+        limit = request.args.get('limit', 20, type=int)
+        
+        # Process-wide aggregates are only available to admins with ?scope=all
+        scope_user = user_id
+        if request.args.get('scope') == 'all':
+            from models_simple import User
+            user = User.query.get(int(user_id))
+            if user and user.is_admin:
+                scope_user = None
+        
+        return jsonify({
+            'summary': sync_metrics.summary(user_id=scope_user),
+            'recent_runs': sync_metrics.recent(limit=limit, user_id=scope_user)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error getting sync metrics: {e}")
+        return jsonify({'error': 'Failed to get sync metrics'}), 500
+
 @plaid_bp.route('/disconnect/<int:account_id>', methods=['POST'])
 @jwt_required()
 def disconnect_account(account_id):
@@ -210,6 +238,7 @@ def disconnect_account(account_id):
         
         from models_simple import db
         db.session.commit()
+        notify_balances_changed(user_id)
         
         return jsonify({
             'success': True,
@@ -0,0 +1,38 @@
+"""
+Delta sync API routes
+"""
+
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from services.delta_sync import changes_since
+from services.serialization import json_response
+import logging
+
+logger = logging.getLogger(__name__)
+
+sync_bp = Blueprint('sync', __name__, url_prefix='/api/sync')
+
+@sync_bp.route('', methods=['GET'])
+@jwt_required()
+def sync():
+    """
+    Transactions, accounts and recurring items changed since a sync token
+    
+    Call without a token for a full copy (full=true), then pass back the
+    returned token each time. Each entity lists upserts (with version) and
+    deleted ids. While has_more is true, call again at once with the new
+    token to get the next page.
+    """
+    try:
+        user_id = get_jwt_identity()
+        
+        try:
+            changes = changes_since(user_id, request.args.get('token') or None)
+        except ValueError:
+            return jsonify({'error': 'Invalid sync token'}), 400
+        
+        return json_response(changes)
+        
+    except Exception as e:
+        logger.error(f"Error syncing changes: {str(e)}")
+        return jsonify({'error': 'Failed to sync changes'}), 500
@@ -2,32 +2,75 @@
 Transaction management API routes
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, url_for, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime, date
+from werkzeug.exceptions import RequestEntityTooLarge
+from datetime import datetime, date, timedelta
 from sqlalchemy import desc
 from models_simple import db, Transaction, Account, User
+from services.signals import notify_transactions_changed
+from services.pagination import after_cursor, encode_cursor, filter_key, transaction_counts
+from services.bulk_transactions import apply_bulk
+from services.statement_import import FORMATS, detect_format, import_statement
+from services.jobs import import_queue
+from services.transaction_search import search_transactions
+from services.recurrence import recurrence_materializer
+from services.serialization import TRANSACTION_FIELDS, json_response
+from services.delta_sync import record_deletions
+from services.transaction_export import FORMATS as EXPORT_FORMATS, available_formats, stream_export
+import json
 import logging
+import os
+import tempfile
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on one page of the transaction list
+MAX_PAGE_SIZE = 500
+
+# Upper bound on create + update + delete items in one bulk request
+MAX_BULK_OPERATIONS = 1000
+
+# Furthest ahead the upcoming recurring list looks
+MAX_UPCOMING_DAYS = 366
+
+# Upper bound on one page of search results
+MAX_SEARCH_RESULTS = 100
+
+# Upper bound on an uploaded statement file
+MAX_IMPORT_BYTES = 50 * 1024 * 1024
+
 transactions_bp = Blueprint('transactions', __name__, url_prefix='/api/transactions')
 
 @transactions_bp.route('', methods=['GET'])
 @jwt_required()
 def get_transactions():
-    """Get user's transactions with optional filtering"""
+    """
+    Get user's transactions with optional filtering, newest first
+    
+    Pages are keyset-based: pass the previous page's next_cursor as cursor.
+    The exact total is only computed with include_total=true and is cached
+    until the user's transactions change. offset is still accepted for
+    older clients.
+    """
     try:
         user_id = get_jwt_identity()
         
         # Query parameters
-        limit = int(request.args.get('limit', 50))
+        limit = min(max(int(request.args.get('limit', 50)), 1), MAX_PAGE_SIZE)
         offset = int(request.args.get('offset', 0))
+        cursor = request.args.get('cursor')
+        include_total = request.args.get('include_total', 'false').lower() == 'true'
         category = request.args.get('category')
         is_income = request.args.get('is_income')
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         
+        # Recurring occurrences that have come due appear as ordinary rows; written
+        # once per listing, on its first page, not again for each cursor page
+        if not cursor and not offset:
+            recurrence_materializer.materialize_due(user_id)
+        
         # Build query
         query = Transaction.query.filter_by(user_id=user_id)
         
@@ -43,18 +86,114 @@ def get_transactions():
         if end_date:
             query = query.filter(Transaction.date <= datetime.strptime(end_date, '%Y-%m-%d').date())
         
-        # Order by date desc, paginate
-        transactions = query.order_by(desc(Transaction.date)).limit(limit).offset(offset).all()
+        filtered = query
         
-        return jsonify({
-            'transactions': [t.to_dict() for t in transactions],
-            'total': query.count()
-        })
+        # (date, id) order is total, so ties on date page deterministically
+        query = query.order_by(desc(Transaction.date), desc(Transaction.id))
+        
+        if cursor:
+            try:
+                query = query.filter(after_cursor(Transaction.date, Transaction.id, cursor))
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
+        elif offset:
+            query = query.offset(offset)
+        
+        # One extra row tells whether there is another page; rows are plain tuples, not ORM objects
+        rows = query.with_entities(*TRANSACTION_FIELDS.columns).limit(limit + 1).all()
+        transactions = rows[:limit]
+        has_more = len(rows) > limit
+        
+        response = {
+            'transactions': TRANSACTION_FIELDS.dicts(transactions),
+            'next_cursor': encode_cursor(transactions[-1].date, transactions[-1].id) if has_more else None,
+            'has_more': has_more
+        }
+        
+        if include_total:
+            key = filter_key({
+                'category': category,
+                'is_income': is_income,
+                'start_date': start_date,
+                'end_date': end_date
+            })
+            response['total'] = transaction_counts.get(user_id, key, filtered.count)
+        
+        return json_response(response)
         
     except Exception as e:
         logger.error(f"Error getting transactions: {str(e)}")
         return jsonify({'error': 'Failed to get transactions'}), 500
 
+@transactions_bp.route('/upcoming', methods=['GET'])
+@jwt_required()
+def get_upcoming():
+    """
+    Scheduled occurrences of recurring transactions after today
+    
+    Occurrences are expanded from the recurring templates for the next
+    days (default 30) and are not stored until they come due.
+    """
+    try:
+        user_id = get_jwt_identity()
+        days = min(max(int(request.args.get('days', 30)), 1), MAX_UPCOMING_DAYS)
+        
+        today = date.today()
+        occurrences = recurrence_materializer.upcoming(user_id, today + timedelta(days=days), today)
+        
+        return jsonify({
+            'upcoming': [dict(o, date=o['date'].isoformat()) for o in occurrences],
+            'days': days,
+            'total_expenses': round(sum(abs(o['amount']) for o in occurrences if not o['is_income']), 2),
+            'total_income': round(sum(o['amount'] for o in occurrences if o['is_income']), 2)
+        })
+        
+    except ValueError:
+        return jsonify({'error': 'days must be an integer'}), 400
+    except Exception as e:
+        logger.error(f"Error getting upcoming recurring transactions: {str(e)}")
+        return jsonify({'error': 'Failed to get upcoming transactions'}), 500
+
+@transactions_bp.route('/search', methods=['GET'])
+@jwt_required()
+def search():
+    """
+    Full-text search over description, merchant and notes
+    
+    q is a list of words, each matched as a prefix; results are ranked by
+    relevance, then newest first, and paged with limit and offset.
+    """
+    try:
+        user_id = get_jwt_identity()
+        
+        query = (request.args.get('q') or '').strip()
+        if not query:
+            return jsonify({'error': 'q is required'}), 400
+        limit = min(max(int(request.args.get('limit', 20)), 1), MAX_SEARCH_RESULTS)
+        offset = max(int(request.args.get('offset', 0)), 0)
+        
+        results, has_more = search_transactions(user_id, query, limit=limit, offset=offset)
+        
+        transactions = []
+        for transaction, score in results:
+            data = transaction.to_dict()
+            data['score'] = round(score, 4)
+            transactions.append(data)
+        
+        return jsonify({
+            'transactions': transactions,
+            'query': query,
+            'limit': limit,
+            'offset': offset,
+            'has_more': has_more
+        })
+        
+    except ValueError:
+        return jsonify({'error': 'limit and offset must be integers'}), 400
+    except Exception as e:
+        logger.error(f"Error searching transactions: {str(e)}")
+        return jsonify({'error': 'Failed to search transactions'}), 500
+
 @transactions_bp.route('', methods=['POST'])
 @jwt_required()
 def create_transaction():
@@ -101,6 +240,7 @@ def create_transaction():
         
         db.session.add(transaction)
         db.session.commit()
+        notify_transactions_changed(user_id)
         
         logger.info(f"Created transaction: {transaction.description} for user {user_id}")
         
@@ -176,6 +316,7 @@ def update_transaction(transaction_id):
             transaction.notes = data['notes'].strip() if data['notes'] else None
         
         db.session.commit()
+        notify_transactions_changed(user_id)
         
         return jsonify({
             'success': True,
@@ -204,7 +345,9 @@ def delete_transaction(transaction_id):
             return jsonify({'error': 'Transaction not found'}), 404
         
         db.session.delete(transaction)
+        record_deletions(user_id, 'transactions', [transaction_id])
         db.session.commit()
+        notify_transactions_changed(user_id)
         
         logger.info(f"Deleted transaction {transaction_id} for user {user_id}")
         
@@ -215,6 +358,194 @@ def delete_transaction(transaction_id):
         logger.error(f"Error deleting transaction: {str(e)}")
         return jsonify({'error': 'Failed to delete transaction'}), 500
 
+@transactions_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+def bulk_transactions():
+    """
+    Create, update and delete many transactions in one database transaction
+    
+    Body: {"create": [...], "update": [{"id", ...fields}], "delete": [ids],
+    "atomic": true}. Items are validated like the single-row routes. With
+    atomic (the default) any invalid item rejects the whole batch with 400;
+    otherwise the valid items are applied and the rest reported. Results
+    are returned per item, in input order.
+    """
+    try:
+        user_id = get_jwt_identity()
+        data = request.get_json() or {}
+        
+        creates = data.get('create') or []
+        updates = data.get('update') or []
+        deletes = data.get('delete') or []
+        atomic = data.get('atomic', True)
+        
+        if not all(isinstance(group, list) for group in (creates, updates, deletes)):
+            return jsonify({'error': 'create, update and delete must be lists'}), 400
+        
+        operations = len(creates) + len(updates) + len(deletes)
+        if operations == 0:
+            return jsonify({'error': 'No operations given'}), 400
+        if operations > MAX_BULK_OPERATIONS:
+            return jsonify({'error': f'At most {MAX_BULK_OPERATIONS} operations per request'}), 400
+        
+        results, applied = apply_bulk(user_id, creates, updates, deletes, atomic=atomic)
+        if not applied:
+            db.session.rollback()
+            return jsonify({'success': False, 'results': results}), 400
+        
+        db.session.commit()
+        notify_transactions_changed(user_id)
+        
+        counts = {name: sum(1 for r in group if r['success']) for name, group in results.items()}
+        logger.info(f"Bulk transactions for user {user_id}: {counts}")
+        
+        return jsonify({
+            'success': True,
+            'applied': counts,
+            'results': results
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error applying bulk transactions: {str(e)}")
+        return jsonify({'error': 'Failed to apply bulk transactions'}), 500
+
+@transactions_bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_transactions():
+    """
+    Import a CSV, OFX or QFX bank statement in the background
+    
+    Multipart form: file, optional format (csv/ofx/qfx, detected from the
+    file otherwise), mapping (JSON object of field -> CSV header, e.g.
+    {"date": "Posting Date", "amount": "Amount"}) and date_format (strptime
+    format for CSV dates). Rows the user already has (same date, amount and
+    description) are skipped. Answers 202 with a status_url reporting
+    progress.
+    """
+    try:
+        user_id = get_jwt_identity()
+        
+        # Checked before request.files reads the body; MAX_CONTENT_LENGTH covers bodies without a length
+        if request.content_length and request.content_length > MAX_IMPORT_BYTES:
+            return jsonify({'error': f'Statements are limited to {MAX_IMPORT_BYTES // (1024 * 1024)} MB'}), 413
+        
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            return jsonify({'error': 'file is required'}), 400
+        
+        file_format = (request.form.get('format') or '').lower() or None
+        if file_format and file_format not in FORMATS:
+            return jsonify({'error': f'format must be one of {", ".join(FORMATS)}'}), 400
+        
+        mapping = None
+        if request.form.get('mapping'):
+            try:
+                mapping = json.loads(request.form['mapping'])
+            except ValueError:
+                mapping = None
+            if not isinstance(mapping, dict):
+                return jsonify({'error': 'mapping must be a JSON object'}), 400
+        
+        # The job outlives the request, so spool the upload to disk for it to stream
+        # import_statement removes the file once the job has run
+        handle, path = tempfile.mkstemp(prefix='statement-', suffix='.import')
+        try:
+            with os.fdopen(handle, 'wb') as spooled:
+                upload.save(spooled)
+            
+            if not file_format:
+                with open(path, 'rb') as saved:
+                    file_format = detect_format(upload.filename, saved.read(1024))
+            
+            job = import_queue.submit(
+                user_id, 'statement_import', import_statement, user_id, path, file_format,
+                mapping, request.form.get('date_format') or None, pass_job=True
+            )
+        except Exception:
+            os.remove(path)
+            raise
+        
+        response = job.to_dict(include_result=False)
+        response['status_url'] = url_for('transactions.get_import', job_id=job.id)
+        return jsonify(response), 202
+        
+    except RequestEntityTooLarge:
+        return jsonify({'error': f'Statements are limited to {MAX_IMPORT_BYTES // (1024 * 1024)} MB'}), 413
+    except Exception as e:
+        logger.error(f"Error starting statement import: {str(e)}")
+        return jsonify({'error': 'Failed to start import'}), 500
+
+@transactions_bp.route('/import/<job_id>', methods=['GET'])
+@jwt_required()
+def get_import(job_id):
+    """Progress of a statement import, with the final counts once finished"""
+    try:
+        user_id = get_jwt_identity()
+        
+        job = import_queue.get(job_id, user_id=user_id)
+        if not job or job.kind != 'statement_import':
+            return jsonify({'error': 'Import not found'}), 404
+        
+        return jsonify(job.to_dict())
+        
+    except Exception as e:
+        logger.error(f"Error getting import {job_id}: {str(e)}")
+        return jsonify({'error': 'Failed to get import'}), 500
+
+@transactions_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_transactions():
+    """
+    Download the user's transactions, oldest first
+    
+    format is csv (default), ndjson or parquet (needs pyarrow, which is in
+    requirements.txt);
+    category, is_income, start_date and end_date filter as in the list
+    endpoint. The file is streamed while it is read from the database.
+    """
+    try:
+        user_id = get_jwt_identity()
+        
+        file_format = request.args.get('format', 'csv').lower()
+        if file_format not in available_formats():
+            return jsonify({'error': f'format must be one of {", ".join(available_formats())}'}), 400
+        
+        is_income = request.args.get('is_income')
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        filters = {
+            'category': request.args.get('category'),
+            'is_income': is_income.lower() == 'true' if is_income is not None else None,
+            'start_date': datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None,
+            'end_date': datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+        }
+        
+        mimetype, extension = EXPORT_FORMATS[file_format]
+        filename = f"transactions-{date.today().isoformat()}.{extension}"
+        
+        def generate():
+            try:
+                yield from stream_export(user_id, file_format, filters)
+            except Exception as e:
+                # Headers are already sent; the client sees a truncated file
+                logger.error(f"Error streaming transaction export: {str(e)}")
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype=mimetype,
+            headers={
+                'Content-Disposition': f'attachment; filename="{filename}"',
+                'X-Accel-Buffering': 'no'
+            }
+        )
+        
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+    except Exception as e:
+        logger.error(f"Error exporting transactions: {str(e)}")
+        return jsonify({'error': 'Failed to export transactions'}), 500
+
 @transactions_bp.route('/categories', methods=['GET'])
 @jwt_required()
 def get_categories():
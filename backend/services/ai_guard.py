@@ -0,0 +1,248 @@
+"""
+Model Call Guard
+
+Process-wide protection around Anthropic API calls:
+
+- a token bucket caps the request rate,
+- a semaphore caps concurrent in-flight requests,
+- a circuit breaker opens after repeated failures or slow calls, so callers
+  switch to their local fallbacks immediately instead of waiting on a
+  timeout per request, and lets a single probe through after a cool-down
+  to detect recovery.
+
+Rejected calls raise ModelUnavailable with a reason the caller can report.
+A streamed call is judged slow by its time to first output, not by how
+long the whole answer takes to arrive.
+"""
+
+import os
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class ModelUnavailable(Exception):
+    """A model call was refused by the guard; reason says why"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Model call refused: {reason}")
+        self.reason = reason
+
+
+class TokenBucket:
+    """Classic token bucket: rate tokens per second, up to capacity"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout: float = 0.0) -> bool:
+        """Take one token, waiting up to timeout seconds for it"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CallTimer:
+    """Latency of one guarded call; streamed calls mark their first output"""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.first_output_at = None
+
+    def first_output(self):
+        if self.first_output_at is None:
+            self.first_output_at = time.monotonic()
+
+    def latency(self) -> float:
+        return (self.first_output_at or time.monotonic()) - self.start
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after failure_threshold consecutive failures or slow
+    calls; open -> half_open after reset_seconds; half_open lets one probe
+    through and closes on success or reopens on failure.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, slow_call_seconds: float = 20.0,
+                 reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_seconds = reset_seconds
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.stats = {'opened': 0, 'rejected': 0, 'failures': 0, 'slow_calls': 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._advance()
+            return self._state
+
+    def _advance(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (claims the probe when half open)"""
+        with self._lock:
+            self._advance()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.stats['rejected'] += 1
+            return False
+
+    def record_success(self, seconds: float):
+        if seconds > self.slow_call_seconds:
+            with self._lock:
+                self.stats['slow_calls'] += 1
+            self.record_failure(slow=True)
+            return
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("Model circuit closed after successful probe")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, slow: bool = False):
+        with self._lock:
+            if not slow:
+                self.stats['failures'] += 1
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.stats['opened'] += 1
+                    logger.warning(f"Model circuit opened after {self._failures} failed or slow calls")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def release_probe(self):
+        """Give up a claimed probe without a verdict (the call never went out)"""
+        with self._lock:
+            self._probe_in_flight = False
+
+
+class ModelGuard:
+    """Rate limit, concurrency limit and circuit breaker for model calls"""
+
+    def __init__(self, rate_per_second: float = 5.0, burst: int = 10, max_concurrency: int = 4,
+                 acquire_timeout: float = 2.0, breaker: CircuitBreaker = None):
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.max_concurrency = max_concurrency
+        self.acquire_timeout = acquire_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'rate_limited': 0, 'busy': 0}
+
+    @contextmanager
+    def slot(self):
+        """
+        Hold a call slot for the duration of one model request; raises
+        ModelUnavailable if refused. Yields a CallTimer: a streamed request
+        calls first_output() when its first chunk arrives, and that latency
+        is what the slow-call check sees.
+        """
+        if not self.breaker.allow():
+            raise ModelUnavailable('circuit_open')
+
+        if not self.bucket.acquire(self.acquire_timeout):
+            self.breaker.release_probe()
+            with self._lock:
+                self.stats['rate_limited'] += 1
+            raise ModelUnavailable('rate_limited')
+
+        if not self._semaphore.acquire(timeout=self.acquire_timeout):
+            self.breaker.release_probe()
+            with self._lock:
+                self.stats['busy'] += 1
+            raise ModelUnavailable('busy')
+
+        with self._lock:
+            self._in_flight += 1
+            self.stats['calls'] += 1
+        timer = CallTimer()
+        try:
+            yield timer
+        except GeneratorExit:
+            # Streaming client went away; no verdict on the model's health
+            self.breaker.release_probe()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        else:
+            self.breaker.record_success(timer.latency())
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._semaphore.release()
+
+    def call(self, fn, *args, **kwargs):
+        """Run one model request inside a slot"""
+        with self.slot():
+            return fn(*args, **kwargs)
+
+    def snapshot(self) -> Dict:
+        """Current guard state for status endpoints"""
+        with self._lock:
+            in_flight = self._in_flight
+            stats = dict(self.stats)
+        return {
+            'circuit_state': self.breaker.state,
+            'in_flight': in_flight,
+            'max_concurrency': self.max_concurrency,
+            'rate_per_second': self.bucket.rate,
+            'burst': self.bucket.capacity,
+            'stats': stats,
+            'circuit_stats': dict(self.breaker.stats)
+        }
+
+
+# Shared guard for every model call in this process
+model_guard = ModelGuard(
+    rate_per_second=float(os.environ.get('AI_RATE_PER_SECOND', '5')),
+    burst=int(os.environ.get('AI_BURST', '10')),
+    max_concurrency=int(os.environ.get('AI_MAX_CONCURRENCY', '4')),
+    acquire_timeout=float(os.environ.get('AI_ACQUIRE_TIMEOUT', '2')),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.environ.get('AI_CIRCUIT_FAILURES', '5')),
+        slow_call_seconds=float(os.environ.get('AI_SLOW_CALL_SECONDS', '20')),
+        reset_seconds=float(os.environ.get('AI_CIRCUIT_RESET_SECONDS', '30'))
+    )
+)
@@ -0,0 +1,192 @@
+"""
+AI Usage Metrics
+
+Per-call timing, token counts and estimated cost for every model request
+ClaudeService makes, plus how each AI answer was produced (cache, local
+matcher, model or fallback). Calls are attributed to the Flask endpoint
+that triggered them, including work handed to background jobs, and to the
+ClaudeService operation. Aggregates and recent calls are kept in memory
+and served from /api/admin/ai-metrics.
+"""
+
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from flask import has_request_context, request
+
+# USD per million (input, output) tokens; unknown models are costed at zero
+MODEL_PRICES = {
+    'claude-3-haiku-20240307': (0.25, 1.25),
+    'claude-3-sonnet-20240229': (3.00, 15.00),
+}
+
+# Latency samples kept per (route, operation, model) for percentiles
+LATENCY_SAMPLES = 500
+
+_origin: ContextVar[Optional[str]] = ContextVar('ai_metrics_origin', default=None)
+
+
+def current_route() -> str:
+    """The endpoint this work belongs to: the live request's, or the one that queued it"""
+    if has_request_context() and request.endpoint:
+        return request.endpoint
+    return _origin.get() or 'background'
+
+
+@contextmanager
+def attributed(route: Optional[str]):
+    """Attribute model calls made inside the block to route (for worker threads)"""
+    token = _origin.set(route)
+    try:
+        yield
+    finally:
+        _origin.reset(token)
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class AIMetrics:
+    """Process-wide store of model call and answer metrics"""
+
+    def __init__(self, max_calls: int = 200):
+        self._calls = deque(maxlen=max_calls)
+        self._lock = threading.Lock()
+        self._call_stats: Dict[tuple, Dict] = {}
+        self._outcomes: Dict[tuple, Dict] = {}
+        self.started_at = datetime.utcnow()
+
+    def record_call(self, operation: str, model: str, seconds: float, input_tokens: int = 0,
+                    output_tokens: int = 0, streamed: bool = False, error: Optional[str] = None,
+                    rejected: Optional[str] = None):
+        """
+        Record one model request. rejected is the guard's reason when the
+        request never went out; error is the exception type when it failed.
+        """
+        route = current_route()
+        cost = estimate_cost(model, input_tokens, output_tokens)
+        call = {
+            'at': datetime.utcnow().isoformat(),
+            'route': route,
+            'operation': operation,
+            'model': model,
+            'seconds': round(seconds, 4),
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'cost_usd': round(cost, 6),
+            'streamed': streamed,
+            'error': error,
+            'rejected': rejected
+        }
+        with self._lock:
+            self._calls.append(call)
+            stats = self._call_stats.setdefault((route, operation, model), {
+                'calls': 0, 'errors': 0, 'rejected': 0, 'streamed': 0,
+                'total_seconds': 0.0, 'max_seconds': 0.0,
+                'input_tokens': 0, 'output_tokens': 0, 'cost_usd': 0.0,
+                'latencies': deque(maxlen=LATENCY_SAMPLES)
+            })
+            if rejected:
+                stats['rejected'] += 1
+                return
+            stats['calls'] += 1
+            stats['errors'] += 1 if error else 0
+            stats['streamed'] += 1 if streamed else 0
+            stats['total_seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            stats['input_tokens'] += input_tokens
+            stats['output_tokens'] += output_tokens
+            stats['cost_usd'] += cost
+            stats['latencies'].append(seconds)
+
+    def record_answer(self, operation: str, source: Optional[str], cache_hit: bool = False,
+                      fallback: Optional[str] = None, count: int = 1):
+        """Record how count answers of an operation were produced"""
+        route = current_route()
+        with self._lock:
+            stats = self._outcomes.setdefault((route, operation), {
+                'answers': 0, 'cache_hits': 0, 'sources': {}, 'fallbacks': {}
+            })
+            stats['answers'] += count
+            stats['cache_hits'] += count if cache_hit else 0
+            source = source or 'llm'
+            stats['sources'][source] = stats['sources'].get(source, 0) + count
+            if fallback:
+                stats['fallbacks'][fallback] = stats['fallbacks'].get(fallback, 0) + count
+
+    def recent(self, limit: int = 20) -> List[Dict]:
+        """Most recent model calls first"""
+        with self._lock:
+            calls = list(self._calls)
+        return list(reversed(calls[-limit:]))
+
+    def summary(self) -> Dict:
+        """Aggregates per (route, operation, model) and per (route, operation)"""
+        with self._lock:
+            call_stats = {key: dict(value, latencies=list(value['latencies']))
+                          for key, value in self._call_stats.items()}
+            outcomes = {key: {k: dict(v) if isinstance(v, dict) else v for k, v in value.items()}
+                        for key, value in self._outcomes.items()}
+
+        calls = []
+        totals = {'calls': 0, 'errors': 0, 'rejected': 0, 'input_tokens': 0, 'output_tokens': 0, 'cost_usd': 0.0}
+        for (route, operation, model), stats in call_stats.items():
+            latencies = stats.pop('latencies')
+            made = stats['calls']
+            for name in totals:
+                totals[name] += stats[name]
+            calls.append(dict(
+                stats,
+                route=route,
+                operation=operation,
+                model=model,
+                total_seconds=round(stats['total_seconds'], 4),
+                max_seconds=round(stats['max_seconds'], 4),
+                avg_seconds=round(stats['total_seconds'] / made, 4) if made else 0.0,
+                p50_seconds=round(_percentile(latencies, 50), 4),
+                p95_seconds=round(_percentile(latencies, 95), 4),
+                cost_usd=round(stats['cost_usd'], 6)
+            ))
+        calls.sort(key=lambda entry: entry['total_seconds'], reverse=True)
+
+        answers = []
+        for (route, operation), stats in outcomes.items():
+            answers.append(dict(
+                stats,
+                route=route,
+                operation=operation,
+                cache_hit_rate=round(stats['cache_hits'] / stats['answers'], 4) if stats['answers'] else 0.0
+            ))
+        answers.sort(key=lambda entry: entry['answers'], reverse=True)
+
+        totals['cost_usd'] = round(totals['cost_usd'], 6)
+        return {
+            'since': self.started_at.isoformat(),
+            'totals': totals,
+            'calls': calls,
+            'answers': answers
+        }
+
+    def reset(self):
+        with self._lock:
+            self._calls.clear()
+            self._call_stats = {}
+            self._outcomes = {}
+            self.started_at = datetime.utcnow()
+
+
+# Shared instance used by ClaudeService and the admin metrics endpoint
+ai_metrics = AIMetrics()
@@ -0,0 +1,159 @@
+"""
+Daily Allowance Calculation
+
+The safe-to-spend calculation behind /api/daily-allowance, with a per-user,
+per-day cache that is dropped whenever the user's transactions or balances
+change. Callers that only need today's allowance number (such as the AI
+transaction pipeline) read it from here instead of recomputing it.
+"""
+
+import calendar
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Optional
+
+from sqlalchemy import func
+from models_simple import db, Transaction, Account
+from services.signals import transactions_changed, balances_changed
+from services.recurrence import recurrence_materializer
+
+
+def calculate_allowance(user_id, today: Optional[date] = None) -> Dict:
+    """Compute today's daily allowance and its breakdown"""
+    today = today or date.today()
+
+    # Recurring occurrences that have come due count as real transactions below
+    recurrence_materializer.materialize_due(user_id, today)
+
+    # Get user's total balance from accounts
+    total_balance = db.session.query(func.sum(Account.current_balance)).filter(
+        Account.user_id == user_id,
+        Account.is_active == True,
+        Account.include_in_total == True
+    ).scalar() or 0
+
+    # Get current month stats
+    start_of_month = today.replace(day=1)
+
+    # Calculate month-to-date income
+    month_income = db.session.query(func.sum(Transaction.amount)).filter(
+        Transaction.user_id == user_id,
+        Transaction.is_income == True,
+        Transaction.date >= start_of_month,
+        Transaction.date <= today
+    ).scalar() or 0
+
+    # Calculate month-to-date expenses (convert to positive)
+    month_expenses = db.session.query(func.sum(Transaction.amount)).filter(
+        Transaction.user_id == user_id,
+        Transaction.is_income == False,
+        Transaction.date >= start_of_month,
+        Transaction.date <= today
+    ).scalar() or 0
+    month_expenses = abs(float(month_expenses))
+
+    # Days calculation
+    days_in_month = calendar.monthrange(today.year, today.month)[1]
+    days_remaining = days_in_month - today.day + 1  # Including today
+
+    # Basic daily allowance calculation
+    # If we have balance, divide by remaining days
+    if total_balance > 0 and days_remaining > 0:
+        basic_daily_allowance = float(total_balance) / days_remaining
+    else:
+        basic_daily_allowance = 0
+
+    # Enhanced calculation considering fixed expenses
+    # This month's recurring occurrences, from the templates' schedules
+    month_end = today.replace(day=days_in_month)
+    occurrences = recurrence_materializer.expand(user_id, start_of_month, month_end)
+    fixed_monthly_expenses = sum(abs(o['amount']) for o in occurrences if not o['is_income'])
+    monthly_recurring_income = sum(o['amount'] for o in occurrences if o['is_income'])
+
+    # Recurring expenses still to come this month; the ones already due are in month_expenses
+    remaining_fixed_expenses = sum(abs(o['amount']) for o in occurrences if not o['is_income'] and o['date'] > today)
+    available_for_discretionary = max(0, float(total_balance) - remaining_fixed_expenses)
+
+    # Safe-to-spend calculation
+    if available_for_discretionary > 0 and days_remaining > 0:
+        safe_daily_allowance = available_for_discretionary / days_remaining
+    else:
+        safe_daily_allowance = 0
+
+    # Choose the more conservative calculation, but if no transactions exist, use basic
+    if month_expenses == 0 and fixed_monthly_expenses == 0:
+        # No transaction history, use basic calculation
+        recommended_daily_allowance = basic_daily_allowance
+    else:
+        # Use more conservative calculation when we have transaction data
+        recommended_daily_allowance = min(basic_daily_allowance, safe_daily_allowance)
+
+    return {
+        'daily_allowance': round(recommended_daily_allowance, 2),
+        'breakdown': {
+            'total_balance': float(total_balance),
+            'basic_daily_allowance': round(basic_daily_allowance, 2),
+            'safe_daily_allowance': round(safe_daily_allowance, 2),
+            'recommended_daily_allowance': round(recommended_daily_allowance, 2),
+            'days_remaining_in_month': days_remaining,
+            'month_income': float(month_income),
+            'month_expenses': month_expenses,
+            'fixed_monthly_expenses': round(fixed_monthly_expenses, 2),
+            'remaining_fixed_expenses': round(remaining_fixed_expenses, 2),
+            'monthly_recurring_income': round(monthly_recurring_income, 2),
+            'available_for_discretionary': round(available_for_discretionary, 2)
+        },
+        'calculation_date': today.isoformat()
+    }
+
+
+class AllowanceCache:
+    """Today's allowance per user, dropped on transaction or balance changes"""
+
+    def __init__(self, max_users: int = 10000):
+        self.max_users = max_users
+        self._entries = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, user_id) -> Dict:
+        """Return today's allowance for the user, computing it on a miss"""
+        user_id = str(user_id)
+        today = date.today()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry['calculation_date'] == today.isoformat():
+                self._entries.move_to_end(user_id)
+                self.stats['hits'] += 1
+                return entry
+            generation = self._generations.get(user_id, 0)
+
+        self.stats['misses'] += 1
+        entry = calculate_allowance(user_id, today)
+        with self._lock:
+            # Don't keep a result that an invalidation raced past
+            if self._generations.get(user_id, 0) != generation:
+                return entry
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+
+# Shared cache for the allowance routes and the AI pipeline
+allowance_cache = AllowanceCache()
+
+
+@transactions_changed.connect
+@balances_changed.connect
+def _on_user_data_changed(user_id, **extra):
+    allowance_cache.invalidate(user_id)
@@ -0,0 +1,221 @@
+"""
+Bulk Transaction Writes
+
+Validates arrays of create, update and delete operations in one pass and
+applies them with multi-row statements in a single database transaction:
+one multi-row INSERT ... RETURNING for creates, executemany UPDATEs by
+primary key, and one DELETE ... WHERE id IN (...) plus tombstones for delta
+sync. Validation follows the single-row transaction routes (positive
+amounts whose sign comes from is_income, YYYY-MM-DD dates, required fields
+on create).
+
+The caller commits.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select, update
+from models_simple import db, Transaction
+from services.delta_sync import record_deletions
+
+REQUIRED_CREATE_FIELDS = ('description', 'amount', 'date', 'category')
+
+# Fields an update may set, besides amount/date/is_income which need conversion
+PLAIN_UPDATE_FIELDS = ('category', 'is_recurring', 'recurrence_type', 'recurrence_interval')
+
+
+def _parse_amount(value) -> Tuple[Optional[float], Optional[str]]:
+    try:
+        amount = float(value)
+    except (ValueError, TypeError):
+        return None, 'Invalid amount format'
+    if amount <= 0:
+        return None, 'Amount must be greater than 0'
+    return amount, None
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date(), None
+    except (ValueError, TypeError):
+        return None, 'Invalid date format. Use YYYY-MM-DD'
+
+
+def _clean_notes(value) -> Optional[str]:
+    return value.strip() if value else None
+
+
+def validate_create(user_id, item: Dict) -> Tuple[Optional[Dict], Optional[str]]:
+    """Row for a multi-row INSERT, or the validation error"""
+    if not isinstance(item, dict):
+        return None, 'Each create must be an object'
+    for field in REQUIRED_CREATE_FIELDS:
+        if not item.get(field):
+            return None, f'{field} is required'
+
+    amount, error = _parse_amount(item['amount'])
+    if error:
+        return None, error
+    txn_date, error = _parse_date(item['date'])
+    if error:
+        return None, error
+
+    is_income = bool(item.get('is_income', False))
+    return {
+        'user_id': int(user_id),
+        'description': str(item['description']).strip(),
+        'amount': amount if is_income else -amount,
+        'date': txn_date,
+        'category': item['category'],
+        'is_income': is_income,
+        'is_recurring': bool(item.get('is_recurring', False)),
+        'recurrence_type': item.get('recurrence_type'),
+        'recurrence_interval': item.get('recurrence_interval', 1),
+        'notes': _clean_notes(item.get('notes')),
+        'merchant_name': item.get('merchant_name')
+    }, None
+
+
+def validate_update(item: Dict, existing: Optional[Tuple[float, bool]]) -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    Parameters for an UPDATE by primary key, or the validation error;
+    existing is the row's current (amount, is_income)
+    """
+    if not isinstance(item, dict) or not item.get('id'):
+        return None, 'id is required'
+    if existing is None:
+        return None, 'Transaction not found'
+
+    values = {'id': item['id']}
+    if 'description' in item:
+        values['description'] = str(item['description'] or '').strip()
+    if 'date' in item:
+        values['date'], error = _parse_date(item['date'])
+        if error:
+            return None, error
+    if 'notes' in item:
+        values['notes'] = _clean_notes(item['notes'])
+    for field in PLAIN_UPDATE_FIELDS:
+        if field in item:
+            values[field] = item[field]
+
+    current_amount, current_is_income = existing
+    is_income = bool(item.get('is_income', current_is_income))
+    if 'is_income' in item:
+        values['is_income'] = is_income
+    if 'amount' in item:
+        amount, error = _parse_amount(item['amount'])
+        if error:
+            return None, error
+        values['amount'] = amount if is_income else -amount
+    elif 'is_income' in item:
+        # Keep the magnitude, fix the sign for the new type
+        values['amount'] = abs(current_amount) if is_income else -abs(current_amount)
+
+    if len(values) == 1:
+        return None, 'No fields to update'
+    return values, None
+
+
+def insert_rows(rows: List[Dict]) -> List[int]:
+    """Multi-row INSERT; returns the new ids in input order"""
+    if not rows:
+        return []
+    if db.engine.dialect.insert_executemany_returning_sort_by_parameter_order:
+        result = db.session.execute(
+            insert(Transaction).returning(Transaction.id, sort_by_parameter_order=True), rows
+        )
+        return list(result.scalars())
+    # Without ordered RETURNING, fall back to one INSERT per row
+    return [db.session.execute(insert(Transaction).values(**row)).inserted_primary_key[0] for row in rows]
+
+
+def apply_bulk(user_id, creates: List[Dict], updates: List[Dict], deletes: List,
+               atomic: bool = True) -> Tuple[Dict[str, List[Dict]], bool]:
+    """
+    Validate then apply the operations; returns (per-item results, applied)
+
+    With atomic, any invalid item means nothing is applied. Otherwise the
+    valid items are applied and the invalid ones reported.
+    """
+    results = {'creates': [], 'updates': [], 'deletes': []}
+    deletes = [item.get('id') if isinstance(item, dict) else item for item in deletes]
+
+    # One query for every row an update or delete refers to
+    referenced = [item.get('id') for item in updates if isinstance(item, dict)] + deletes
+    referenced_ids = list({i for i in referenced if isinstance(i, int) and not isinstance(i, bool)})
+    existing = {}
+    if referenced_ids:
+        existing = {
+            row_id: (float(amount), bool(is_income))
+            for row_id, amount, is_income in db.session.execute(
+                select(Transaction.id, Transaction.amount, Transaction.is_income).where(
+                    Transaction.user_id == user_id, Transaction.id.in_(referenced_ids)
+                )
+            )
+        }
+
+    create_rows = []
+    for index, item in enumerate(creates):
+        row, error = validate_create(user_id, item)
+        results['creates'].append({'index': index, 'success': error is None, 'error': error})
+        if row:
+            create_rows.append((index, row))
+
+    update_rows = []
+    updated_ids = set()
+    for index, item in enumerate(updates):
+        current = existing.get(item.get('id')) if isinstance(item, dict) and isinstance(item.get('id'), int) else None
+        values, error = validate_update(item, current)
+        if values and values['id'] in updated_ids:
+            values, error = None, 'Duplicate update for this id'
+        results['updates'].append({
+            'index': index,
+            'id': item.get('id') if isinstance(item, dict) else None,
+            'success': error is None,
+            'error': error
+        })
+        if values:
+            updated_ids.add(values['id'])
+            update_rows.append(values)
+
+    delete_ids = []
+    for index, transaction_id in enumerate(deletes):
+        error = None
+        if not isinstance(transaction_id, int) or transaction_id not in existing:
+            error = 'Transaction not found'
+        elif transaction_id in updated_ids:
+            error = 'Transaction is also being updated'
+        results['deletes'].append({'index': index, 'id': transaction_id, 'success': error is None, 'error': error})
+        if error is None:
+            delete_ids.append(transaction_id)
+
+    has_errors = any(not r['success'] for group in results.values() for r in group)
+    if atomic and has_errors:
+        for group in results.values():
+            for r in group:
+                if r['success']:
+                    r.update(success=False, error='Not applied: another operation in the batch is invalid')
+        return results, False
+
+    ids = insert_rows([row for _, row in create_rows])
+    for (index, _), new_id in zip(create_rows, ids):
+        results['creates'][index]['id'] = new_id
+
+    if update_rows:
+        # Executemany UPDATE by primary key, grouped by the set of columns changed
+        db.session.execute(update(Transaction), update_rows)
+
+    if delete_ids:
+        db.session.execute(
+            delete(Transaction).where(Transaction.user_id == user_id, Transaction.id.in_(delete_ids))
+            .execution_options(synchronize_session=False)
+        )
+        record_deletions(user_id, 'transactions', delete_ids)
+
+    for group in results.values():
+        for r in group:
+            if r['error'] is None:
+                del r['error']
+    return results, True
@@ -0,0 +1,163 @@
+"""
+Transaction Categorization Cache
+
+Two-level cache in front of the LLM categorizer: an in-process LRU backed by
+the merchant_categories table. Keys are normalized merchant (or description)
+tokens bucketed by amount sign, so "SQ *STARBUCKS #1234 06/22" and
+"Starbucks" share one entry for expenses. Entries are model answers shared
+by every user; a user's approved categories are kept per user in
+approved_categories (see FastCategorizer).
+"""
+
+import json
+import os
+import re
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from models_simple import db, MerchantCategory
+
+logger = logging.getLogger(__name__)
+
+# Processor prefixes and card-network noise that carry no merchant identity
+NOISE_TOKENS = {
+    'pos', 'debit', 'credit', 'purchase', 'card', 'visa', 'mastercard', 'ach',
+    'payment', 'recurring', 'checkcard', 'withdrawal', 'online', 'web', 'www',
+    'com', 'inc', 'llc', 'co', 'the', 'sq', 'tst', 'pp', 'paypal', 'ref', 'id'
+}
+
+_NON_ALPHA = re.compile(r'[^a-z\s]+')
+_WHITESPACE = re.compile(r'\s+')
+
+# Only this many leading tokens identify a merchant; trailing tokens are usually location
+MAX_KEY_TOKENS = 4
+
+
+def normalize_merchant(text: Optional[str], max_tokens: Optional[int] = MAX_KEY_TOKENS) -> str:
+    """Reduce a merchant name or bank description to stable lowercase tokens
+
+    max_tokens=None keeps every token, for matching keys against full text.
+    """
+    if not text:
+        return ''
+
+    cleaned = _NON_ALPHA.sub(' ', text.lower())
+    tokens = [t for t in _WHITESPACE.split(cleaned) if len(t) > 1 and t not in NOISE_TOKENS]
+    return ' '.join(tokens[:max_tokens])
+
+
+def amount_bucket(amount: float) -> str:
+    """Bucket by amount sign; income and expenses from one merchant differ"""
+    return 'in' if amount > 0 else 'out'
+
+
+def make_cache_key(description: str, amount: float, merchant_name: Optional[str] = None) -> Optional[str]:
+    """Build the cache key, preferring the merchant name when present"""
+    tokens = normalize_merchant(merchant_name) or normalize_merchant(description)
+    if not tokens:
+        return None
+    return f"{amount_bucket(amount)}:{tokens}"
+
+
+class CategorizationCache:
+    """In-process LRU over the persistent merchant_categories table"""
+
+    def __init__(self, max_size: int = 5000, min_confidence: float = 0.5, enabled: bool = True):
+        self.max_size = max_size
+        self.min_confidence = min_confidence
+        # When disabled, lookups miss and model answers are not stored
+        self.enabled = enabled
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'db_hits': 0, 'misses': 0, 'stores': 0}
+
+    def _remember(self, key: str, result: Dict):
+        with self._lock:
+            self._lru[key] = result
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_size:
+                self._lru.popitem(last=False)
+
+    def get(self, key: Optional[str]) -> Optional[Dict]:
+        """Return a cached categorization, or None on a miss"""
+        if not key or not self.enabled:
+            return None
+
+        with self._lock:
+            result = self._lru.get(key)
+            if result is not None:
+                self._lru.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return dict(result)
+
+        try:
+            row = MerchantCategory.query.filter_by(cache_key=key, source='llm').first()
+        except Exception as e:
+            logger.warning(f"Categorization cache lookup failed: {e}")
+            row = None
+
+        if row is None:
+            with self._lock:
+                self.stats['misses'] += 1
+            return None
+
+        result = json.loads(row.result) if row.result else {}
+        result.update({
+            'category': row.category,
+            'subcategory': row.subcategory,
+            'confidence': row.confidence
+        })
+        self._remember(key, result)
+        with self._lock:
+            self.stats['db_hits'] += 1
+        return dict(result)
+
+    def put(self, key: Optional[str], result: Dict):
+        """
+        Store a model categorization in both levels
+
+        The row is written in a session of its own, so the caller's pending
+        work is neither committed nor rolled back here.
+        """
+        if not key or not result.get('category') or not self.enabled:
+            return
+
+        confidence = float(result.get('confidence') or 0)
+        if confidence < self.min_confidence:
+            return
+
+        # Per-request flags are not part of the cached answer
+        stored = {k: v for k, v in result.items() if k not in ('cache_hit', 'source', 'fallback', 'circuit_state')}
+
+        try:
+            with Session(db.engine) as session, session.begin():
+                row = session.scalars(select(MerchantCategory).filter_by(cache_key=key)).first()
+                if row is None:
+                    row = MerchantCategory(cache_key=key)
+                    session.add(row)
+
+                row.category = stored['category']
+                row.subcategory = stored.get('subcategory')
+                row.confidence = confidence
+                row.result = json.dumps(stored)
+                row.source = 'llm'
+        except Exception as e:
+            # e.g. another worker stored the same key first; the answer is still kept in memory
+            logger.warning(f"Categorization cache store failed: {e}")
+
+        self._remember(key, stored)
+        with self._lock:
+            self.stats['stores'] += 1
+
+    def clear_memory(self):
+        """Drop the in-process level (the table is left intact)"""
+        with self._lock:
+            self._lru.clear()
+
+
+# Shared across ClaudeService instances in this process
+categorization_cache = CategorizationCache(enabled=os.environ.get('AI_CATEGORIZATION_CACHE', '1') != '0')
@@ -0,0 +1,89 @@
+"""
+Category Spend
+
+Per-category spending totals and history computed with GROUP BY queries.
+Budget suggestions, the spending summary and analytics read category
+numbers from here instead of loading Transaction rows and summing them in
+Python. Uncategorized spending (NULL category) is reported as 'Other'.
+"""
+
+import calendar
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+from models_simple import db, Transaction
+
+
+def _window(user_id, start_date: date, end_date: date, is_income: bool):
+    return (
+        Transaction.user_id == user_id,
+        Transaction.date >= start_date,
+        Transaction.date <= end_date,
+        Transaction.is_income == is_income
+    )
+
+
+def category_totals(user_id, start_date: date, end_date: date,
+                    is_income: bool = False) -> Dict[str, Dict]:
+    """{category: {'total', 'count'}} for the window, largest total first"""
+    totals = {}
+    for category, total, count in db.session.query(
+        Transaction.category, func.sum(func.abs(Transaction.amount)), func.count(Transaction.id)
+    ).filter(*_window(user_id, start_date, end_date, is_income)).group_by(Transaction.category):
+        # NULL and 'Other' fold into one row
+        entry = totals.setdefault(category or 'Other', {'total': 0.0, 'count': 0})
+        entry['total'] += float(total or 0)
+        entry['count'] += count
+
+    return {
+        category: {'total': round(entry['total'], 2), 'count': entry['count']}
+        for category, entry in sorted(totals.items(), key=lambda item: -item[1]['total'])
+    }
+
+
+def average_monthly_spend(user_id, months: int = 3, end_date: Optional[date] = None) -> Dict[str, float]:
+    """Average monthly expense per category over the last months (30-day months)"""
+    end_date = end_date or date.today()
+    start_date = end_date - timedelta(days=30 * months)
+    return {
+        category: entry['total'] / months
+        for category, entry in category_totals(user_id, start_date, end_date).items()
+    }
+
+
+def monthly_category_history(user_id, months: int = 6, end_date: Optional[date] = None,
+                             is_income: bool = False) -> List[Dict]:
+    """
+    Calendar-month totals per category, oldest month first:
+    [{'month': 'YYYY-MM', 'categories': {category: total}, 'total'}]
+
+    Daily per-category sums come from SQL and are folded into months here,
+    which keeps the query portable across SQLite and Postgres.
+    """
+    end_date = end_date or date.today()
+    first = end_date.replace(day=1)
+    for _ in range(months - 1):
+        first = (first - timedelta(days=1)).replace(day=1)
+
+    history = {}
+    cursor = first
+    while cursor <= end_date:
+        history[cursor.strftime('%Y-%m')] = {}
+        cursor += timedelta(days=calendar.monthrange(cursor.year, cursor.month)[1])
+
+    for day, category, total in db.session.query(
+        Transaction.date, Transaction.category, func.sum(func.abs(Transaction.amount))
+    ).filter(*_window(user_id, first, end_date, is_income)).group_by(Transaction.date, Transaction.category):
+        month = history[day.strftime('%Y-%m')]
+        name = category or 'Other'
+        month[name] = month.get(name, 0.0) + float(total or 0)
+
+    return [
+        {
+            'month': month,
+            'categories': {name: round(total, 2) for name, total in sorted(totals.items(), key=lambda item: -item[1])},
+            'total': round(sum(totals.values()), 2)
+        }
+        for month, totals in history.items()
+    ]
@@ -0,0 +1,185 @@
+"""
+Delta Sync
+
+Change feed for offline-capable clients. Transactions, accounts and
+recurring items carry updated_at and version columns, and deletes leave a
+SyncTombstone. Given the token from its last sync, a client receives only
+rows changed since then (upserts, with version so it can keep the newest
+copy) and the ids deleted since then.
+
+Tokens are timestamps, so each sync re-reads a short overlap before the
+previous one. That catches rows whose transaction committed after a sync
+started but were stamped before it, and clock skew between app servers.
+Rows in the overlap are sent twice; the version tells the client they are
+unchanged. Large syncs are paged by keyset on (updated_at, id): while
+has_more is set, the token pins the session's window and each entity's
+position, and entities already sent in full are marked done.
+Tokens older than the tombstone retention answer with a full resync.
+"""
+
+import base64
+import json
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, insert, or_, select
+from models_simple import db, Transaction, Account, RecurringItem, SyncTombstone
+from services.serialization import TRANSACTION_FIELDS, ACCOUNT_FIELDS, RECURRING_ITEM_FIELDS
+
+# How far before the previous token each sync looks again
+OVERLAP = timedelta(seconds=30)
+
+# Tombstones are kept this long; older tokens get a full resync
+TOMBSTONE_RETENTION = timedelta(days=90)
+
+# Rows per entity per response before paging
+MAX_ROWS = 2000
+
+ENTITIES = {
+    'transactions': (Transaction, TRANSACTION_FIELDS.extend(updated_at=Transaction.updated_at, version=Transaction.version)),
+    'accounts': (Account, ACCOUNT_FIELDS.extend(version=Account.version)),
+    'recurring_items': (RecurringItem, RECURRING_ITEM_FIELDS.extend(updated_at=RecurringItem.updated_at, version=RecurringItem.version)),
+}
+
+
+def record_deletions(user_id, entity: str, ids: Iterable[int]) -> None:
+    """
+    Add tombstones for deleted rows to the session, dropping the user's
+    expired ones; the caller commits with the delete
+    """
+    now = datetime.utcnow()
+    rows = [{'user_id': int(user_id), 'entity': entity, 'entity_id': entity_id, 'deleted_at': now} for entity_id in ids]
+    if rows:
+        prune_tombstones(user_id, now)
+        db.session.execute(insert(SyncTombstone), rows)
+
+
+def prune_tombstones(user_id, now: Optional[datetime] = None) -> None:
+    """Drop the user's tombstones older than the retention"""
+    cutoff = (now or datetime.utcnow()) - TOMBSTONE_RETENTION
+    db.session.execute(delete(SyncTombstone).where(
+        SyncTombstone.user_id == user_id, SyncTombstone.deleted_at < cutoff
+    ))
+
+
+def encode_token(state: Dict) -> str:
+    raw = json.dumps(state, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_token(token: str) -> Dict:
+    """Inverse of encode_token; raises ValueError for anything malformed"""
+    try:
+        state = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        datetime.fromisoformat(state['s'])
+        if state.get('f'):
+            datetime.fromisoformat(state['f'])
+        for position in (state.get('p') or {}).values():
+            if position != 'done':
+                datetime.fromisoformat(position[0])
+                int(position[1])
+        return state
+    except (TypeError, ValueError, KeyError, IndexError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid sync token: {token!r}") from e
+
+
+def _after(updated_column, id_column, position: Optional[List]):
+    if not position:
+        return None
+    stamp, row_id = datetime.fromisoformat(position[0]), int(position[1])
+    return or_(updated_column > stamp, and_(updated_column == stamp, id_column > row_id))
+
+
+def _changed(user_id, model, projection, since: Optional[datetime], position) -> Tuple[List[Dict], bool, Optional[List]]:
+    """Rows changed since `since` (all rows when None) after the keyset position"""
+    statement = select(*projection.columns).where(model.user_id == user_id)
+    if since is not None:
+        statement = statement.where(model.updated_at >= since)
+    after = _after(model.updated_at, model.id, position)
+    if after is not None:
+        statement = statement.where(after)
+    rows = db.session.execute(
+        statement.order_by(model.updated_at, model.id).limit(MAX_ROWS + 1)
+    ).all()
+    has_more = len(rows) > MAX_ROWS
+    rows = rows[:MAX_ROWS]
+    last = [rows[-1].updated_at.isoformat(), rows[-1].id] if rows else position
+    return projection.dicts(rows), has_more, last
+
+
+def _deleted(user_id, since: datetime, position) -> Tuple[Dict[str, List[int]], bool, Optional[List]]:
+    statement = select(SyncTombstone.id, SyncTombstone.entity, SyncTombstone.entity_id, SyncTombstone.deleted_at).where(
+        SyncTombstone.user_id == user_id, SyncTombstone.deleted_at >= since
+    )
+    after = _after(SyncTombstone.deleted_at, SyncTombstone.id, position)
+    if after is not None:
+        statement = statement.where(after)
+    rows = db.session.execute(
+        statement.order_by(SyncTombstone.deleted_at, SyncTombstone.id).limit(MAX_ROWS + 1)
+    ).all()
+    has_more = len(rows) > MAX_ROWS
+    rows = rows[:MAX_ROWS]
+    deleted = {name: [] for name in ENTITIES}
+    for _, entity, entity_id, _ in rows:
+        deleted.setdefault(entity, []).append(entity_id)
+    last = [rows[-1].deleted_at.isoformat(), rows[-1].id] if rows else position
+    return deleted, has_more, last
+
+
+def changes_since(user_id, token: Optional[str] = None, now: Optional[datetime] = None) -> Dict:
+    """
+    {'full', 'token', 'has_more', <entity>: {'upserts': [...], 'deletes': [ids]}}
+
+    Without a token (or with an expired one) every row is sent and full is
+    true: the client should replace its copy. Raises ValueError for a
+    malformed token.
+    """
+    now = now or datetime.utcnow()
+    state = decode_token(token) if token else None
+    if state and datetime.fromisoformat(state['s']) < now - TOMBSTONE_RETENTION:
+        state = None
+
+    if state is None:
+        # Full sync: everything up to now, no tombstones needed
+        session_start, since, positions = now, None, {}
+    elif state.get('p'):
+        # Next page of a sync session
+        session_start = datetime.fromisoformat(state['s'])
+        since = datetime.fromisoformat(state['f']) if state.get('f') else None
+        positions = state['p']
+    else:
+        session_start, since, positions = now, datetime.fromisoformat(state['s']) - OVERLAP, {}
+
+    # full is only set on the first response; later pages of the session merge
+    response = {'full': state is None}
+    more = False
+    next_positions = {}
+    for name, (model, projection) in ENTITIES.items():
+        position = positions.get(name)
+        if position == 'done':
+            response[name] = {'upserts': [], 'deletes': []}
+            next_positions[name] = 'done'
+            continue
+        upserts, has_more, last = _changed(user_id, model, projection, since, position)
+        response[name] = {'upserts': upserts, 'deletes': []}
+        more = more or has_more
+        next_positions[name] = last if has_more else 'done'
+
+    if since is not None and positions.get('tombstones') != 'done':
+        deleted, has_more, last = _deleted(user_id, since, positions.get('tombstones'))
+        for name, ids in deleted.items():
+            if name in response:
+                response[name]['deletes'] = ids
+        more = more or has_more
+        next_positions['tombstones'] = last if has_more else 'done'
+
+    if more:
+        response['token'] = encode_token({
+            's': session_start.isoformat(),
+            'f': since.isoformat() if since else None,
+            'p': next_positions
+        })
+    else:
+        response['token'] = encode_token({'s': session_start.isoformat()})
+    response['has_more'] = more
+    return response
@@ -0,0 +1,376 @@
+"""
+Local Fast-Path Categorizer
+
+First tier of transaction categorization. A compiled Aho-Corasick automaton
+over merchant names and keywords (seeded from the prompt's category list)
+categorizes most transactions in microseconds. Only low-confidence matches
+need to escalate to Claude.
+
+Keywords match whole words; entries ending in "*" are stems and also match
+longer words ("restaurant*" matches "restaurants"). Categories a user has
+approved are compiled into a small automaton of their own, so they apply
+only to that user's transactions and an approval never rebuilds the shared
+one.
+"""
+
+import re
+import time
+import threading
+import logging
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+from services.categorization_cache import normalize_merchant
+
+logger = logging.getLogger(__name__)
+
+# (keyword, subcategory, confidence) per category. Brand names are precise;
+# generic words score lower and ambiguous ones fall below the escalation threshold.
+KEYWORD_CATEGORIES = {
+    'Food': [
+        ('safeway', 'Groceries', 0.92), ('whole foods', 'Groceries', 0.95),
+        ('trader joe', 'Groceries', 0.95), ('kroger', 'Groceries', 0.93),
+        ('aldi', 'Groceries', 0.92), ('publix', 'Groceries', 0.93),
+        ('grocery', 'Groceries', 0.85), ('supermarket', 'Groceries', 0.85),
+        ('starbucks', 'Coffee', 0.95), ('dunkin*', 'Coffee', 0.93),
+        ('coffee', 'Coffee', 0.82), ('cafe', 'Restaurants', 0.78),
+        ('mcdonald*', 'Fast Food', 0.95), ('chipotle', 'Fast Food', 0.95),
+        ('subway', 'Fast Food', 0.8), ('taco bell', 'Fast Food', 0.95),
+        ('burger king', 'Fast Food', 0.95), ('wendys', 'Fast Food', 0.93),
+        ('chick fil', 'Fast Food', 0.95), ('panera', 'Restaurants', 0.93),
+        ('doordash', 'Food Delivery', 0.93), ('grubhub', 'Food Delivery', 0.93),
+        ('uber eats', 'Food Delivery', 0.95), ('restaurant*', 'Restaurants', 0.85),
+        ('pizza', 'Restaurants', 0.85), ('bakery', 'Restaurants', 0.8)
+    ],
+    'Transportation': [
+        ('shell', 'Gas', 0.85), ('chevron', 'Gas', 0.93), ('exxon', 'Gas', 0.93),
+        ('mobil', 'Gas', 0.88), ('arco', 'Gas', 0.9), ('valero', 'Gas', 0.92),
+        ('gas station', 'Gas', 0.9), ('fuel', 'Gas', 0.8),
+        ('uber', 'Rideshare', 0.8), ('lyft', 'Rideshare', 0.93),
+        ('parking', 'Parking', 0.88), ('toll', 'Tolls', 0.8),
+        ('transit', 'Public Transit', 0.85), ('metro', 'Public Transit', 0.7)
+    ],
+    'Entertainment': [
+        ('netflix', 'Streaming Services', 0.97), ('spotify', 'Streaming Services', 0.97),
+        ('hulu', 'Streaming Services', 0.97), ('disney plus', 'Streaming Services', 0.97),
+        ('hbo', 'Streaming Services', 0.93), ('youtube', 'Streaming Services', 0.85),
+        ('steam', 'Games', 0.8), ('steampowered', 'Games', 0.93), ('playstation', 'Games', 0.93),
+        ('cinema', 'Movies', 0.88), ('amc', 'Movies', 0.8), ('theater', 'Events', 0.8),
+        ('ticketmaster', 'Events', 0.93)
+    ],
+    'Housing': [
+        ('rent', 'Rent/Mortgage', 0.85), ('mortgage', 'Rent/Mortgage', 0.93),
+        ('property management', 'Rent/Mortgage', 0.88), ('hoa', 'HOA Fees', 0.85),
+        ('home depot', 'Home Improvement', 0.88), ('lowes', 'Home Improvement', 0.88)
+    ],
+    'Utilities': [
+        ('electric*', 'Electricity', 0.85), ('water', 'Water', 0.7),
+        ('comcast', 'Internet', 0.93), ('xfinity', 'Internet', 0.93),
+        ('verizon*', 'Phone', 0.9), ('t mobile', 'Phone', 0.93),
+        ('internet', 'Internet', 0.8), ('utility', 'Utilities', 0.85),
+        ('pg e', 'Electricity', 0.9)
+    ],
+    'Healthcare': [
+        ('pharmacy', 'Pharmacy', 0.88), ('cvs', 'Pharmacy', 0.85),
+        ('walgreens', 'Pharmacy', 0.88), ('dental', 'Dental', 0.9),
+        ('clinic', 'Medical', 0.85), ('hospital', 'Medical', 0.9),
+        ('medical', 'Medical', 0.85), ('optometry', 'Vision', 0.9)
+    ],
+    'Shopping': [
+        ('amazon', 'Online Shopping', 0.85), ('target', 'General Merchandise', 0.85),
+        ('walmart', 'General Merchandise', 0.85), ('costco', 'Warehouse Club', 0.8),
+        ('best buy', 'Electronics', 0.93), ('ebay', 'Online Shopping', 0.9),
+        ('etsy', 'Online Shopping', 0.9), ('ikea', 'Furniture', 0.9),
+        ('nordstrom', 'Clothing', 0.93), ('old navy', 'Clothing', 0.93)
+    ],
+    'Travel': [
+        ('airline*', 'Flights', 0.9),
+        ('delta air', 'Flights', 0.95), ('united air', 'Flights', 0.95),
+        ('southwest', 'Flights', 0.85), ('hotel*', 'Lodging', 0.88),
+        ('airbnb', 'Lodging', 0.95), ('marriott', 'Lodging', 0.95),
+        ('hilton', 'Lodging', 0.93), ('expedia', 'Travel Booking', 0.93)
+    ],
+    'Insurance': [
+        ('insurance', 'Insurance', 0.9), ('geico', 'Auto Insurance', 0.95),
+        ('state farm', 'Insurance', 0.93), ('progressive', 'Auto Insurance', 0.85),
+        ('allstate', 'Insurance', 0.93)
+    ],
+    'Education': [
+        ('tuition', 'Tuition', 0.93), ('university', 'Tuition', 0.8),
+        ('coursera', 'Online Courses', 0.95), ('udemy', 'Online Courses', 0.95),
+        ('bookstore', 'Books', 0.8)
+    ],
+    'Personal Care': [
+        ('salon', 'Hair', 0.9), ('barber', 'Hair', 0.93), ('spa', 'Spa', 0.8),
+        ('gym', 'Fitness', 0.85), ('fitness', 'Fitness', 0.85)
+    ],
+    'Gifts': [
+        ('gift', 'Gifts', 0.78), ('donation', 'Charity', 0.85), ('charity', 'Charity', 0.88)
+    ],
+    'Business': [
+        ('office depot', 'Office Supplies', 0.85), ('staples', 'Office Supplies', 0.8),
+        ('aws', 'Software', 0.85), ('google workspace', 'Software', 0.9)
+    ],
+    'Investment': [
+        ('vanguard', 'Brokerage', 0.9), ('fidelity', 'Brokerage', 0.88),
+        ('robinhood', 'Brokerage', 0.93), ('schwab', 'Brokerage', 0.88)
+    ],
+    'Savings': [
+        ('transfer to savings', 'Transfer', 0.85), ('savings', 'Transfer', 0.65)
+    ],
+    'Debt Payment': [
+        ('loan*', 'Loan Payment', 0.75), ('student loan', 'Student Loan', 0.9),
+        ('credit card payment', 'Credit Card', 0.85), ('navient', 'Student Loan', 0.93)
+    ]
+}
+
+# Matched only for positive amounts
+INCOME_KEYWORDS = [
+    ('payroll', 'Salary', 0.95), ('direct deposit', 'Salary', 0.9),
+    ('salary', 'Salary', 0.93), ('dividend*', 'Investment Income', 0.9),
+    ('interest', 'Interest', 0.85), ('refund*', 'Refund', 0.8),
+    ('venmo', 'Transfer', 0.6), ('zelle', 'Transfer', 0.6)
+]
+
+ESSENTIAL_CATEGORIES = {'Housing', 'Transportation', 'Food', 'Utilities', 'Healthcare', 'Insurance', 'Debt Payment'}
+
+# Matches conflicting with another category lose this much confidence
+AMBIGUITY_PENALTY = 0.15
+
+# Confidence of a user-approved category
+APPROVED_CONFIDENCE = 0.97
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Lowercase, replace punctuation with spaces and pad for word-boundary matching"""
+    if not text:
+        return ' '
+    return ' ' + ' '.join(_NON_ALNUM.sub(' ', text.lower()).split()) + ' '
+
+
+class AhoCorasick:
+    """Multi-pattern string matcher; one pass over the text finds every pattern"""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[str, object]]] = [[]]
+        self._built = False
+
+    def add(self, pattern: str, value):
+        """Add a pattern; must be called before build()"""
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append((pattern, value))
+        self._built = False
+
+    def build(self):
+        """Compute failure links breadth-first"""
+        queue = deque(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+        self._built = True
+        return self
+
+    def iter_matches(self, text: str):
+        """Yield (pattern, value) for every occurrence in text"""
+        if not self._built:
+            self.build()
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                yield from output[node]
+
+    def __len__(self):
+        return len(self._goto)
+
+
+class FastCategorizer:
+    """Compiled keyword and merchant matcher with per-user approved overrides"""
+
+    # Local answers at or above this confidence skip the LLM
+    ESCALATION_THRESHOLD = 0.8
+
+    # A user's approved rules are re-read from the database this often so every worker sees them
+    RELOAD_SECONDS = 300
+
+    def __init__(self, include_approved: bool = True, max_users: int = 10000):
+        self.include_approved = include_approved
+        self.max_users = max_users
+        self._expense_matcher: Optional[AhoCorasick] = None
+        self._income_matcher: Optional[AhoCorasick] = None
+        self._approved = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _pattern(keyword: str) -> str:
+        # Whole words between the padding spaces; a stem drops the trailing space
+        if keyword.endswith('*'):
+            return normalize_text(keyword[:-1])[:-1]
+        return normalize_text(keyword)
+
+    def build(self):
+        """Compile the shared automata from the keyword lists"""
+        expense = AhoCorasick()
+        income = AhoCorasick()
+
+        for category, keywords in KEYWORD_CATEGORIES.items():
+            for keyword, subcategory, confidence in keywords:
+                value = (category, subcategory, confidence, False)
+                expense.add(self._pattern(keyword), value)
+                income.add(self._pattern(keyword), value)
+
+        for keyword, subcategory, confidence in INCOME_KEYWORDS:
+            income.add(self._pattern(keyword), ('Income', subcategory, confidence, False))
+
+        self._income_matcher = income.build()
+        self._expense_matcher = expense.build()
+        return self
+
+    def _matchers(self):
+        if self._expense_matcher is None:
+            with self._lock:
+                if self._expense_matcher is None:
+                    self.build()
+        return self._expense_matcher, self._income_matcher
+
+    @staticmethod
+    def _load_approved_rules(user_id) -> List[Tuple[str, str, str, Optional[str]]]:
+        """(bucket, tokens, category, subcategory) for the user's approved categories"""
+        try:
+            from models_simple import ApprovedCategory
+            rows = ApprovedCategory.query.filter_by(user_id=int(user_id)).all()
+        except Exception as e:
+            logger.warning(f"Could not load approved categories for user {user_id}: {e}")
+            return []
+        rules = []
+        for row in rows:
+            bucket, _, tokens = row.cache_key.partition(':')
+            if tokens:
+                rules.append((bucket, tokens, row.category, row.subcategory))
+        return rules
+
+    def _approved_matchers(self, user_id) -> Tuple[Optional[AhoCorasick], Optional[AhoCorasick]]:
+        """The user's approved-rule automata, or (None, None) when they have none"""
+        if user_id is None or not self.include_approved:
+            return None, None
+        key = str(user_id)
+        with self._lock:
+            entry = self._approved.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= self.RELOAD_SECONDS:
+                self._approved.move_to_end(key)
+                return entry[1], entry[2]
+
+        expense = income = None
+        rules = self._load_approved_rules(user_id)
+        if rules:
+            expense, income = AhoCorasick(), AhoCorasick()
+            for bucket, tokens, category, subcategory in rules:
+                (income if bucket == 'in' else expense).add(
+                    normalize_text(tokens), (category, subcategory, APPROVED_CONFIDENCE, True)
+                )
+            expense.build()
+            income.build()
+
+        with self._lock:
+            self._approved[key] = (time.monotonic(), expense, income)
+            self._approved.move_to_end(key)
+            while len(self._approved) > self.max_users:
+                self._approved.popitem(last=False)
+        return expense, income
+
+    def invalidate(self, user_id=None):
+        """Reload a user's approved rules on their next lookup (all users when None)"""
+        with self._lock:
+            if user_id is None:
+                self._approved.clear()
+            else:
+                self._approved.pop(str(user_id), None)
+
+    def categorize(self, description: str, amount: float, merchant_name: Optional[str] = None,
+                   user_id=None) -> Dict[str, any]:
+        """
+        Categorize locally, with the user's approved categories when user_id is given
+
+        Returns the same shape as the LLM categorizer, plus approved (whether
+        one of the user's approved categories matched). Confidence is 0 when
+        nothing matched; callers escalate when it is below ESCALATION_THRESHOLD.
+        """
+        expense_matcher, income_matcher = self._matchers()
+        approved_expense, approved_income = self._approved_matchers(user_id)
+        if amount > 0:
+            matchers = (income_matcher, approved_income)
+        else:
+            matchers = (expense_matcher, approved_expense)
+        text = normalize_text(f"{merchant_name or ''} {description or ''}")
+        # Approved patterns are cache keys, so scan text normalized the same
+        # way (noise tokens dropped) but untruncated, so longer text still matches
+        approved_text = normalize_text(
+            f"{normalize_merchant(merchant_name, None)} {normalize_merchant(description, None)}"
+        )
+
+        best = {}
+        for matcher, scanned in zip(matchers, (text, approved_text)):
+            if matcher is None:
+                continue
+            for pattern, (category, subcategory, confidence, approved) in matcher.iter_matches(scanned):
+                # Approved rules beat keywords; then higher confidence; then the longer, more specific pattern
+                rank = (approved, confidence, len(pattern))
+                if category not in best or rank > best[category][0]:
+                    best[category] = (rank, subcategory)
+
+        if not best:
+            return {
+                "category": 'Income' if amount > 0 else 'Other',
+                "confidence": 0.0,
+                "subcategory": 'General',
+                "recurring_likelihood": 0.3,
+                "essential": False,
+                "note": "No local match",
+                "approved": False
+            }
+
+        category, ((approved, confidence, _), subcategory) = max(best.items(), key=lambda item: item[1][0])
+        if len(best) > 1 and not approved:
+            confidence -= AMBIGUITY_PENALTY
+
+        return {
+            "category": category,
+            "confidence": round(confidence, 2),
+            "subcategory": subcategory,
+            "recurring_likelihood": 0.6 if category in ('Entertainment', 'Utilities', 'Housing', 'Insurance') else 0.3,
+            "essential": category in ESSENTIAL_CATEGORIES,
+            "note": f"Matched {'approved rule' if approved else 'keyword'} for {category}",
+            "approved": approved
+        }
+
+    def is_confident(self, result: Dict) -> bool:
+        """Whether a local answer is good enough to skip the LLM"""
+        return result.get('confidence', 0) >= self.ESCALATION_THRESHOLD
+
+
+# Shared instance used by ClaudeService
+fast_categorizer = FastCategorizer()
@@ -0,0 +1,135 @@
+"""
+Background Job Queue
+
+Runs slow work (AI model calls, statement imports) on local thread pools so
+a gunicorn worker can answer the request immediately with a job ID. Each
+kind of work has its own queue, so long imports don't hold up AI jobs. Clients poll the job's
+status endpoint for the result. Jobs live in memory and expire after a TTL.
+"""
+
+import os
+import uuid
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from flask import current_app
+from services.ai_metrics import current_route, attributed
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """A unit of background work and its outcome"""
+
+    def __init__(self, user_id, kind: str):
+        self.id = uuid.uuid4().hex
+        self.user_id = str(user_id) if user_id is not None else None
+        self.kind = kind
+        self.status = 'queued'  # queued, running, succeeded, failed
+        self.result = None
+        self.error: Optional[str] = None
+        self.progress: Dict = {}
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ('succeeded', 'failed')
+
+    def update_progress(self, **fields):
+        """Report progress from inside a running job"""
+        self.progress.update(fields)
+
+    def to_dict(self, include_result: bool = True):
+        """Convert to dictionary for JSON serialization"""
+        data = {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': dict(self.progress),
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+        if include_result and self.status == 'succeeded':
+            data['result'] = self.result
+        return data
+
+
+class JobQueue:
+    """Thread-pool job runner with in-memory status tracking"""
+
+    def __init__(self, max_workers: int = 4, ttl_seconds: int = 3600, name: str = 'job'):
+        self.max_workers = max_workers
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, user_id, kind: str, fn: Callable, *args, pass_job: bool = False, **kwargs) -> Job:
+        """
+        Queue fn(*args, **kwargs) to run inside an app context
+
+        With pass_job=True the Job is passed as the first argument so the
+        function can report progress.
+        """
+        job = Job(user_id, kind)
+        app = current_app._get_current_object()
+        # Model calls made by the job count toward the endpoint that queued it
+        route = current_route()
+
+        def run():
+            job.status = 'running'
+            job.started_at = datetime.utcnow()
+            try:
+                with app.app_context(), attributed(route):
+                    job.result = fn(job, *args, **kwargs) if pass_job else fn(*args, **kwargs)
+                job.status = 'succeeded'
+            except Exception as e:
+                logger.error(f"Job {job.id} ({kind}) failed: {e}")
+                job.error = str(e)
+                job.status = 'failed'
+            finally:
+                job.finished_at = datetime.utcnow()
+
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._executor.submit(run)
+        return job
+
+    def get(self, job_id: str, user_id=None) -> Optional[Job]:
+        """Look up a job; with user_id, only that user's jobs are visible"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or (user_id is not None and job.user_id != str(user_id)):
+            return None
+        return job
+
+    def stats(self) -> Dict:
+        """Counts of tracked jobs by status"""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        counts = {}
+        for job in jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {'workers': self.max_workers, 'jobs': counts}
+
+    def _prune(self):
+        """Forget finished jobs older than the TTL (caller holds the lock)"""
+        cutoff = datetime.utcnow() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items() if job.done and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+# Shared queue for AI work in this process
+job_queue = JobQueue(max_workers=int(os.environ.get('AI_JOB_WORKERS', '4')))
+
+# Statement imports, kept apart so large files don't delay AI jobs
+import_queue = JobQueue(max_workers=int(os.environ.get('IMPORT_JOB_WORKERS', '2')), name='import')
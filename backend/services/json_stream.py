@@ -0,0 +1,92 @@
+"""
+Streaming JSON Sections
+
+Incremental parser for a JSON object that arrives in arbitrary text chunks
+(model output tokens). Each top-level member is emitted as soon as its value
+is complete, so clients can render "insights" before "warnings" has been
+generated. Text before the opening brace (model preamble) is ignored.
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class JSONSectionParser:
+    """Emit (key, value) for each top-level member of a streamed JSON object"""
+
+    def __init__(self):
+        self._buffer = ''
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object_start: Optional[int] = None
+        self._object_end: Optional[int] = None
+        self._member_start: Optional[int] = None
+        self.sections: Dict[str, Any] = {}
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """Add a chunk; returns the members completed by it, in order"""
+        self._buffer += text
+        completed = []
+        buffer = self._buffer
+
+        for i in range(self._pos, len(buffer)):
+            if self._object_end is not None:
+                break
+            char = buffer[i]
+
+            if self._depth == 0 and char != '{':
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+                if self._depth == 1:
+                    self._object_start = i
+                    self._member_start = i + 1
+            elif char in '}]':
+                if self._depth == 1:
+                    self._close_member(buffer[self._member_start:i], completed)
+                    self._object_end = i + 1
+                self._depth -= 1
+            elif char == ',' and self._depth == 1:
+                self._close_member(buffer[self._member_start:i], completed)
+                self._member_start = i + 1
+
+        self._pos = len(buffer)
+        return completed
+
+    def _close_member(self, text: str, completed: List[Tuple[str, Any]]):
+        if not text.strip():
+            return
+        try:
+            member = json.loads('{' + text + '}')
+        except ValueError:
+            return
+        for key, value in member.items():
+            self.sections[key] = value
+            completed.append((key, value))
+
+    @property
+    def complete(self) -> bool:
+        return self._object_end is not None
+
+    def result(self) -> Optional[Dict]:
+        """The whole object once its closing brace has arrived"""
+        if not self.complete:
+            return None
+        try:
+            return json.loads(self._buffer[self._object_start:self._object_end])
+        except ValueError:
+            return dict(self.sections)
@@ -0,0 +1,96 @@
+"""
+Keyset Pagination
+
+Opaque cursors for lists ordered newest first on (date, id). A page is
+"rows strictly after the cursor's (date, id)", which an index on
+(user_id, date, id) answers in constant time however deep the page, and
+ties on date can't repeat or skip rows the way LIMIT/OFFSET pages can.
+
+Exact totals are optional; CountCache keeps them per user and filter set
+until the user's transactions change, so scrolling does not re-count.
+"""
+
+import base64
+import json
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from services.signals import transactions_changed
+
+
+def encode_cursor(row_date: date, row_id: int) -> str:
+    """Opaque cursor for the position just after (row_date, row_id)"""
+    raw = json.dumps([row_date.isoformat(), row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[date, int]:
+    """Inverse of encode_cursor; raises ValueError for anything malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        row_date, row_id = json.loads(raw)
+        return date.fromisoformat(row_date), int(row_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def after_cursor(date_column, id_column, cursor: str):
+    """WHERE clause for rows after the cursor in (date desc, id desc) order"""
+    row_date, row_id = decode_cursor(cursor)
+    return or_(date_column < row_date, and_(date_column == row_date, id_column < row_id))
+
+
+class CountCache:
+    """Exact row counts per user and filter key, dropped when transactions change"""
+
+    def __init__(self, max_users: int = 10000):
+        self.max_users = max_users
+        self._counts = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def get(self, user_id, key: str, count: Callable[[], int]) -> int:
+        """Cached count for (user_id, key), calling count() on a miss"""
+        user_id = str(user_id)
+        with self._lock:
+            counts = self._counts.get(user_id)
+            if counts is not None and key in counts:
+                self._counts.move_to_end(user_id)
+                self.stats['hits'] += 1
+                return counts[key]
+            generation = self._generations.get(user_id, 0)
+
+        self.stats['misses'] += 1
+        value = count()
+        with self._lock:
+            # Don't keep a count that an invalidation raced past
+            if self._generations.get(user_id, 0) == generation:
+                self._counts.setdefault(user_id, {})[key] = value
+                self._counts.move_to_end(user_id)
+                while len(self._counts) > self.max_users:
+                    self._counts.popitem(last=False)
+        return value
+
+    def invalidate(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            self._counts.pop(user_id, None)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+
+# Shared totals for the transaction list
+transaction_counts = CountCache()
+
+
+@transactions_changed.connect
+def _on_transactions_changed(user_id, **extra):
+    transaction_counts.invalidate(user_id)
+
+
+def filter_key(params: Dict[str, Optional[str]]) -> str:
+    """Stable cache key for a set of list filters"""
+    return json.dumps({k: v for k, v in sorted(params.items()) if v is not None}, separators=(',', ':'))
@@ -0,0 +1,164 @@
+"""
+Daily Recommendation Cache
+
+Keeps one set of daily recommendations per user per day. Transaction writes
+only mark the entry stale; readers keep getting the stale value while a
+background refresh runs on the job queue, with at most one refresh in
+flight per user.
+"""
+
+import threading
+import logging
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from services.jobs import job_queue, Job
+from services.signals import transactions_changed, balances_changed
+
+logger = logging.getLogger(__name__)
+
+
+class RecommendationCache:
+    """Per-user, per-day stale-while-revalidate cache"""
+
+    def __init__(self, max_users: int = 10000):
+        self.max_users = max_users
+        self._entries = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._inflight: Dict[str, Job] = {}
+        # job id -> (data version its value will reflect, writes it expects)
+        self._refresh_versions: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0}
+
+    def lookup(self, user_id) -> Optional[Dict]:
+        """
+        Today's entry for the user, or None on a miss
+
+        The entry is a dict with value, stale and generated_at. Entries from
+        an earlier day are not served.
+        """
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry['day'] != date.today():
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(user_id)
+            stale = entry['version'] < self._versions.get(user_id, 0)
+            self.stats['stale_hits' if stale else 'hits'] += 1
+            return {
+                'value': entry['value'],
+                'stale': stale,
+                'generated_at': entry['generated_at']
+            }
+
+    def store(self, user_id, value: Dict, version: Optional[int] = None, job_id: Optional[str] = None):
+        """
+        Save freshly computed recommendations for today
+
+        version is the data version the value reflects (defaults to the
+        current one). Writes notified after it make the entry stale, so a
+        refresh that raced with a write is served but refreshed again.
+        job_id is the refresh job that computed the value, if any.
+        """
+        user_id = str(user_id)
+        with self._lock:
+            expected_writes = 0
+            if job_id in self._refresh_versions:
+                version, expected_writes = self._refresh_versions.pop(job_id)
+            self._entries[user_id] = {
+                'day': date.today(),
+                'value': value,
+                'version': self._versions.get(user_id, 0) if version is None else version,
+                'generated_at': datetime.utcnow().isoformat(),
+                'job_id': job_id,
+                'expected_writes': expected_writes
+            }
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                evicted, _ = self._entries.popitem(last=False)
+                self._versions.pop(evicted, None)
+
+    def mark_stale(self, user_id):
+        """Flag the user's entry for refresh without dropping it"""
+        user_id = str(user_id)
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+    def refreshing(self, user_id) -> Optional[Job]:
+        """The user's in-flight refresh job, if any"""
+        with self._lock:
+            job = self._inflight.get(str(user_id))
+        return job if job is not None and not job.done else None
+
+    def refresh(self, user_id, compute: Callable[..., Dict], *args, expected_writes: int = 0) -> Job:
+        """
+        Start a background refresh of compute(user_id, *args) unless one is
+        already running for the user
+
+        expected_writes is the number of write notifications the caller is
+        about to send that the computation already accounts for (for example
+        a pending transaction passed in args); those writes do not make the
+        refreshed entry stale. If the caller's write then fails, it must call
+        cancel_expected_writes.
+        """
+        user_id = str(user_id)
+        with self._lock:
+            job = self._inflight.get(user_id)
+            if job is not None and not job.done:
+                return job
+            version = self._versions.get(user_id, 0) + expected_writes
+            job = job_queue.submit(user_id, 'daily_recommendations', self._run_refresh,
+                                   user_id, compute, args, pass_job=True)
+            # The job can't store before the lock is released
+            self._refresh_versions[job.id] = (version, expected_writes)
+            self._inflight[user_id] = job
+            self.stats['refreshes'] += 1
+        return job
+
+    def cancel_expected_writes(self, user_id, job: Optional[Job]):
+        """
+        The writes a refresh was started to expect did not happen (the
+        caller's commit failed), so its value counts spending that doesn't
+        exist: serve it as stale and refresh it on the next read
+        """
+        if job is None:
+            return
+        user_id = str(user_id)
+        with self._lock:
+            pending = self._refresh_versions.get(job.id)
+            if pending is not None:
+                if pending[1]:
+                    self._refresh_versions[job.id] = (-1, pending[1])
+                return
+            entry = self._entries.get(user_id)
+            if entry is not None and entry['job_id'] == job.id and entry['expected_writes']:
+                entry['version'] = -1
+
+    def _run_refresh(self, job: Job, user_id: str, compute: Callable[..., Dict], args: tuple) -> Dict:
+        try:
+            value = compute(user_id, *args)
+            self.store(user_id, value, job_id=job.id)
+            return value
+        finally:
+            with self._lock:
+                self._refresh_versions.pop(job.id, None)
+                if self._inflight.get(user_id) is job:
+                    del self._inflight[user_id]
+
+    def clear(self):
+        """Drop every entry (in-flight refreshes still finish and store)"""
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared cache used by the AI routes
+recommendation_cache = RecommendationCache()
+
+
+@transactions_changed.connect
+@balances_changed.connect
+def _on_user_data_changed(user_id, **extra):
+    recommendation_cache.mark_stale(user_id)
@@ -0,0 +1,259 @@
+"""
+Recurrence Materializer
+
+Expands recurring transaction templates (is_recurring rows with a
+recurrence_type and recurrence_interval) into dated occurrences on demand.
+The template row is the first occurrence. Later occurrences are computed
+for whatever window a caller asks about and cached per user, and only the
+ones that have come due (date <= today) are written as real transactions,
+linked to their template by recurrence_parent_id. Future occurrences stay
+virtual, so projections see them without the table growing ahead of time.
+Each template records the last date written (recurrence_materialized_through),
+so an occurrence the user deletes or moves is not written again.
+
+A user who logs each month's rent by hand as a recurring row ends up with
+several templates for one series; only the most recent row of a series
+(same description, type and direction) acts as the template.
+"""
+
+import calendar
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from models_simple import db, Transaction
+from services.signals import transactions_changed, notify_transactions_changed
+
+logger = logging.getLogger(__name__)
+
+# recurrence_type -> (unit, units per period)
+PERIODS = {
+    'daily': ('days', 1),
+    'weekly': ('days', 7),
+    'biweekly': ('days', 14),
+    'monthly': ('months', 1),
+    'quarterly': ('months', 3),
+    'yearly': ('months', 12),
+}
+
+# A template seen for the first time only backfills this far
+BACKFILL_DAYS = 90
+
+# Cached windows kept per user
+MAX_WINDOWS = 16
+
+
+def occurrence_date(anchor: date, recurrence_type: str, interval: int, n: int) -> date:
+    """The nth occurrence after anchor (n=0 is anchor); month ends clamp (Jan 31 -> Feb 28)"""
+    unit, step = PERIODS[recurrence_type]
+    if unit == 'days':
+        return anchor + timedelta(days=step * interval * n)
+    months = anchor.month - 1 + step * interval * n
+    year, month = anchor.year + months // 12, months % 12 + 1
+    return date(year, month, min(anchor.day, calendar.monthrange(year, month)[1]))
+
+
+def occurrence_dates(anchor: date, recurrence_type: str, interval: int,
+                     start: date, end: date) -> Iterator[date]:
+    """Occurrences (the anchor included) that fall within [start, end]"""
+    if recurrence_type not in PERIODS or end < start:
+        return
+    interval = max(int(interval or 1), 1)
+    unit, step = PERIODS[recurrence_type]
+    # Jump close to start instead of walking from the anchor
+    if unit == 'days':
+        n = max((start - anchor).days // (step * interval), 0)
+    else:
+        n = max(((start.year - anchor.year) * 12 + start.month - anchor.month) // (step * interval), 0)
+    while True:
+        current = occurrence_date(anchor, recurrence_type, interval, n)
+        if current > end:
+            return
+        if current >= start:
+            yield current
+        n += 1
+
+
+def _load_templates(user_id) -> List[Dict]:
+    """The user's active templates, one per series"""
+    rows = db.session.execute(
+        select(
+            Transaction.id, Transaction.description, Transaction.amount, Transaction.date,
+            Transaction.category, Transaction.is_income, Transaction.recurrence_type,
+            Transaction.recurrence_interval, Transaction.account_id, Transaction.merchant_name,
+            Transaction.recurrence_materialized_through
+        ).where(
+            Transaction.user_id == user_id,
+            Transaction.is_recurring == True,
+            Transaction.recurrence_type.in_(list(PERIODS))
+        ).order_by(Transaction.date, Transaction.id)
+    ).mappings()
+
+    series = {}
+    for row in rows:
+        key = ((row['description'] or '').strip().lower(), row['recurrence_type'], bool(row['is_income']))
+        # Rows come oldest first, so the newest of each series wins
+        series[key] = dict(row, amount=float(row['amount']), recurrence_interval=row['recurrence_interval'] or 1)
+    return list(series.values())
+
+
+class RecurrenceMaterializer:
+    """Per-user template and expansion cache, plus the write path for due occurrences"""
+
+    def __init__(self, max_users: int = 10000):
+        self.max_users = max_users
+        self._users = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'materialized': 0}
+
+    def _entry(self, user_id: str) -> Tuple[Optional[Dict], int]:
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                self._users.move_to_end(user_id)
+            return entry, self._generations.get(user_id, 0)
+
+    def _store(self, user_id: str, generation: int, **fields):
+        with self._lock:
+            # Don't keep anything an invalidation raced past
+            if self._generations.get(user_id, 0) != generation:
+                return
+            entry = self._users.setdefault(user_id, {'templates': None, 'windows': OrderedDict(), 'through': None})
+            self._users.move_to_end(user_id)
+            windows = fields.pop('windows', None)
+            entry.update(fields)
+            if windows:
+                entry['windows'].update(windows)
+                while len(entry['windows']) > MAX_WINDOWS:
+                    entry['windows'].popitem(last=False)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def templates(self, user_id) -> List[Dict]:
+        user_id = str(user_id)
+        entry, generation = self._entry(user_id)
+        if entry is not None and entry['templates'] is not None:
+            return entry['templates']
+        templates = _load_templates(user_id)
+        self._store(user_id, generation, templates=templates)
+        return templates
+
+    def expand(self, user_id, start: date, end: date) -> List[Dict]:
+        """
+        Occurrences of every template within [start, end], including the
+        template's own row, in date order:
+        {'template_id', 'date', 'amount', 'description', 'category', 'is_income'}
+        """
+        key = (start, end)
+        user_key = str(user_id)
+        entry, generation = self._entry(user_key)
+        if entry is not None and key in entry['windows']:
+            self.stats['hits'] += 1
+            return entry['windows'][key]
+
+        self.stats['misses'] += 1
+        occurrences = []
+        for template in self.templates(user_id):
+            for when in occurrence_dates(template['date'], template['recurrence_type'],
+                                         template['recurrence_interval'], start, end):
+                occurrences.append({
+                    'template_id': template['id'],
+                    'date': when,
+                    'amount': template['amount'],
+                    'description': template['description'],
+                    'category': template['category'],
+                    'is_income': bool(template['is_income'])
+                })
+        occurrences.sort(key=lambda o: (o['date'], o['template_id']))
+        self._store(user_key, generation, windows={key: occurrences})
+        return occurrences
+
+    def upcoming(self, user_id, end: date, today: Optional[date] = None) -> List[Dict]:
+        """Occurrences after today through end, which have not been spent yet"""
+        today = today or date.today()
+        return self.expand(user_id, today + timedelta(days=1), end) if end > today else []
+
+    def materialize_due(self, user_id, today: Optional[date] = None) -> int:
+        """
+        Write occurrences dated on or before today that aren't stored yet;
+        returns how many were inserted. Runs at most once per user per day
+        unless their transactions change.
+        """
+        today = today or date.today()
+        user_key = str(user_id)
+        entry, generation = self._entry(user_key)
+        if entry is not None and entry['through'] == today:
+            return 0
+
+        templates = self.templates(user_id)
+        rows = []
+        watermarks = {}
+        if templates:
+            # Templates written before the watermark existed fall back to their newest child
+            unmarked = [t['id'] for t in templates if t['recurrence_materialized_through'] is None]
+            last_stored = dict(db.session.execute(
+                select(Transaction.recurrence_parent_id, func.max(Transaction.date)).where(
+                    Transaction.user_id == user_id,
+                    Transaction.recurrence_parent_id.in_(unmarked)
+                ).group_by(Transaction.recurrence_parent_id)
+            ).all()) if unmarked else {}
+            backfill_from = today - timedelta(days=BACKFILL_DAYS)
+            for template in templates:
+                through = template['recurrence_materialized_through'] or last_stored.get(template['id'], template['date'])
+                after = max(through, template['date'], backfill_from - timedelta(days=1))
+                for when in occurrence_dates(template['date'], template['recurrence_type'],
+                                             template['recurrence_interval'], after + timedelta(days=1), today):
+                    rows.append({
+                        'user_id': int(user_id),
+                        'account_id': template['account_id'],
+                        'description': template['description'],
+                        'amount': template['amount'],
+                        'date': when,
+                        'category': template['category'],
+                        'is_income': bool(template['is_income']),
+                        'is_recurring': False,
+                        'merchant_name': template['merchant_name'],
+                        'recurrence_parent_id': template['id']
+                    })
+                    watermarks[template['id']] = when
+
+        if rows:
+            try:
+                db.session.execute(insert(Transaction), rows)
+                db.session.execute(update(Transaction), [
+                    {'id': template_id, 'recurrence_materialized_through': through}
+                    for template_id, through in watermarks.items()
+                ])
+                db.session.commit()
+            except IntegrityError:
+                # Another request materialized the same occurrences first
+                db.session.rollback()
+                rows = []
+            else:
+                self.stats['materialized'] += len(rows)
+                logger.info(f"Materialized {len(rows)} recurring occurrences for user {user_id}")
+                notify_transactions_changed(user_id)
+                entry, generation = self._entry(user_key)
+
+        self._store(user_key, generation, through=today)
+        return len(rows)
+
+    def invalidate(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            self._users.pop(user_id, None)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+
+# Shared materializer for the allowance and transaction routes
+recurrence_materializer = RecurrenceMaterializer()
+
+
+@transactions_changed.connect
+def _on_transactions_changed(user_id, **extra):
+    recurrence_materializer.invalidate(user_id)
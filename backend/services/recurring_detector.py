@@ -0,0 +1,262 @@
+"""
+Recurring Transaction Detector
+
+Finds recurring income and expenses in a user's history without model calls.
+Transactions are grouped by normalized merchant and amount sign, split into
+amount bands, and each band's date intervals are tested against weekly,
+bi-weekly, monthly and yearly periods. Regular bands become RecurringItem
+candidates with the next expected date.
+
+Only plain tuples are loaded (no ORM objects), so tens of thousands of
+transactions are scanned in well under a second.
+"""
+
+import calendar
+import statistics
+from collections import Counter
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from models_simple import db, Transaction, RecurringItem
+from services.categorization_cache import normalize_merchant
+
+# (frequency, period in days, tolerance in days, minimum occurrences)
+FREQUENCIES = [
+    ('weekly', 7.0, 1.5, 4),
+    ('bi-weekly', 14.0, 2.5, 3),
+    ('monthly', 30.44, 4.0, 3),
+    ('yearly', 365.25, 12.0, 2),
+]
+
+# Sorted amounts more than this far apart (relative) start a new band
+AMOUNT_BAND_GAP = 0.2
+
+# Share of intervals that must fit the period (one skipped occurrence is allowed)
+MIN_REGULARITY = 0.75
+
+# Long enough to see two yearly charges
+LOOKBACK_DAYS = 800
+
+
+class RecurringCandidate:
+    """A detected recurring series and the RecurringItem it would become"""
+
+    def __init__(self, key: str, item: RecurringItem, confidence: float,
+                 occurrences: int, last_date: date, transaction_ids: List[int]):
+        self.key = key
+        self.item = item
+        self.confidence = confidence
+        self.occurrences = occurrences
+        self.last_date = last_date
+        self.transaction_ids = transaction_ids
+
+    def to_dict(self):
+        """Convert to dictionary for JSON serialization"""
+        data = self.item.to_dict()
+        data.update({
+            'key': self.key,
+            'confidence': self.confidence,
+            'occurrences': self.occurrences,
+            'last_date': self.last_date.isoformat(),
+            'transaction_ids': self.transaction_ids
+        })
+        return data
+
+
+def add_months(day: date, months: int, day_of_month: Optional[int] = None) -> date:
+    """Shift by whole months, clamping the day to the target month's length"""
+    month_index = day.month - 1 + months
+    year = day.year + month_index // 12
+    month = month_index % 12 + 1
+    target_day = min(day_of_month or day.day, calendar.monthrange(year, month)[1])
+    return date(year, month, target_day)
+
+
+def next_occurrence(frequency: str, last_date: date, today: date,
+                    day_of_month: Optional[int] = None, day_of_week: Optional[int] = None) -> date:
+    """
+    First expected date after last_date that is not before today
+
+    day_of_month / day_of_week are the series' usual posting day, so one
+    late posting does not shift every later date.
+    """
+    if frequency in ('weekly', 'bi-weekly'):
+        step = 7 if frequency == 'weekly' else 14
+        anchor = last_date
+        if day_of_week is not None:
+            # Nearest date to the last posting that falls on the usual weekday
+            anchor += timedelta(days=(day_of_week - last_date.weekday() + 3) % 7 - 3)
+        next_date = anchor + timedelta(days=step)
+        if next_date <= last_date:
+            next_date += timedelta(days=step)
+        if next_date < today:
+            missed = -(-(today - next_date).days // step)
+            next_date += timedelta(days=step * missed)
+        return next_date
+
+    months = 1 if frequency == 'monthly' else 12
+    count = 1
+    next_date = add_months(last_date, months, day_of_month)
+    while next_date < today:
+        count += 1
+        next_date = add_months(last_date, months * count, day_of_month)
+    return next_date
+
+
+def _amount_bands(rows: List[Tuple]) -> List[List[Tuple]]:
+    """Split one merchant's rows into bands of similar amounts"""
+    rows = sorted(rows, key=lambda row: abs(row[2]))
+    bands = [[rows[0]]]
+    for row in rows[1:]:
+        previous = abs(bands[-1][-1][2])
+        if previous and (abs(row[2]) - previous) / previous > AMOUNT_BAND_GAP:
+            bands.append([row])
+        else:
+            bands[-1].append(row)
+    return bands
+
+
+def _classify(dates: List[date]) -> Optional[Tuple[str, float, float, int]]:
+    """Match the date series to a frequency; returns (frequency, period, regularity, minimum)"""
+    intervals = [(later - earlier).days for earlier, later in zip(dates, dates[1:])]
+    if not intervals:
+        return None
+
+    typical = statistics.median(intervals)
+    for frequency, period, tolerance, minimum in FREQUENCIES:
+        if abs(typical - period) > tolerance:
+            continue
+        fitting = 0
+        for interval in intervals:
+            multiple = round(interval / period)
+            if multiple in (1, 2) and abs(interval - multiple * period) <= tolerance * multiple:
+                fitting += 1
+        return frequency, period, fitting / len(intervals), minimum
+    return None
+
+
+def _tracked_keys(user_id) -> Dict[str, List[float]]:
+    """Merchant keys and amounts of the user's active recurring items"""
+    tracked = {}
+    for description, amount, is_income in db.session.query(
+        RecurringItem.description, RecurringItem.amount, RecurringItem.is_income
+    ).filter(RecurringItem.user_id == user_id, RecurringItem.is_active == True):
+        merchant = normalize_merchant(description)
+        if merchant:
+            sign = 'in' if is_income else 'out'
+            tracked.setdefault(f"{sign}:{merchant}", []).append(abs(float(amount)))
+    return tracked
+
+
+def detect_recurring(user_id, today: Optional[date] = None, min_confidence: float = 0.6,
+                     lookback_days: int = LOOKBACK_DAYS, include_tracked: bool = False) -> List[RecurringCandidate]:
+    """
+    Detect recurring series in the user's recent transactions
+
+    Candidates are ordered by confidence. Series already covered by an
+    active RecurringItem (same merchant, sign and amount band) are skipped
+    unless include_tracked is set, and series whose last occurrence is too
+    old for their frequency are treated as cancelled.
+    """
+    today = today or date.today()
+    since = today - timedelta(days=lookback_days)
+
+    # Core select over table columns: plain rows, no ORM entity processing
+    table = Transaction.__table__
+    rows = db.session.execute(
+        select(
+            table.c.id, table.c.date, table.c.amount, table.c.description,
+            table.c.merchant_name, table.c.category, table.c.is_income
+        ).where(
+            table.c.user_id == user_id,
+            table.c.date >= since,
+            table.c.date <= today
+        )
+    ).all()
+
+    # Group by normalized merchant and sign; descriptions repeat, so memoize normalization
+    normalized = {}
+    groups: Dict[str, List[Tuple]] = {}
+    for row in rows:
+        source = row[4] or row[3]
+        merchant = normalized.get(source)
+        if merchant is None:
+            merchant = normalized[source] = normalize_merchant(source)
+        if not merchant:
+            continue
+        amount = float(row[2])
+        if not amount:
+            continue
+        sign = 'in' if row[6] or amount > 0 else 'out'
+        groups.setdefault(f"{sign}:{merchant}", []).append((row[0], row[1], amount, row[3], row[4], row[5], row[6]))
+
+    tracked = {} if include_tracked else _tracked_keys(user_id)
+    min_occurrences = min(minimum for _, _, _, minimum in FREQUENCIES)
+    candidates = []
+
+    for group_key, group_rows in groups.items():
+        if len(group_rows) < min_occurrences:
+            continue
+
+        for band in _amount_bands(group_rows):
+            dates = sorted({row[1] for row in band})
+            if len(dates) < min_occurrences:
+                continue
+
+            match = _classify(dates)
+            if match is None:
+                continue
+            frequency, period, regularity, minimum = match
+            if len(dates) < minimum or regularity < MIN_REGULARITY:
+                continue
+
+            # A series that stopped more than a period and a half ago was cancelled
+            tolerance = next(t for f, _, t, _ in FREQUENCIES if f == frequency)
+            if (today - dates[-1]).days > period * 1.5 + tolerance:
+                continue
+
+            amounts = [row[2] for row in band]
+            median_amount = statistics.median(amounts)
+            if any(abs(abs(median_amount) - tracked_amount) <= abs(median_amount) * AMOUNT_BAND_GAP
+                   for tracked_amount in tracked.get(group_key, ())):
+                continue
+
+            magnitudes = [abs(amount) for amount in amounts]
+            mean = statistics.fmean(magnitudes)
+            variation = statistics.pstdev(magnitudes) / mean if mean else 1.0
+            amount_score = max(0.0, 1.0 - variation)
+            count_score = min(1.0, len(dates) / (minimum + 3))
+            confidence = round(regularity * (0.6 + 0.4 * amount_score) * (0.7 + 0.3 * count_score), 2)
+            if confidence < min_confidence:
+                continue
+
+            day_of_month = Counter(d.day for d in dates).most_common(1)[0][0] if frequency in ('monthly', 'yearly') else None
+            day_of_week = Counter(d.weekday() for d in dates).most_common(1)[0][0] if frequency in ('weekly', 'bi-weekly') else None
+            description = Counter(row[4] or row[3] for row in band).most_common(1)[0][0]
+            category = Counter(row[5] for row in band if row[5]).most_common(1)
+            is_income = group_key.startswith('in:')
+
+            item = RecurringItem(
+                user_id=user_id,
+                description=description,
+                amount=round(median_amount, 2),
+                category=category[0][0] if category else None,
+                is_income=is_income,
+                frequency=frequency,
+                next_date=next_occurrence(frequency, dates[-1], today, day_of_month, day_of_week),
+                day_of_month=day_of_month,
+                day_of_week=day_of_week,
+                is_active=True
+            )
+            candidates.append(RecurringCandidate(
+                key=f"{group_key}:{abs(round(median_amount, 2)):.2f}",
+                item=item,
+                confidence=confidence,
+                occurrences=len(dates),
+                last_date=dates[-1],
+                transaction_ids=sorted(row[0] for row in band)
+            ))
+
+    candidates.sort(key=lambda candidate: candidate.confidence, reverse=True)
+    return candidates
@@ -0,0 +1,114 @@
+"""
+List Serialization
+
+Fast path for endpoints that return many rows. A Projection names the
+columns a response needs and selects them as plain tuples, so no ORM
+objects are built, identity-mapped or converted one attribute at a time
+through to_dict(). Numeric columns are cast to floats in SQL. Dates and
+datetimes are left to the encoder: orjson writes them natively, in the
+same ISO format as isoformat(). orjson is in requirements.txt; the
+standard json module is only a fallback for environments without it.
+
+Output matches the models' to_dict() for the same fields.
+"""
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List
+
+from flask import Response
+from sqlalchemy import Float, Numeric, cast
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from models_simple import Transaction, Account, RecurringItem
+
+
+class Projection:
+    """Output field names mapped to the column expressions that produce them"""
+
+    def __init__(self, **fields):
+        self.fields = fields
+        self.names = tuple(fields)
+        self.columns = tuple(
+            # Floats straight from the driver instead of Decimal, then float() per row
+            cast(column, Float).label(name) if isinstance(column.type, Numeric) and not isinstance(column.type, Float)
+            else column.label(name)
+            for name, column in fields.items()
+        )
+
+    def extend(self, **fields) -> 'Projection':
+        """This projection plus more fields"""
+        return Projection(**{**self.fields, **fields})
+
+    def dicts(self, rows: Iterable[tuple]) -> List[Dict]:
+        names = self.names
+        return [dict(zip(names, row)) for row in rows]
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload) -> bytes:
+    """JSON bytes for payload; dates, datetimes and Decimals are supported"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_default, separators=(',', ':')).encode()
+
+
+def json_response(payload, status: int = 200) -> Response:
+    """Drop-in for jsonify(payload), status using the fast encoder"""
+    return Response(dumps(payload), status=status, mimetype='application/json')
+
+
+# Same keys as Transaction.to_dict()
+TRANSACTION_FIELDS = Projection(
+    id=Transaction.id,
+    description=Transaction.description,
+    amount=Transaction.amount,
+    date=Transaction.date,
+    category=Transaction.category,
+    is_income=Transaction.is_income,
+    is_recurring=Transaction.is_recurring,
+    recurrence_type=Transaction.recurrence_type,
+    recurrence_interval=Transaction.recurrence_interval,
+    recurrence_parent_id=Transaction.recurrence_parent_id,
+    notes=Transaction.notes,
+    merchant_name=Transaction.merchant_name,
+    created_at=Transaction.created_at
+)
+
+# Same keys as Account.to_dict()
+ACCOUNT_FIELDS = Projection(
+    id=Account.id,
+    name=Account.name,
+    account_type=Account.account_type,
+    current_balance=Account.current_balance,
+    institution_name=Account.institution_name,
+    is_active=Account.is_active,
+    include_in_total=Account.include_in_total,
+    updated_at=Account.updated_at
+)
+
+# Same keys as RecurringItem.to_dict()
+RECURRING_ITEM_FIELDS = Projection(
+    id=RecurringItem.id,
+    description=RecurringItem.description,
+    amount=RecurringItem.amount,
+    category=RecurringItem.category,
+    is_income=RecurringItem.is_income,
+    frequency=RecurringItem.frequency,
+    next_date=RecurringItem.next_date,
+    day_of_month=RecurringItem.day_of_month,
+    day_of_week=RecurringItem.day_of_week,
+    is_active=RecurringItem.is_active
+)
@@ -0,0 +1,27 @@
+"""
+Application Signals
+
+Blinker signals sent when user data changes, so caches and derived data can
+invalidate themselves without the write paths knowing about them. The sender
+is always the user id as a string.
+"""
+
+from blinker import Namespace
+
+_signals = Namespace()
+
+# Sent after a user's transactions are committed
+transactions_changed = _signals.signal('transactions-changed')
+
+# Sent after a user's account balances are committed
+balances_changed = _signals.signal('balances-changed')
+
+
+def notify_transactions_changed(user_id):
+    """Announce that a user's transactions were added, edited or removed"""
+    transactions_changed.send(str(user_id))
+
+
+def notify_balances_changed(user_id):
+    """Announce that a user's account balances were updated"""
+    balances_changed.send(str(user_id))
@@ -0,0 +1,213 @@
+"""
+Transaction Similarity Index
+
+Per-user MinHash index over the character trigrams of uncategorized
+transactions' normalized merchant names (or descriptions). When a user
+approves a category for one transaction, the index finds the similar
+uncategorized ones so the approval can be applied to all of them with a
+single UPDATE, e.g. "SQ *BLUE BOTTLE 0412" and "BLUE BOTTLE COFFEE" together.
+
+Candidates come from locality-sensitive hashing over MinHash bands and are
+confirmed with the exact trigram Jaccard similarity. Indexes are built on
+first use and dropped whenever the user's transactions change.
+"""
+
+import random
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, FrozenSet, List, Optional
+
+from sqlalchemy import or_, select, update
+from models_simple import db, Transaction
+from services.categorization_cache import normalize_merchant
+from services.signals import transactions_changed
+
+# Categories that count as "not yet categorized" and may be overwritten
+UNCATEGORIZED = ('', 'Other')
+
+# Exact trigram Jaccard similarity required to propagate a category
+MIN_SIMILARITY = 0.6
+
+# 32 hashes in 8 bands of 4: pairs around 0.6 similarity collide in some band
+NUM_HASHES = 32
+BAND_SIZE = 4
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240611)
+_HASH_PARAMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_HASHES)]
+
+
+def shingles(text: str, size: int = 3) -> FrozenSet[str]:
+    """Character n-grams of the text, padded so short names still get some"""
+    padded = f" {text} "
+    if len(padded) <= size:
+        return frozenset([padded])
+    return frozenset(padded[i:i + size] for i in range(len(padded) - size + 1))
+
+
+def minhash(grams: FrozenSet[str]) -> List[int]:
+    """MinHash signature of a shingle set"""
+    bases = [zlib.crc32(gram.encode()) for gram in grams]
+    return [min((a * base + b) % _PRIME for base in bases) for a, b in _HASH_PARAMS]
+
+
+def jaccard(left: FrozenSet[str], right: FrozenSet[str]) -> float:
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def _sign(amount: float, is_income) -> str:
+    return 'in' if is_income or amount > 0 else 'out'
+
+
+class UserSimilarityIndex:
+    """MinHash LSH over one user's distinct uncategorized merchant keys"""
+
+    def __init__(self):
+        # (sign, text) -> {'grams': frozenset, 'ids': [transaction ids]}
+        self.keys: Dict[tuple, Dict] = {}
+        self._buckets: Dict[tuple, set] = {}
+
+    def add(self, transaction_id: int, text: str, sign: str):
+        key = (sign, text)
+        entry = self.keys.get(key)
+        if entry is not None:
+            entry['ids'].append(transaction_id)
+            return
+
+        grams = shingles(text)
+        self.keys[key] = {'grams': grams, 'ids': [transaction_id]}
+        signature = minhash(grams)
+        for band in range(0, NUM_HASHES, BAND_SIZE):
+            bucket = (sign, band, tuple(signature[band:band + BAND_SIZE]))
+            self._buckets.setdefault(bucket, set()).add(key)
+
+    def query(self, text: str, sign: str, min_similarity: float = MIN_SIMILARITY) -> List[int]:
+        """Transaction IDs whose merchant text is at least min_similarity similar"""
+        grams = shingles(text)
+        signature = minhash(grams)
+        candidates = set()
+        for band in range(0, NUM_HASHES, BAND_SIZE):
+            candidates |= self._buckets.get((sign, band, tuple(signature[band:band + BAND_SIZE])), set())
+        # The identical key always matches, even if LSH bands were unlucky
+        if (sign, text) in self.keys:
+            candidates.add((sign, text))
+
+        ids = []
+        for key in candidates:
+            entry = self.keys[key]
+            if jaccard(grams, entry['grams']) >= min_similarity:
+                ids.extend(entry['ids'])
+        return ids
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def _uncategorized_filter():
+    return or_(Transaction.category.is_(None), Transaction.category.in_(UNCATEGORIZED))
+
+
+def build_user_index(user_id) -> UserSimilarityIndex:
+    """Index the user's uncategorized transactions"""
+    index = UserSimilarityIndex()
+    table = Transaction.__table__
+    rows = db.session.execute(
+        select(table.c.id, table.c.description, table.c.merchant_name, table.c.amount, table.c.is_income)
+        .where(table.c.user_id == user_id, _uncategorized_filter())
+    ).all()
+
+    normalized = {}
+    for transaction_id, description, merchant_name, amount, is_income in rows:
+        source = merchant_name or description
+        text = normalized.get(source)
+        if text is None:
+            text = normalized[source] = normalize_merchant(source)
+        if text:
+            index.add(transaction_id, text, _sign(float(amount), is_income))
+    return index
+
+
+class SimilarityIndexCache:
+    """Per-user indexes, built on demand and dropped when transactions change"""
+
+    def __init__(self, max_users: int = 1000):
+        self.max_users = max_users
+        self._indexes = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'builds': 0}
+
+    def get(self, user_id) -> UserSimilarityIndex:
+        user_id = str(user_id)
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                self._indexes.move_to_end(user_id)
+                self.stats['hits'] += 1
+                return index
+            generation = self._generations.get(user_id, 0)
+
+        self.stats['builds'] += 1
+        index = build_user_index(user_id)
+        with self._lock:
+            # Don't keep an index that an invalidation raced past
+            if self._generations.get(user_id, 0) == generation:
+                self._indexes[user_id] = index
+                self._indexes.move_to_end(user_id)
+                while len(self._indexes) > self.max_users:
+                    self._indexes.popitem(last=False)
+        return index
+
+    def invalidate(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            self._indexes.pop(user_id, None)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+
+# Shared indexes for the approval route
+similarity_indexes = SimilarityIndexCache()
+
+
+@transactions_changed.connect
+def _on_transactions_changed(user_id, **extra):
+    similarity_indexes.invalidate(user_id)
+
+
+def propagate_category(user_id, transaction: Transaction, category: str,
+                       min_similarity: float = MIN_SIMILARITY) -> List[int]:
+    """
+    Apply category to the user's uncategorized transactions similar to
+    transaction, in one UPDATE; returns the IDs that changed
+
+    The caller commits, so the propagation lands together with the approval.
+    """
+    text = normalize_merchant(transaction.merchant_name or transaction.description)
+    if not text:
+        return []
+
+    sign = _sign(float(transaction.amount), transaction.is_income)
+    ids = [i for i in similarity_indexes.get(user_id).query(text, sign, min_similarity) if i != transaction.id]
+    if not ids:
+        return []
+
+    # The index may be a little stale; the WHERE clause re-checks ownership and category
+    statement = update(Transaction).where(
+        Transaction.user_id == user_id,
+        Transaction.id.in_(ids),
+        _uncategorized_filter()
+    ).values(category=category).execution_options(synchronize_session=False)
+
+    if db.engine.dialect.update_returning:
+        changed = db.session.execute(statement.returning(Transaction.id)).scalars().all()
+    else:
+        changed = db.session.execute(
+            select(Transaction.id).where(
+                Transaction.user_id == user_id, Transaction.id.in_(ids), _uncategorized_filter()
+            )
+        ).scalars().all()
+        db.session.execute(statement)
+    return sorted(changed)
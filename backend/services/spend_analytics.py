@@ -0,0 +1,218 @@
+"""
+Spend Analytics
+
+Spending (or income) grouped by category, merchant, day, week or month for
+any date range, with an optional comparison period, shaped as columnar
+arrays for charts. Totals come from GROUP BY queries: category and
+merchant group directly, and time buckets are folded from per-day sums
+(at most one row per day in the range), which keeps the SQL portable
+across SQLite and Postgres like monthly_category_history.
+
+Time series are zero-filled so every bucket in the range is present.
+For time groupings each bucket is compared with the same days shifted
+into the comparison period, so a partial first or last bucket is
+compared with an equally long stretch; category and merchant comparisons
+are aligned by key.
+"""
+
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from models_simple import db, Transaction
+from services.category_spend import category_totals
+
+GROUPINGS = ('category', 'merchant', 'day', 'week', 'month')
+TIME_GROUPINGS = ('day', 'week', 'month')
+COMPARISONS = ('previous', 'year')
+
+
+def _filters(user_id, start_date: date, end_date: date, is_income: bool):
+    return (
+        Transaction.user_id == user_id,
+        Transaction.date >= start_date,
+        Transaction.date <= end_date,
+        Transaction.is_income == is_income
+    )
+
+
+def bucket_start(day: date, group_by: str) -> date:
+    """First day of the day/week (Monday)/month bucket holding day"""
+    if group_by == 'week':
+        return day - timedelta(days=day.weekday())
+    if group_by == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(start: date, group_by: str) -> date:
+    if group_by == 'week':
+        return start + timedelta(days=7)
+    if group_by == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def _buckets(start_date: date, end_date: date, group_by: str) -> List[date]:
+    buckets = []
+    cursor = bucket_start(start_date, group_by)
+    while cursor <= end_date:
+        buckets.append(cursor)
+        cursor = _next_bucket(cursor, group_by)
+    return buckets
+
+
+def _bucket_key(start: date, group_by: str) -> str:
+    return start.strftime('%Y-%m') if group_by == 'month' else start.isoformat()
+
+
+def _daily(user_id, start_date, end_date, is_income) -> List[Tuple[date, float, int]]:
+    return [(day, float(total or 0), count) for day, total, count in db.session.query(
+        Transaction.date, func.sum(func.abs(Transaction.amount)), func.count(Transaction.id)
+    ).filter(*_filters(user_id, start_date, end_date, is_income)).group_by(Transaction.date)]
+
+
+def _fold(daily, starts: List[date]) -> List[Tuple[float, int]]:
+    """
+    Sum per-day rows into the periods beginning at each of starts
+    (ascending); of repeated starts (Feb 28 and 29 a year back) the first
+    gets the day
+    """
+    totals = [[0.0, 0] for _ in starts]
+    for day, total, count in daily:
+        index = bisect_right(starts, day) - 1
+        if index >= 0:
+            index = bisect_left(starts, starts[index])
+            totals[index][0] += total
+            totals[index][1] += count
+    return [(total, count) for total, count in totals]
+
+
+def _time_series(user_id, start_date, end_date, group_by, is_income) -> List[Tuple[str, float, int]]:
+    starts = _buckets(start_date, end_date, group_by)
+    folded = _fold(_daily(user_id, start_date, end_date, is_income), starts)
+    return [(_bucket_key(start, group_by), total, count) for start, (total, count) in zip(starts, folded)]
+
+
+def _merchant_totals(user_id, start_date, end_date, is_income) -> List[Tuple[str, float, int]]:
+    # Manual and imported rows often have no merchant_name; their description stands in
+    merchant = func.coalesce(Transaction.merchant_name, Transaction.description)
+    rows = db.session.query(
+        merchant, func.sum(func.abs(Transaction.amount)), func.count(Transaction.id)
+    ).filter(*_filters(user_id, start_date, end_date, is_income)).group_by(merchant)
+    return sorted(((name, float(total or 0), count) for name, total, count in rows), key=lambda row: -row[1])
+
+
+def _series(user_id, start_date, end_date, group_by, is_income) -> List[Tuple[str, float, int]]:
+    """(key, total, count) rows; time buckets in order, categories and merchants largest first"""
+    if group_by in TIME_GROUPINGS:
+        return _time_series(user_id, start_date, end_date, group_by, is_income)
+    if group_by == 'merchant':
+        return _merchant_totals(user_id, start_date, end_date, is_income)
+    return [(name, entry['total'], entry['count'])
+            for name, entry in category_totals(user_id, start_date, end_date, is_income).items()]
+
+
+def _shift(day: date, start_date: date, end_date: date, compare: str) -> date:
+    """day moved into the comparison period"""
+    if compare == 'year':
+        try:
+            return day.replace(year=day.year - 1)
+        except ValueError:  # Feb 29
+            return day.replace(year=day.year - 1, day=28)
+    return day - timedelta(days=(end_date - start_date).days + 1)
+
+
+def comparison_window(start_date: date, end_date: date, compare: str) -> Tuple[date, date]:
+    """The equally long period just before, or the same dates a year earlier"""
+    if compare == 'year':
+        return _shift(start_date, start_date, end_date, compare), _shift(end_date, start_date, end_date, compare)
+    return _shift(start_date, start_date, end_date, compare), start_date - timedelta(days=1)
+
+
+def _compared_time_series(user_id, start_date, end_date, group_by, is_income, compare) -> List[Tuple[str, float, int]]:
+    """
+    One (key, total, count) per bucket of the main range: the bucket's days
+    within the range, shifted into the comparison period. key is the first
+    compared date.
+    """
+    compare_start, compare_end = comparison_window(start_date, end_date, compare)
+    starts = [_shift(max(start, start_date), start_date, end_date, compare)
+              for start in _buckets(start_date, end_date, group_by)]
+    folded = _fold(_daily(user_id, compare_start, compare_end, is_income), starts)
+    return [(start.isoformat(), total, count) for start, (total, count) in zip(starts, folded)]
+
+
+def _change_pct(current: float, previous: float) -> Optional[float]:
+    return round((current - previous) / previous * 100, 1) if previous else None
+
+
+def grouped_spend(user_id, start_date: date, end_date: date, group_by: str = 'category',
+                  is_income: bool = False, compare: Optional[str] = None,
+                  limit: Optional[int] = None) -> Dict:
+    """
+    Columnar totals for the range:
+    {'keys': [...], 'totals': [...], 'counts': [...], 'total', 'count', ...}
+
+    limit keeps the largest category/merchant groups and sums the rest into
+    'remainder'. With compare ('previous' or 'year') a 'comparison' object
+    carries totals and counts aligned with keys, plus the change per key.
+    """
+    if group_by not in GROUPINGS:
+        raise ValueError(f"group_by must be one of {', '.join(GROUPINGS)}")
+    if compare and compare not in COMPARISONS:
+        raise ValueError(f"compare must be one of {', '.join(COMPARISONS)}")
+    if start_date > end_date:
+        raise ValueError('start_date must not be after end_date')
+
+    rows = _series(user_id, start_date, end_date, group_by, is_income)
+    remainder = None
+    if limit and group_by not in TIME_GROUPINGS and len(rows) > limit:
+        rest = rows[limit:]
+        rows = rows[:limit]
+        remainder = {
+            'groups': len(rest),
+            'total': round(sum(total for _, total, _ in rest), 2),
+            'count': sum(count for _, _, count in rest)
+        }
+
+    result = {
+        'group_by': group_by,
+        'is_income': is_income,
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'keys': [key for key, _, _ in rows],
+        'totals': [round(total, 2) for _, total, _ in rows],
+        'counts': [count for _, _, count in rows],
+        'total': round(sum(total for _, total, _ in rows) + (remainder['total'] if remainder else 0), 2),
+        'count': sum(count for _, _, count in rows) + (remainder['count'] if remainder else 0),
+        'remainder': remainder
+    }
+
+    if compare:
+        compare_start, compare_end = comparison_window(start_date, end_date, compare)
+        if group_by in TIME_GROUPINGS:
+            previous = aligned = _compared_time_series(user_id, start_date, end_date, group_by, is_income, compare)
+        else:
+            previous = _series(user_id, compare_start, compare_end, group_by, is_income)
+            by_key = {key: (key, total, count) for key, total, count in previous}
+            aligned = [by_key.get(key, (key, 0.0, 0)) for key, _, _ in rows]
+        totals = [round(total, 2) for _, total, _ in aligned]
+        previous_total = round(sum(total for _, total, _ in previous), 2)
+        result['comparison'] = {
+            'compare': compare,
+            'start_date': compare_start.isoformat(),
+            'end_date': compare_end.isoformat(),
+            'totals': totals,
+            'counts': [count for _, _, count in aligned],
+            'change_pct': [_change_pct(current, before) for current, before in zip(result['totals'], totals)],
+            'total': previous_total,
+            'count': sum(count for _, _, count in previous),
+            'total_change_pct': _change_pct(result['total'], previous_total)
+        }
+        if group_by in TIME_GROUPINGS:
+            # First date of each compared stretch, for chart tooltips
+            result['comparison']['keys'] = [key for key, _, _ in aligned]
+
+    return result
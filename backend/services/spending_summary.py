@@ -0,0 +1,154 @@
+"""
+Spending Summary
+
+Aggregates a user's transaction window in SQL into a compact summary:
+per-category totals, weekly trend, top merchants and outlier transactions.
+The AI prompts are built from this summary instead of every raw
+transaction, so prompt size stays flat as transaction counts grow.
+"""
+
+import json
+from datetime import date, timedelta
+from typing import Dict
+
+from sqlalchemy import func
+from models_simple import db, Transaction
+from services.category_spend import category_totals
+
+# Rough characters-per-token ratio for English/JSON prompt text
+CHARS_PER_TOKEN = 4
+
+# Expenses larger than mean + OUTLIER_STDDEVS * stddev are reported individually
+OUTLIER_STDDEVS = 2.0
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for prompt budgeting"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def summarize_spending(user_id, start_date: date, end_date: date,
+                       top_merchants: int = 8, max_outliers: int = 8) -> Dict:
+    """Aggregate the window with GROUP BY queries; no ORM rows are loaded"""
+    window = (
+        Transaction.user_id == user_id,
+        Transaction.date >= start_date,
+        Transaction.date <= end_date
+    )
+    expense_window = window + (Transaction.is_income == False,)
+
+    income_total = 0.0
+    expense_total = 0.0
+    transaction_count = 0
+    for is_income, total, count in db.session.query(
+        Transaction.is_income, func.sum(Transaction.amount), func.count(Transaction.id)
+    ).filter(*window).group_by(Transaction.is_income):
+        transaction_count += count
+        if is_income:
+            income_total += float(total or 0)
+        else:
+            expense_total += abs(float(total or 0))
+
+    categories = [
+        {'category': category, 'total': entry['total'], 'count': entry['count']}
+        for category, entry in category_totals(user_id, start_date, end_date).items()
+    ]
+
+    # Daily totals from SQL, folded into Monday-based weeks (at most days/7 buckets)
+    weekly = {}
+    for day, total in db.session.query(
+        Transaction.date, func.sum(Transaction.amount)
+    ).filter(*expense_window).group_by(Transaction.date):
+        week_start = day - timedelta(days=day.weekday())
+        weekly[week_start] = weekly.get(week_start, 0.0) + abs(float(total or 0))
+    weekly_spend = [
+        {'week_start': week.isoformat(), 'total': round(total, 2)}
+        for week, total in sorted(weekly.items())
+    ]
+
+    merchant = func.coalesce(Transaction.merchant_name, Transaction.description)
+    merchants = [
+        {'merchant': name, 'total': round(abs(float(total or 0)), 2), 'count': count}
+        for name, total, count in db.session.query(
+            merchant, func.sum(Transaction.amount), func.count(Transaction.id)
+        ).filter(*expense_window).group_by(merchant).order_by(func.sum(Transaction.amount)).limit(top_merchants)
+    ]
+
+    # Outliers: mean and variance of expense size computed in the database
+    outliers = []
+    mean, mean_square = db.session.query(
+        func.avg(func.abs(Transaction.amount)), func.avg(Transaction.amount * Transaction.amount)
+    ).filter(*expense_window).one()
+    if mean is not None:
+        mean = float(mean)
+        stddev = max(float(mean_square) - mean * mean, 0.0) ** 0.5
+        threshold = mean + OUTLIER_STDDEVS * stddev
+        if stddev > 0:
+            outliers = [
+                {
+                    'date': txn_date.isoformat(),
+                    'description': description,
+                    'amount': round(abs(float(amount)), 2),
+                    'category': category
+                }
+                for txn_date, description, amount, category in db.session.query(
+                    Transaction.date, Transaction.description, Transaction.amount, Transaction.category
+                ).filter(*expense_window).filter(
+                    func.abs(Transaction.amount) > threshold
+                ).order_by(Transaction.amount).limit(max_outliers)
+            ]
+
+    return {
+        'window': {
+            'start': start_date.isoformat(),
+            'end': end_date.isoformat(),
+            'days': (end_date - start_date).days + 1
+        },
+        'transaction_count': transaction_count,
+        'income_total': round(income_total, 2),
+        'expense_total': round(expense_total, 2),
+        'categories': categories,
+        'weekly_spend': weekly_spend,
+        'top_merchants': merchants,
+        'outliers': outliers
+    }
+
+
+def compact_json(data) -> str:
+    """JSON without whitespace; indentation alone can double prompt size"""
+    return json.dumps(data, separators=(',', ':'))
+
+
+def fit_to_budget(summary: Dict, token_budget: int) -> Dict:
+    """
+    Trim the least important detail until the summary fits the token budget
+
+    Order: outliers, merchants, then the category tail (folded into one
+    "Other categories" row), then the oldest weeks.
+    """
+    fitted = json.loads(json.dumps(summary))
+
+    def tokens():
+        return estimate_tokens(compact_json(fitted))
+
+    while tokens() > token_budget:
+        if len(fitted['outliers']) > 3:
+            fitted['outliers'].pop()
+        elif len(fitted['top_merchants']) > 3:
+            fitted['top_merchants'].pop()
+        elif len(fitted['categories']) > 6:
+            tail = fitted['categories'][5:]
+            fitted['categories'] = fitted['categories'][:5] + [{
+                'category': f"Other categories ({len(tail)})",
+                'total': round(sum(c['total'] for c in tail), 2),
+                'count': sum(c['count'] for c in tail)
+            }]
+        elif len(fitted['weekly_spend']) > 4:
+            fitted['weekly_spend'].pop(0)
+        elif fitted['outliers'] or fitted['top_merchants']:
+            fitted['outliers'] = fitted['outliers'][:-1]
+            fitted['top_merchants'] = fitted['top_merchants'][:-1]
+        else:
+            break
+
+    return fitted
@@ -0,0 +1,365 @@
+"""
+Bank Statement Import
+
+Imports CSV, OFX and QFX statements for users without Plaid. Files are
+parsed by generators that read the upload in fixed-size chunks, rows are
+deduplicated against the user's existing transactions by a content hash of
+(date, amount, description), and new rows are inserted and committed in
+chunks, so memory stays flat however many years a file covers. Progress is
+reported on the background Job running the import.
+
+Identical rows are compared as multisets: if the database already holds
+one "STARBUCKS -4.50" on a day and the file has two, one is inserted.
+"""
+
+import csv
+import hashlib
+import io
+import os
+import re
+import logging
+from datetime import datetime, date
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import insert, select
+from models_simple import db, Transaction
+from services.fast_categorizer import fast_categorizer
+from services.signals import notify_transactions_changed
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'ofx', 'qfx')
+
+# Rows inserted and committed together
+CHUNK_SIZE = 1000
+
+# Bytes read from the upload at a time
+READ_SIZE = 64 * 1024
+
+# Tried in order until one parses a file's first date; the first match is used for the whole file
+DATE_FORMATS = ['%Y-%m-%d', '%m/%d/%Y', '%m/%d/%y', '%Y/%m/%d', '%d-%b-%Y', '%b %d, %Y', '%d/%m/%Y']
+
+# Header names recognized for each field when no column mapping is given
+CSV_COLUMNS = {
+    'date': ('date', 'transaction date', 'posted date', 'posting date', 'trans date', 'trans. date'),
+    'description': ('description', 'transaction description', 'payee', 'name', 'details', 'memo'),
+    'amount': ('amount', 'transaction amount', 'amount (usd)'),
+    'debit': ('debit', 'debit amount', 'withdrawal', 'withdrawals', 'money out'),
+    'credit': ('credit', 'credit amount', 'deposit', 'deposits', 'money in'),
+    'merchant_name': ('merchant', 'merchant name'),
+    'category': ('category',),
+}
+
+# Error messages kept on the job
+MAX_REPORTED_ERRORS = 20
+
+_OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+class StatementImportError(ValueError):
+    """The file can't be imported at all (unknown format, no usable columns)"""
+
+
+class CountingReader(io.RawIOBase):
+    """Binary file wrapper that counts bytes read, for progress"""
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.handle.read(len(buffer))
+        buffer[:len(data)] = data
+        self.bytes_read += len(data)
+        return len(data)
+
+
+def detect_format(filename: Optional[str], head: bytes) -> str:
+    """Format from the file extension, else from the first bytes"""
+    extension = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    if extension in FORMATS:
+        return extension
+    text = head.decode('utf-8', errors='replace').upper()
+    if 'OFXHEADER' in text or '<OFX>' in text:
+        return 'ofx'
+    return 'csv'
+
+
+def parse_amount(value) -> Optional[Decimal]:
+    """'$1,234.56', '-12.00' and '(12.00)' style amounts; None when blank"""
+    if value is None:
+        return None
+    text = str(value).strip().replace('$', '').replace(',', '').replace(' ', '')
+    if not text:
+        return None
+    negative = text.startswith('(') and text.endswith(')')
+    if negative:
+        text = text[1:-1]
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount {value!r}")
+    return -amount if negative else amount
+
+
+class DateParser:
+    """Parses with an explicit format, or locks onto the first of DATE_FORMATS that fits"""
+
+    def __init__(self, date_format: Optional[str] = None):
+        self.date_format = date_format
+
+    def __call__(self, value: str) -> date:
+        value = (value or '').strip()
+        if self.date_format:
+            return datetime.strptime(value, self.date_format).date()
+        for candidate in DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(value, candidate).date()
+            except ValueError:
+                continue
+            self.date_format = candidate
+            return parsed
+        raise ValueError(f"Unrecognized date {value!r}")
+
+
+def parse_csv(stream, mapping: Optional[Dict[str, str]] = None,
+              date_format: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Yield one dict per CSV row: date, amount (signed, negative for money
+    out), description, merchant_name, category, or error for a bad row
+
+    mapping maps field names (date, description, amount, debit, credit,
+    merchant_name, category) to header names; unmapped fields are matched
+    against CSV_COLUMNS.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+    reader = csv.reader(text)
+    header = next(reader, None)
+    if not header:
+        raise StatementImportError('The file is empty')
+
+    positions = {name.strip().lower(): index for index, name in enumerate(header)}
+    columns = {}
+    for field, aliases in CSV_COLUMNS.items():
+        wanted = (mapping or {}).get(field)
+        if wanted:
+            if wanted.strip().lower() not in positions:
+                raise StatementImportError(f"Column {wanted!r} for {field} not found in the header")
+            columns[field] = positions[wanted.strip().lower()]
+            continue
+        for alias in aliases:
+            if alias in positions:
+                columns[field] = positions[alias]
+                break
+
+    if 'date' not in columns or 'description' not in columns:
+        raise StatementImportError('Could not find date and description columns; pass a column mapping')
+    if 'amount' not in columns and 'debit' not in columns and 'credit' not in columns:
+        raise StatementImportError('Could not find an amount (or debit/credit) column; pass a column mapping')
+
+    parse_date = DateParser(date_format)
+    for line_number, row in enumerate(reader, start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+
+        def cell(field):
+            index = columns.get(field)
+            return row[index].strip() if index is not None and index < len(row) else ''
+
+        try:
+            if 'amount' in columns:
+                amount = parse_amount(cell('amount'))
+            else:
+                debit = parse_amount(cell('debit'))
+                credit = parse_amount(cell('credit'))
+                amount = (credit or 0) - abs(debit or 0) if (debit is not None or credit is not None) else None
+            if amount is None:
+                raise ValueError('Missing amount')
+            yield {
+                'date': parse_date(cell('date')),
+                'amount': amount,
+                'description': cell('description'),
+                'merchant_name': cell('merchant_name') or None,
+                'category': cell('category') or None
+            }
+        except ValueError as e:
+            yield {'error': f"Line {line_number}: {e}"}
+
+
+def _ofx_tokens(stream) -> Iterator[tuple]:
+    """(is_closing, tag, text) for each tag in an OFX 1.x (SGML) or 2.x (XML) file, read in chunks"""
+    text = io.TextIOWrapper(stream, encoding='utf-8', errors='replace')
+    buffer = ''
+    while True:
+        chunk = text.read(READ_SIZE)
+        buffer += chunk
+        # Keep an unfinished tag at the end of the buffer for the next chunk
+        cut = buffer.rfind('<') if chunk else len(buffer)
+        for match in _OFX_TAG.finditer(buffer, 0, cut if cut > 0 else 0):
+            yield match.group(1) == '/', match.group(2).upper(), match.group(3).strip()
+        buffer = buffer[cut:] if cut > 0 else buffer
+        if not chunk:
+            return
+
+
+def parse_ofx_date(value: str) -> date:
+    """OFX dates: YYYYMMDD with optional time, fraction and [timezone]"""
+    digits = value.strip()[:8]
+    if len(digits) != 8 or not digits.isdigit():
+        raise ValueError(f"Invalid OFX date {value!r}")
+    return date(int(digits[:4]), int(digits[4:6]), int(digits[6:8]))
+
+
+def _ofx_transaction(fields: Dict) -> Dict:
+    amount = parse_amount(fields.get('TRNAMT'))
+    if amount is None:
+        raise ValueError('Missing TRNAMT')
+    name = fields.get('NAME') or fields.get('PAYEE') or ''
+    return {
+        'date': parse_ofx_date(fields.get('DTPOSTED', '')),
+        'amount': amount,
+        'description': name or fields.get('MEMO') or '',
+        'merchant_name': name or None,
+        'category': None,
+        'external_id': fields.get('FITID')
+    }
+
+
+def parse_ofx(stream) -> Iterator[Dict]:
+    """
+    Yield one dict per <STMTTRN>; QFX is OFX with Quicken extensions. SGML
+    OFX may omit closing tags, so a transaction also ends at the next
+    <STMTTRN> or at the end of its list.
+    """
+    current = None
+    count = 0
+    for closing, tag, value in _ofx_tokens(stream):
+        ends_transaction = tag == 'STMTTRN' or (closing and tag == 'BANKTRANLIST')
+        if current is not None and ends_transaction:
+            count += 1
+            try:
+                yield _ofx_transaction(current)
+            except ValueError as e:
+                yield {'error': f"Transaction {count}: {e}"}
+            current = None
+        if tag == 'STMTTRN' and not closing:
+            current = {}
+        elif current is not None and not closing:
+            current[tag] = value
+
+
+def content_key(txn_date: date, amount, description: str) -> bytes:
+    """Content hash identifying a transaction for dedupe"""
+    normalized = _WHITESPACE.sub(' ', (description or '').strip().lower())
+    cents = int((Decimal(amount) * 100).to_integral_value())
+    raw = f"{txn_date.isoformat()}|{cents}|{normalized}".encode()
+    return hashlib.blake2b(raw, digest_size=16).digest()
+
+
+def _existing_counts(user_id, start: date, end: date) -> Dict[bytes, int]:
+    """How many rows per content hash the user already has between start and end"""
+    counts = {}
+    for txn_date, amount, description in db.session.execute(
+        select(Transaction.date, Transaction.amount, Transaction.description).where(
+            Transaction.user_id == user_id,
+            Transaction.date >= start,
+            Transaction.date <= end
+        )
+    ):
+        key = content_key(txn_date, amount, description)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def _to_row(user_id, parsed: Dict) -> Dict:
+    amount = float(parsed['amount'])
+    is_income = amount > 0
+    category = parsed.get('category')
+    if not category:
+        local = fast_categorizer.categorize(parsed['description'], amount, parsed.get('merchant_name'), user_id=user_id)
+        category = local['category'] if fast_categorizer.is_confident(local) else None
+    return {
+        'user_id': int(user_id),
+        'description': parsed['description'][:500] or 'Imported transaction',
+        'amount': amount,
+        'date': parsed['date'],
+        'category': category,
+        'is_income': is_income,
+        'is_recurring': False,
+        'notes': None,
+        'merchant_name': (parsed.get('merchant_name') or None) and parsed['merchant_name'][:255]
+    }
+
+
+def _flush(user_id, chunk: List[Dict], seen: Dict[bytes, int], counters: Dict) -> None:
+    """Dedupe one chunk of parsed rows and insert the new ones"""
+    existing = _existing_counts(user_id, min(r['date'] for r in chunk), max(r['date'] for r in chunk))
+    rows = []
+    for parsed in chunk:
+        key = content_key(parsed['date'], parsed['amount'], parsed['description'])
+        # nth identical row in the file is new only if the database has fewer than n
+        seen[key] = seen.get(key, 0) + 1
+        if seen[key] <= existing.get(key, 0):
+            counters['duplicates'] += 1
+            continue
+        rows.append(_to_row(user_id, parsed))
+
+    if rows:
+        db.session.execute(insert(Transaction), rows)
+    db.session.commit()
+    counters['inserted'] += len(rows)
+
+
+def import_statement(job, user_id, path: str, file_format: str, mapping: Optional[Dict] = None,
+                     date_format: Optional[str] = None, remove_file: bool = True) -> Dict:
+    """
+    Background job body: parse the saved upload at path, dedupe and insert
+    in chunks, reporting progress on job. Returns the final counters.
+    """
+    counters = {'parsed': 0, 'inserted': 0, 'duplicates': 0, 'invalid': 0}
+    errors = []
+    total_bytes = os.path.getsize(path)
+    seen: Dict[bytes, int] = {}
+
+    try:
+        with open(path, 'rb') as handle:
+            reader = CountingReader(handle)
+            stream = io.BufferedReader(reader, READ_SIZE)
+            rows = parse_ofx(stream) if file_format in ('ofx', 'qfx') else parse_csv(stream, mapping, date_format)
+
+            chunk = []
+            for parsed in rows:
+                if 'error' in parsed:
+                    counters['invalid'] += 1
+                    if len(errors) < MAX_REPORTED_ERRORS:
+                        errors.append(parsed['error'])
+                    continue
+                counters['parsed'] += 1
+                chunk.append(parsed)
+                if len(chunk) >= CHUNK_SIZE:
+                    _flush(user_id, chunk, seen, counters)
+                    chunk = []
+                    job.update_progress(bytes_read=reader.bytes_read, total_bytes=total_bytes,
+                                        errors=list(errors), **counters)
+            if chunk:
+                _flush(user_id, chunk, seen, counters)
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        job.update_progress(bytes_read=total_bytes, total_bytes=total_bytes, errors=list(errors), **counters)
+        if counters['inserted']:
+            notify_transactions_changed(user_id)
+        if remove_file:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    logger.info(f"Imported statement for user {user_id}: {counters}")
+    return dict(counters, errors=errors, format=file_format)
@@ -0,0 +1,138 @@
+"""
+Plaid Sync Metrics
+
+Per-stage timing and item counters for the Plaid sync pipeline.
+Each sync run records how long every stage took (upstream fetch, dedupe,
+insert, commit) and how many transactions were added, modified or removed.
+Recent runs are kept in memory so they can be served from a metrics endpoint.
+"""
+
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+
+class SyncRun:
+    """Timing and counters for a single sync run"""
+
+    def __init__(self, user_id, job: str = 'transactions'):
+        self.user_id = user_id
+        self.job = job
+        self.started_at = datetime.utcnow()
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {
+            'fetched': 0,
+            'added': 0,
+            'modified': 0,
+            'removed': 0,
+            'skipped': 0
+        }
+        self.error: Optional[str] = None
+        self._start = time.perf_counter()
+        self.total_seconds: Optional[float] = None
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a pipeline stage; repeated stages accumulate"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - start)
+
+    def count(self, counter: str, amount: int = 1):
+        """Increment a per-item counter"""
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def finish(self, error: Optional[Exception] = None):
+        """Mark the run complete"""
+        self.total_seconds = time.perf_counter() - self._start
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self):
+        """Convert to dictionary for JSON serialization"""
+        return {
+            'job': self.job,
+            'user_id': self.user_id,
+            'started_at': self.started_at.isoformat(),
+            'total_seconds': round(self.total_seconds or 0.0, 4),
+            'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            'counters': dict(self.counters),
+            'error': self.error
+        }
+
+
+class SyncMetrics:
+    """Process-wide store of recent sync runs with aggregates"""
+
+    def __init__(self, max_runs: int = 200):
+        self._runs = deque(maxlen=max_runs)
+        self._lock = threading.Lock()
+
+    def start_run(self, user_id, job: str = 'transactions') -> SyncRun:
+        """Create a new run; call record() once it finishes"""
+        return SyncRun(user_id, job)
+
+    def record(self, run: SyncRun):
+        """Store a finished run"""
+        if run.total_seconds is None:
+            run.finish()
+        with self._lock:
+            self._runs.append(run)
+
+    def recent(self, limit: int = 20, user_id=None) -> List[Dict]:
+        """Most recent runs first, optionally limited to one user"""
+        with self._lock:
+            runs = list(self._runs)
+        if user_id is not None:
+            runs = [r for r in runs if str(r.user_id) == str(user_id)]
+        return [r.to_dict() for r in reversed(runs[-limit:])]
+
+    def summary(self, user_id=None) -> Dict:
+        """Aggregate stage timings and counters across stored runs"""
+        with self._lock:
+            runs = list(self._runs)
+        if user_id is not None:
+            runs = [r for r in runs if str(r.user_id) == str(user_id)]
+
+        jobs = {}
+        for run in runs:
+            job = jobs.setdefault(run.job, {
+                'runs': 0,
+                'errors': 0,
+                'total_seconds': 0.0,
+                'max_seconds': 0.0,
+                'stages': {},
+                'counters': {}
+            })
+            job['runs'] += 1
+            job['errors'] += 1 if run.error else 0
+            job['total_seconds'] += run.total_seconds or 0.0
+            job['max_seconds'] = max(job['max_seconds'], run.total_seconds or 0.0)
+            for name, seconds in run.stages.items():
+                job['stages'][name] = job['stages'].get(name, 0.0) + seconds
+            for name, value in run.counters.items():
+                job['counters'][name] = job['counters'].get(name, 0) + value
+
+        for job in jobs.values():
+            runs_count = job['runs']
+            job['avg_seconds'] = round(job['total_seconds'] / runs_count, 4)
+            job['total_seconds'] = round(job['total_seconds'], 4)
+            job['max_seconds'] = round(job['max_seconds'], 4)
+            job['avg_stage_seconds'] = {
+                name: round(seconds / runs_count, 4) for name, seconds in job['stages'].items()
+            }
+            job['stages'] = {name: round(seconds, 4) for name, seconds in job['stages'].items()}
+
+        return {
+            'runs_recorded': len(runs),
+            'jobs': jobs
+        }
+
+
+# Shared instance used by PlaidService and the metrics endpoint
+sync_metrics = SyncMetrics()
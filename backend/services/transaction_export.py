@@ -0,0 +1,191 @@
+"""
+Transaction Export
+
+Streams a user's transactions as CSV, NDJSON or Parquet. Rows come from a
+server-side cursor (yield_per) and are written out in small batches, so an
+export of any size is never held in memory: CSV and NDJSON are flushed
+every few hundred rows, Parquet one row group at a time.
+
+Parquet is written with pyarrow (in requirements.txt); where it is missing,
+parquet is left out of available_formats().
+"""
+
+import csv
+import io
+import json
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterator, Optional
+
+from sqlalchemy import select
+from models_simple import db, Transaction
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Exported columns, in file order
+EXPORT_COLUMNS = (
+    'id', 'date', 'description', 'amount', 'category', 'is_income', 'is_recurring',
+    'merchant_name', 'account_id', 'notes'
+)
+
+# Rows fetched per round trip from the server-side cursor
+FETCH_SIZE = 1000
+
+# Rows per chunk of CSV/NDJSON output
+FLUSH_ROWS = 500
+
+# Rows per Parquet row group
+ROW_GROUP_SIZE = 10000
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+def available_formats():
+    return [name for name in FORMATS if name != 'parquet' or pyarrow is not None]
+
+
+def export_rows(user_id, filters: Optional[Dict] = None) -> Iterator[tuple]:
+    """
+    The user's transactions oldest first, as tuples in EXPORT_COLUMNS order
+
+    filters may hold category, is_income (bool), start_date and end_date (dates).
+    """
+    filters = filters or {}
+    statement = select(*[getattr(Transaction, name) for name in EXPORT_COLUMNS]).where(
+        Transaction.user_id == user_id
+    )
+    if filters.get('category'):
+        statement = statement.where(Transaction.category == filters['category'])
+    if filters.get('is_income') is not None:
+        statement = statement.where(Transaction.is_income == filters['is_income'])
+    if filters.get('start_date'):
+        statement = statement.where(Transaction.date >= filters['start_date'])
+    if filters.get('end_date'):
+        statement = statement.where(Transaction.date <= filters['end_date'])
+    statement = statement.order_by(Transaction.date, Transaction.id)
+
+    # yield_per streams from a server-side cursor where the driver has one (psycopg2)
+    result = db.session.execute(statement.execution_options(yield_per=FETCH_SIZE))
+    for row in result:
+        yield tuple(row)
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(rows: Iterator[tuple]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % FLUSH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_ndjson(rows: Iterator[tuple]) -> Iterator[str]:
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({name: _json_value(value) for name, value in zip(EXPORT_COLUMNS, row)}))
+        if len(lines) >= FLUSH_ROWS:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last drain"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        # Parquet footers record absolute offsets, so report the total written
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _parquet_schema():
+    return pyarrow.schema([
+        ('id', pyarrow.int64()),
+        ('date', pyarrow.date32()),
+        ('description', pyarrow.string()),
+        ('amount', pyarrow.decimal128(10, 2)),
+        ('category', pyarrow.string()),
+        ('is_income', pyarrow.bool_()),
+        ('is_recurring', pyarrow.bool_()),
+        ('merchant_name', pyarrow.string()),
+        ('account_id', pyarrow.int64()),
+        ('notes', pyarrow.string()),
+    ])
+
+
+def stream_parquet(rows: Iterator[tuple]) -> Iterator[bytes]:
+    """Parquet file written and sent one row group at a time"""
+    if pyarrow is None:
+        raise RuntimeError('Parquet export needs the pyarrow package')
+
+    schema = _parquet_schema()
+    sink = _ChunkSink()
+    writer = pyarrow.parquet.ParquetWriter(pyarrow.PythonFile(sink, mode='w'), schema, compression='snappy')
+
+    def write_group(batch):
+        columns = list(zip(*batch))
+        writer.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)],
+            schema=schema
+        ))
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= ROW_GROUP_SIZE:
+            write_group(batch)
+            batch = []
+            yield sink.drain()
+    if batch:
+        write_group(batch)
+    writer.close()
+    yield sink.drain()
+
+
+def stream_export(user_id, file_format: str, filters: Optional[Dict] = None) -> Iterator:
+    """Chunks of the export file in file_format (csv, ndjson or parquet)"""
+    rows = export_rows(user_id, filters)
+    if file_format == 'csv':
+        return stream_csv(rows)
+    if file_format == 'ndjson':
+        return stream_ndjson(rows)
+    if file_format == 'parquet':
+        return stream_parquet(rows)
+    raise ValueError(f"Unknown export format {file_format!r}")
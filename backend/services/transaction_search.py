@@ -0,0 +1,187 @@
+"""
+Transaction Search
+
+Ranked full-text search over transaction descriptions, merchant names and
+notes. On SQLite an external-content FTS5 table mirrors those columns,
+kept in sync by triggers on transactions. On Postgres a stored generated
+tsvector column is indexed with GIN. Because both are maintained by the
+database itself, every write path stays in sync, including bulk inserts,
+imports and Plaid syncs. Other databases, or a SQLite build without FTS5,
+fall back to unranked LIKE matching.
+
+Every search term is treated as a prefix, so "amaz prim" finds
+"AMAZON PRIME". Results are ranked by relevance, then newest first.
+"""
+
+import re
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select, text
+from models_simple import db, Transaction
+
+logger = logging.getLogger(__name__)
+
+# Terms beyond this are ignored
+MAX_TERMS = 8
+
+# Column weights: description and merchant outrank notes
+SQLITE_RANK = "bm25(transactions_fts, 0.0, 10.0, 10.0, 4.0)"
+
+SQLITE_SETUP = [
+    # user_id is indexed too, so "user_id: 42" narrows the match inside the index
+    """CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+        user_id, description, merchant_name, notes,
+        content='transactions', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN
+        INSERT INTO transactions_fts(rowid, user_id, description, merchant_name, notes)
+        VALUES (new.id, new.user_id, new.description, new.merchant_name, new.notes);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN
+        INSERT INTO transactions_fts(transactions_fts, rowid, user_id, description, merchant_name, notes)
+        VALUES ('delete', old.id, old.user_id, old.description, old.merchant_name, old.notes);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transactions_fts_update
+        AFTER UPDATE OF user_id, description, merchant_name, notes ON transactions BEGIN
+        INSERT INTO transactions_fts(transactions_fts, rowid, user_id, description, merchant_name, notes)
+        VALUES ('delete', old.id, old.user_id, old.description, old.merchant_name, old.notes);
+        INSERT INTO transactions_fts(rowid, user_id, description, merchant_name, notes)
+        VALUES (new.id, new.user_id, new.description, new.merchant_name, new.notes);
+    END""",
+]
+
+# 'simple' (no stemming) so results match the SQLite tokenizer's
+POSTGRES_SETUP = [
+    """ALTER TABLE transactions ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(description, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(merchant_name, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(notes, '')), 'B')
+        ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_transactions_search_vector ON transactions USING GIN (search_vector)",
+]
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+
+# Per-engine answer to "is the full-text index there?"
+_available: Dict[str, Optional[str]] = {}
+
+
+def search_terms(query: str) -> List[str]:
+    """Lowercased word terms of a user query; punctuation and operators are dropped"""
+    return _TERM.findall((query or '').lower())[:MAX_TERMS]
+
+
+def ensure_search_index(engine=None) -> List[str]:
+    """Create the full-text index and its sync triggers if missing; returns what was done"""
+    engine = engine or db.engine
+    done = []
+    dialect = engine.dialect.name
+    try:
+        with engine.begin() as connection:
+            if dialect == 'sqlite':
+                exists = connection.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions_fts'"
+                )).first()
+                for statement in SQLITE_SETUP:
+                    connection.execute(text(statement))
+                if not exists:
+                    # Index the rows written before the triggers existed
+                    connection.execute(text("INSERT INTO transactions_fts(transactions_fts) VALUES ('rebuild')"))
+                    done.append('Created transactions_fts full-text index')
+            elif dialect == 'postgresql':
+                for statement in POSTGRES_SETUP:
+                    connection.execute(text(statement))
+                done.append('Ensured transactions.search_vector and its GIN index')
+    except Exception as e:
+        logger.warning(f"Full-text search index not available on {dialect}: {e}")
+    _available.pop(str(engine.url), None)
+    return done
+
+
+def _search_backend() -> Optional[str]:
+    """'sqlite' or 'postgresql' when the full-text index exists, else None (LIKE fallback)"""
+    key = str(db.engine.url)
+    if key not in _available:
+        dialect = db.engine.dialect.name
+        backend = None
+        try:
+            if dialect == 'sqlite':
+                found = db.session.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'transactions_fts'"
+                )).first()
+                backend = 'sqlite' if found else None
+            elif dialect == 'postgresql':
+                found = db.session.execute(text(
+                    "SELECT 1 FROM information_schema.columns "
+                    "WHERE table_name = 'transactions' AND column_name = 'search_vector'"
+                )).first()
+                backend = 'postgresql' if found else None
+        except Exception as e:
+            logger.warning(f"Could not check for the full-text index: {e}")
+        _available[key] = backend
+    return _available[key]
+
+
+def _sqlite_ids(user_id, terms, limit, offset) -> List[Tuple[int, float]]:
+    match = f'user_id : "{int(user_id)}" AND ' + ' AND '.join(f'"{term}"*' for term in terms)
+    # CROSS JOIN keeps the FTS match as the outer loop; it is already narrowed to the user
+    rows = db.session.execute(text(f"""
+        SELECT t.id, {SQLITE_RANK} AS rank
+        FROM transactions_fts
+        CROSS JOIN transactions t ON t.id = transactions_fts.rowid
+        WHERE transactions_fts MATCH :match AND t.user_id = :user_id
+        ORDER BY rank, t.date DESC, t.id DESC
+        LIMIT :limit OFFSET :offset
+    """), {'match': match, 'user_id': int(user_id), 'limit': limit, 'offset': offset})
+    # bm25 is lower-is-better; flip it so higher means more relevant on both backends
+    return [(row_id, -rank) for row_id, rank in rows]
+
+
+def _postgres_ids(user_id, terms, limit, offset) -> List[Tuple[int, float]]:
+    rows = db.session.execute(text("""
+        SELECT id, ts_rank_cd(search_vector, query) AS rank
+        FROM transactions, to_tsquery('simple', :tsquery) AS query
+        WHERE user_id = :user_id AND search_vector @@ query
+        ORDER BY rank DESC, date DESC, id DESC
+        LIMIT :limit OFFSET :offset
+    """), {'tsquery': ' & '.join(f'{term}:*' for term in terms), 'user_id': int(user_id),
+           'limit': limit, 'offset': offset})
+    return [(row_id, float(rank)) for row_id, rank in rows]
+
+
+def _like_ids(user_id, terms, limit, offset) -> List[Tuple[int, float]]:
+    conditions = []
+    for term in terms:
+        pattern = f'%{term}%'
+        conditions.append(or_(
+            Transaction.description.ilike(pattern),
+            Transaction.merchant_name.ilike(pattern),
+            Transaction.notes.ilike(pattern)
+        ))
+    rows = db.session.execute(
+        select(Transaction.id).where(Transaction.user_id == user_id, and_(*conditions))
+        .order_by(Transaction.date.desc(), Transaction.id.desc()).limit(limit).offset(offset)
+    )
+    return [(row_id, 0.0) for row_id, in rows]
+
+
+def search_transactions(user_id, query: str, limit: int = 20, offset: int = 0) -> Tuple[List[Tuple[Transaction, float]], bool]:
+    """
+    Ranked (transaction, score) pairs for the user's query, best first,
+    and whether more results follow
+    """
+    terms = search_terms(query)
+    if not terms:
+        return [], False
+
+    backend = _search_backend()
+    find = {'sqlite': _sqlite_ids, 'postgresql': _postgres_ids}.get(backend, _like_ids)
+    ranked = find(user_id, terms, limit + 1, offset)
+    has_more = len(ranked) > limit
+    ranked = ranked[:limit]
+
+    by_id = {t.id: t for t in Transaction.query.filter(Transaction.id.in_([row_id for row_id, _ in ranked]))} if ranked else {}
+    return [(by_id[row_id], score) for row_id, score in ranked if row_id in by_id], has_more
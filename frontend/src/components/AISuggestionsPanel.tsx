@@ -172,7 +172,14 @@ const AISuggestionsPanel: React.FC<AISuggestionsPanelProps> = ({ onSuggestionApp
         },
       });
 
-      if (response.ok) {
+      if (response.status === 202) {
+        // Recommendations are generated in the background; poll the job until it finishes
+        const job = await response.json();
+        const result = await pollAIJob(`${apiBaseUrl}${job.status_url}`, token);
+        if (result) {
+          setDailyRecs(result);
+        }
+      } else if (response.ok) {
         const data = await response.json();
         setDailyRecs(data);
       }
@@ -181,6 +188,33 @@ const AISuggestionsPanel: React.FC<AISuggestionsPanelProps> = ({ onSuggestionApp
     }
   };
 
+  const pollAIJob = async (statusUrl: string, token: string | null, maxAttempts = 30) => {
+    for (let attempt = 0; attempt < maxAttempts; attempt++) {
+      await new Promise(resolve => setTimeout(resolve, 1000));
+
+      const response = await fetch(statusUrl, {
+        headers: {
+          'Authorization': `Bearer ${token}`,
+          'Content-Type': 'application/json',
+        },
+      });
+
+      if (!response.ok) {
+        return null;
+      }
+
+      const job = await response.json();
+      if (job.status === 'succeeded') {
+        return job.result;
+      }
+      if (job.status === 'failed') {
+        console.error('AI job failed:', job.error);
+        return null;
+      }
+    }
+    return null;
+  };
+
   const handleApproveSuggestion = async (suggestion: AISuggestion) => {
     setProcessingId(suggestion.id);
     